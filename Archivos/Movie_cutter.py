@@ -1,64 +1,438 @@
 """
 Splitting the file into speech/non-speech fragments
 
-With the subtitle file generated by Format_srt, a copy of the original film is created, transforming all the frames into keyframes, thus splitting the film according to the 
-separations defined in the srt file.
+With the timeline generated by Format_srt (timeline.py), a copy of the original film is created, transforming all the frames into keyframes, thus splitting the film according to the 
+separations defined in the timeline.
 
-In the total process this program will be executed twice, the first time it will cut the ''non-speech'' fragments of the film according to the original srt, as the speech fragments 
+In the total process this program will be executed twice, the first time it will cut the ''non-speech'' fragments of the film according to the compressed timeline, as the speech fragments 
 are not necessary because the others are going to be analysed to make more divisions in these if necessary.
 
-Then, from this copy, all partitions in transitions between speech and non-speech intervals are made in one file (''splitmovie.bat'').
+Then, from this copy, all partitions in transitions between speech and non-speech intervals are made by one execution of ffmpeg with its segment muxer: the copy is read only
+once and split at the list of times of the timeline (segment_times), and each segment is renamed as the fragment of the timeline ({index}voice.mp4, {index}else0.125.mp4...).
+The segments between two fragments that are not in the timeline (short gaps between subtitles) are removed, and the fragments that overlap others are cut one by one.
+
+Re-encoding the whole film with all the frames as keyframes is the most expensive step of the processing, so when the keyframe index of the movie (keyframes.py) is given and 
+the video is H.264, the fragments are cut without that copy (smart cut): the complete GOPs inside a fragment are copied from the original film without re-encoding, and only 
+the frames between the start of the fragment and the next keyframe, and between the last keyframe and the end of the fragment, are encoded. The parts are joined as MPEG-TS 
+(the parameters of the video are repeated in the stream) and the audio of the fragment is encoded again, so the fragments are frame-accurate as with the copy. The frames are
+encoded with the profile, level and pixel format of the movie, and the fragments are cut at the same time by several threads. The smart cut is optional (JobConfig.smart_cut):
+when most of the fragments are shorter than a GOP they would be encoded whole, so the copy with all frames as keyframes is used instead.
+
+When the copy with all frames as keyframes is needed (smart cut disabled or video that is not H.264), it is encoded in chunks: the movie is split at its keyframes into one
+time range per group of cores, the ranges are encoded at the same time by several ffmpeg processes (each one with a limited number of threads) and the encoded chunks are joined
+without encoding them again. All the frames of the copy are keyframes, so the chunks are joined without artifacts at the borders. The audio is encoded once from the original
+movie when the chunks are joined.
+
+In the second cut, the else segments inside the else fragments of the first cut are not cut again from the movie: the fragments with the same interval are linked with their
+new name, and the segments that split an else fragment are cut from that fragment (a few seconds), so only the voice segments are cut from the movie. Without the smart cut
+the fragments of the first cut come from the copy with all frames as keyframes, so their packets are copied at any time; with the smart cut they are cut with the smart cut,
+reading the keyframes of each fragment of the first cut only once.
+
+The podcasts are cut directly from the audio file into audio fragments (audio.py).
 """
 
 import os
+import shutil
 import subprocess
-import pysrt
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import audio
+from keyframes import KeyframeIndex
+from Selective_acceleration import link_fragment
+from stage_limiter import heavy_stage
+import tracing
+from timeline import ELSE, VOICE
+
+## Quality of the encoded frames, the same as the copy with all frames as keyframes
+CRF = 18
+
+## Threads of libx264 in each chunk of the copy with all frames as keyframes, the number of chunks is the number of cores divided by this value
+CHUNK_THREADS = 2
+
+## Minimum duration of a chunk of the copy with all frames as keyframes, in seconds
+MIN_CHUNK_DURATION = 30
+
+## Codec of the video that can be copied and joined with the encoded frames
+SMART_CUT_CODEC = 'h264'
+
+## Profiles of H.264 as given by ffprobe and their names in libx264, the encoded frames keep the profile of the copied GOPs
+PROFILES = {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high', 'High 10': 'high10', 'High 4:2:2': 'high422',
+            'High 4:4:4 Predictive': 'high444'}
+
+## Maximum share of the fragments without a complete GOP inside for the smart cut, above it almost everything is encoded and the copy with all frames as keyframes is faster
+MAX_SHORT_FRAGMENTS = 0.5
+
+##
+# @brief Obtains the codec of the video track of the movie.
+# @param movie_file   The path of the movie.
+# @return  The name of the codec (e.g. h264), empty if there is no video track.
+##
+def video_codec(movie_file):
+    result = tracing.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=codec_name', '-of', 'default=noprint_wrappers=1:nokey=1',
+                          movie_file], capture_output=True, text=True)
+    return result.stdout.strip()
+
+##
+# @brief Obtains the options of libx264 that encode the frames with the profile, level and pixel format of the video of the movie, so the encoded frames and the copied
+# GOPs of a fragment of the smart cut have compatible parameters.
+# @param movie_file   The path of the movie.
+# @return  The list of options of ffmpeg, empty for the values that are not known.
+##
+def encoder_options(movie_file):
+    result = tracing.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=profile,level,pix_fmt', '-of', 'default=noprint_wrappers=1',
+                          movie_file], capture_output=True, text=True)
+    info = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+    options = []
+    if info.get('profile') in PROFILES:
+        options += ['-profile:v', PROFILES[info['profile']]]
+    if info.get('level', '').isdigit() and int(info['level']) > 0:
+        options += ['-level', f"{int(info['level']) / 10:.1f}"]
+    if info.get('pix_fmt'):
+        options += ['-pix_fmt', info['pix_fmt']]
+    return options
+
+##
+# @brief Encodes the frames of the video between two times, without audio, as MPEG-TS.
+# @param movie_file   The path of the movie.
+# @param start   The start time in seconds.
+# @param end   The end time in seconds.
+# @param output_file   The path of the MPEG-TS file.
+# @param options   The options of libx264 of the movie (encoder_options).
+# @return  The result of ffmpeg.
+##
+def encode_part(movie_file, start, end, output_file, options=()):
+    return tracing.run(['ffmpeg', '-y', '-ss', str(start), '-i', movie_file, '-t', str(end - start), '-an', '-sn', '-c:v', 'libx264', '-crf', str(CRF)] + list(options)
+                       + ['-threads', str(CHUNK_THREADS), '-f', 'mpegts', output_file], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+##
+# @brief Copies the packets of the video between two keyframes, without audio, as MPEG-TS.
+# @param movie_file   The path of the movie.
+# @param start   The time of the first keyframe in seconds.
+# @param end   The time of the last keyframe in seconds, it is not included.
+# @param output_file   The path of the MPEG-TS file.
+# @return  The result of ffmpeg.
+##
+def copy_part(movie_file, start, end, output_file):
+    return tracing.run(['ffmpeg', '-y', '-ss', str(start), '-i', movie_file, '-t', str(end - start), '-an', '-sn', '-c:v', 'copy', '-bsf:v', 'h264_mp4toannexb',
+                        '-f', 'mpegts', output_file], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
 
 ##
-# @brief Splits the video file into fragments.
+# @brief Cuts one fragment of the movie copying its complete GOPs and encoding only the frames before the first keyframe and after the last one.
+# @param movie_file   The path of the movie.
+# @param keyframes   The keyframe index of the movie (keyframes.py).
+# @param start   The start time of the fragment in seconds.
+# @param end   The end time of the fragment in seconds.
+# @param fragment   The path of the fragment.
+# @param work_dir   The folder of the temporary parts, only used by this fragment.
+# @param options   The options of libx264 of the movie (encoder_options).
+# An exception is raised if a part cannot be encoded or copied, or the parts cannot be joined.
+##
+def smart_cut(movie_file, keyframes, start, end, fragment, work_dir, options=()):
+    first = float(keyframes.after(start))
+    last = float(keyframes.before(end))
+    parts = []
+    if first < last:
+        if start < first:
+            parts.append(('encode', start, first))
+        parts.append(('copy', first, last))
+        if last < end:
+            parts.append(('encode', last, end))
+    else:
+        # there is no complete GOP inside the fragment
+        parts.append(('encode', start, end))
+
+    part_files = []
+    for count, (mode, part_start, part_end) in enumerate(parts):
+        part_file = os.path.join(work_dir, f'part{count}.ts')
+        if mode == 'copy':
+            result = copy_part(movie_file, part_start, part_end, part_file)
+        else:
+            result = encode_part(movie_file, part_start, part_end, part_file, options)
+        if result.returncode != 0:
+            raise Exception(f"Error in the {mode} of {part_start}-{part_end} s of {os.path.basename(fragment)}: {result.stderr}")
+        part_files.append(part_file)
+
+    concat_file = os.path.join(work_dir, 'parts.txt')
+    with open(concat_file, 'w') as output:
+        for part_file in part_files:
+            output.write(f"file '{part_file}'\n")
+    # the video of the parts is joined without encoding, the audio of the fragment is encoded from the original movie
+    result = tracing.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file, '-ss', str(start), '-to', str(end), '-i', movie_file,
+                          '-map', '0:v', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac', '-shortest', fragment], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for part_file in part_files:
+        os.remove(part_file)
+    if result.returncode != 0:
+        raise Exception(f"Error joining the parts of {os.path.basename(fragment)}: {result.stderr}")
+
+##
+# @brief Share of the fragments without a complete GOP inside, that the smart cut encodes whole.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param selected   Boolean mask of the segments whose fragments are cut.
+# @param keyframes   The keyframe index of the movie (keyframes.py).
+# @return  The share of the fragments cut, between 0 and 1.
+##
+def short_fragments(timeline, selected, keyframes):
+    selected = np.flatnonzero(selected)
+    if len(selected) == 0:
+        return 0.0
+    start = timeline.start[selected] / 1000
+    end = timeline.end[selected] / 1000
+    return float(np.mean(keyframes.after(start) >= keyframes.before(end)))
+
+##
+# @brief Splits the video file into fragments with the smart cut, without the copy of the movie with all frames as keyframes. The fragments are cut at the same time by
+# several threads, as the chunks of the copy (encode_all_keyframes), each one with its own folder for the parts.
+# @param movie_path   The path where the video is stored.
+# @param movie_file   The path of the video file.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param selected   Boolean mask of the segments whose fragments are cut.
+# @param keyframes   The keyframe index of the movie (keyframes.py).
+##
+def smart_fragmentation(movie_path, movie_file, timeline, selected, keyframes):
+    options = encoder_options(movie_file)
+    work_dir = tempfile.mkdtemp(prefix='smartcut_', dir=movie_path)
+    try:
+        def cut_fragment(i):
+            start_point, end_point = timeline.seconds(i)
+            fragment_dir = os.path.join(work_dir, str(i))
+            os.makedirs(fragment_dir)
+            smart_cut(movie_file, keyframes, start_point, end_point, os.path.join(movie_path, timeline.fragment_name(i)), fragment_dir, options)
+
+        with ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // CHUNK_THREADS)) as executor:
+            # list raises the first error of the fragments
+            list(executor.map(tracing.in_spans(cut_fragment), np.flatnonzero(selected)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+##
+# @brief Times where the movie is split into chunks to be encoded at the same time: the keyframes nearest to equal divisions of the movie.
+# @param keyframes   The keyframe index of the movie (keyframes.py), None to encode the movie as one chunk.
+# @param n_chunks   The maximum number of chunks.
+# @return  The start times of the chunks in seconds, the first one is 0.
+##
+def chunk_starts(keyframes, n_chunks):
+    if keyframes is None or len(keyframes) < 2:
+        return [0.0]
+    n_chunks = max(1, min(n_chunks, int(keyframes.last() // MIN_CHUNK_DURATION)))
+    starts = keyframes.nearest(np.arange(1, n_chunks) * keyframes.last() / n_chunks)
+    return [0.0] + [float(start) for start in np.unique(starts) if start > 0]
+
+##
+# @brief Encodes the video of the movie with all frames as keyframes, in chunks encoded at the same time that are joined without encoding them again.
+# @param movie_path   The path where the video is stored.
+# @param movie_file   The path of the video file.
+# @param allkframes   The path of the copy with all frames as keyframes.
+# @param keyframes   The keyframe index of the movie (keyframes.py) where the chunks are split, None to encode the movie as one chunk.
+# An exception is raised if a chunk cannot be encoded or the chunks cannot be joined, the copy is not written.
+##
+def encode_all_keyframes(movie_path, movie_file, allkframes, keyframes):
+    n_chunks = max(1, (os.cpu_count() or 1) // CHUNK_THREADS)
+    starts = chunk_starts(keyframes, n_chunks)
+    ends = starts[1:] + [None]
+    work_dir = tempfile.mkdtemp(prefix='allkframes_', dir=movie_path)
+    try:
+        chunk_files = [os.path.join(work_dir, f'chunk{count}.mkv') for count in range(len(starts))]
+
+        def encode_chunk(start, end, chunk_file):
+            duration = [] if end is None else ['-t', str(end - start)]
+            return tracing.run(['ffmpeg', '-y', '-ss', str(start), '-i', movie_file] + duration + ['-an', '-sn', '-c:v', 'libx264', '-x264opts', 'keyint=1:no-scenecut',
+                               '-crf', str(CRF), '-threads', str(CHUNK_THREADS), chunk_file], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+        with ThreadPoolExecutor(max_workers=len(starts)) as executor:
+            results = list(executor.map(tracing.in_spans(encode_chunk), starts, ends, chunk_files))
+        # a chunk that failed would leave a hole in the copy, nothing is joined
+        for count, (start, result) in enumerate(zip(starts, results)):
+            if result.returncode != 0 or not os.path.isfile(chunk_files[count]):
+                raise Exception(f"Error encoding the chunk {count} (from {start} s) of {os.path.basename(allkframes)}: {result.stderr}")
+
+        concat_file = os.path.join(work_dir, 'chunks.txt')
+        with open(concat_file, 'w') as output:
+            for chunk_file in chunk_files:
+                output.write(f"file '{chunk_file}'\n")
+        # the copy is written with a temporary name, so an interrupted encode is not taken as a complete copy
+        joined_file = os.path.join(work_dir, 'joined.mkv')
+        result = tracing.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_file, '-i', movie_file, '-map', '0:v', '-map', '1:a:0?',
+                              '-c:v', 'copy', '-c:a', 'aac', joined_file], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"Error joining the chunks of {os.path.basename(allkframes)}: {result.stderr}")
+        os.replace(joined_file, allkframes)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+##
+# @brief Copies the packets of a file between two times into a fragment, without encoding. It is frame-accurate on a file with all frames as keyframes.
+# @param source   The path of the file, the copy with all frames as keyframes or a fragment cut from it.
+# @param start   The start time in seconds.
+# @param end   The end time in seconds.
+# @param fragment   The path of the fragment.
+##
+def copy_fragment(source, start, end, fragment):
+    result = tracing.run(['ffmpeg', '-y', '-i', source, '-ss', str(start), '-to', str(end), '-c', 'copy', fragment],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Error cutting the fragment {os.path.basename(fragment)}: {result.stderr}")
+
+##
+# @brief Splits the copy of the movie with all frames as keyframes into the fragments of the timeline with one execution of ffmpeg (segment muxer).
+# @param movie_path   The path where the video is stored.
+# @param allkframes   The path of the copy with all frames as keyframes.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param selected   Boolean mask of the segments whose fragments are cut.
+##
+def segment_fragmentation(movie_path, allkframes, timeline, selected):
+    selected = np.flatnonzero(selected)
+    if len(selected) == 0:
+        return
+    # the segment i of ffmpeg goes from the time i-1 of the list to the time i (the first one from the start of the movie)
+    times = np.unique(np.r_[timeline.start[selected], timeline.end[selected]])
+    times = times[times > 0]
+    first = np.searchsorted(times, timeline.start[selected], side='right')
+    exact = np.searchsorted(times, timeline.end[selected], side='left') == first
+
+    work_dir = tempfile.mkdtemp(prefix='segments_', dir=movie_path)
+    try:
+        result = tracing.run(['ffmpeg', '-y', '-i', allkframes, '-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy', '-f', 'segment',
+                              '-segment_times', ','.join(f'{t / 1000:.3f}' for t in times), '-segment_format', 'mp4', '-reset_timestamps', '1',
+                              os.path.join(work_dir, 'segment%d.mp4')], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise Exception(f"Error splitting {os.path.basename(allkframes)} into fragments: {result.stderr}")
+        for i, segment, is_exact in zip(selected, first, exact):
+            fragment = os.path.join(movie_path, timeline.fragment_name(i))
+            segment_file = os.path.join(work_dir, f'segment{segment}.mp4')
+            if is_exact and os.path.exists(segment_file):
+                os.replace(segment_file, fragment)
+            else:
+                # the fragment overlaps other fragments of the timeline, it is not one of the segments
+                start_point, end_point = timeline.seconds(i)
+                copy_fragment(allkframes, start_point, end_point, fragment)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+##
+# @brief Splits the audio file of a podcast into audio fragments, no video is encoded.
+# @param movie_path   The path where the audio is stored.
+# @param movie_file   The path of the audio file.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param selected   Boolean mask of the segments whose fragments are cut.
+# @param audio_format   The format of the fragments (m4a or opus).
+##
+def audio_fragmentation(movie_path, movie_file, timeline, selected, audio_format):
+    for i in np.flatnonzero(selected):
+        start_point, end_point = timeline.seconds(i)
+        audio.cut(movie_file, start_point, end_point, os.path.join(movie_path, timeline.fragment_name(i, audio_format)), audio_format)
+
+##
+# @brief Reuses the else fragments of the first cut for the else segments of the timeline inside them: a segment with the same interval is linked with its name, a segment
+# inside a fragment is cut from the fragment instead of from the movie.
+# @param movie_path   The path where the video is stored.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param cut_timeline   The timeline of the first cut, whose else fragments ({index}else.mp4) are on disk.
+# @param smart   Flag to cut the segments with the smart cut (the first cut was made with the smart cut), otherwise their packets are copied from the fragments, that have
+# all frames as keyframes.
+# @return  Boolean mask of the segments whose fragments were obtained from the fragments of the first cut.
+##
+def reuse_fragments(movie_path, timeline, cut_timeline, smart=False):
+    reused = np.zeros(len(timeline), dtype=bool)
+    cut_else = np.flatnonzero(cut_timeline.is_kind(ELSE))
+    if len(cut_else) == 0:
+        return reused
+    # fragment of the first cut that contains the start of each segment
+    position = np.clip(np.searchsorted(cut_timeline.start[cut_else], timeline.start, side='right') - 1, 0, len(cut_else) - 1)
+    container = cut_else[position]
+    inside = timeline.is_kind(ELSE) & (timeline.start >= cut_timeline.start[container]) & (timeline.end <= cut_timeline.end[container])
+
+    # keyframe index and encoder options of each fragment of the first cut, read once for all the segments inside it
+    sources = {}
+    work_dir = tempfile.mkdtemp(prefix='reuse_', dir=movie_path)
+    try:
+        for i in np.flatnonzero(inside):
+            source = os.path.join(movie_path, cut_timeline.fragment_name(container[i]))
+            if not os.path.exists(source):
+                continue
+            fragment = timeline.fragment_name(i)
+            if timeline.start[i] == cut_timeline.start[container[i]] and timeline.end[i] == cut_timeline.end[container[i]]:
+                link_fragment(movie_path, os.path.basename(source), fragment)
+            else:
+                offset = cut_timeline.seconds(container[i])[0]
+                start_point, end_point = timeline.seconds(i)
+                if not smart:
+                    copy_fragment(source, start_point - offset, end_point - offset, os.path.join(movie_path, fragment))
+                else:
+                    if container[i] not in sources:
+                        sources[container[i]] = KeyframeIndex.from_movie(source), encoder_options(source)
+                    keyframes, options = sources[container[i]]
+                    with heavy_stage():
+                        smart_cut(source, keyframes, start_point - offset, end_point - offset, os.path.join(movie_path, fragment), work_dir, options)
+            reused[i] = os.path.exists(os.path.join(movie_path, fragment))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return reused
+
+##
+# @brief Checks that there is one fragment for each segment cut, so a cut that failed halfway is not taken as completed (checkpoint.py).
+# @param movie_path   The path where the fragments are stored.
+# @param timeline   The voice/else timeline with the times of the fragments.
+# @param selected   Boolean mask of the segments whose fragments were cut.
+# @param extension   The extension of the fragments.
+##
+def check_fragments(movie_path, timeline, selected, extension='mp4'):
+    missing = [timeline.fragment_name(i, extension) for i in np.flatnonzero(selected)
+               if not os.path.isfile(os.path.join(movie_path, timeline.fragment_name(i, extension)))]
+    if missing:
+        raise Exception(f"{len(missing)} fragments were not cut: {', '.join(missing)}")
+
+##
+# @brief Splits the video file into fragments. All the files are read and written in movie_path with absolute paths.
 # @param movie_path   The path where the video is stored.
 # @param movie_name   The name of the video file.
-# @param srt_file   The name of the subtitle file.
+# @param timeline   The voice/else timeline with the times of the fragments.
 # @param flag_only_else   Flag to determine if only the speech fragments are kept.
+# @param keyframes   The keyframe index of the movie (keyframes.py), used by the smart cut and to split the encode of the copy with all frames as keyframes into chunks.
+# @param audio_format   The format of the fragments of a podcast (m4a or opus).
+# @param smart_cut   Flag to cut the fragments with the smart cut when the keyframes are given, otherwise they are cut from a copy with all frames as keyframes.
+# @param cut_timeline   The timeline of the first cut, its else fragments are reused for the else segments inside them (reuse_fragments), None to cut all from the movie.
 ##
-def fragmentation(movie_path, movie_name, srt_file, flag_only_else, flag_podcast):
-    # inputs: file containing the desired timestamps of the fragments, srt format
-    os.chdir(movie_path)
+def fragmentation(movie_path, movie_name, timeline, flag_only_else, flag_podcast, keyframes=None, audio_format=audio.AUDIO_FORMAT, smart_cut=False, cut_timeline=None):
+    # inputs: timeline containing the desired timestamps of the fragments
+    movie_file = os.path.join(movie_path, movie_name)
+    selected = ~(flag_only_else & timeline.is_kind(VOICE))
     
-    if not flag_podcast:
-        ##### make a copy of the original movie where all frames become keyframes
-        allkframes = 'output_with_all_keyframes.mkv'
-    else:
-        allkframes = movie_name
+    if flag_podcast:
+        audio_fragmentation(movie_path, movie_file, timeline, selected, audio_format)
+        check_fragments(movie_path, timeline, selected, audio_format)
+        return
+
+    if cut_timeline is not None:
+        selected &= ~reuse_fragments(movie_path, timeline, cut_timeline, smart_cut and keyframes is not None)
+        if not selected.any():
+            return
+    
+    if smart_cut and keyframes is not None:
+        short = short_fragments(timeline, selected, keyframes)
+        if video_codec(movie_file) != SMART_CUT_CODEC:
+            print(f"The video of {movie_name} is not {SMART_CUT_CODEC}, it is cut from a copy with all frames as keyframes")
+        elif short > MAX_SHORT_FRAGMENTS:
+            print(f"{short:.0%} of the fragments of {movie_name} are shorter than a GOP, it is cut from a copy with all frames as keyframes")
+        else:
+            with heavy_stage():
+                smart_fragmentation(movie_path, movie_file, timeline, selected, keyframes)
+            check_fragments(movie_path, timeline, selected)
+            return
     
-    if not os.path.exists(os.path.join(movie_path, allkframes)):
-        command = f'ffmpeg -y -i {movie_name} -c:v libx264 -x264opts keyint=1:no-scenecut -crf 18 -c:a aac {allkframes}'
-        with open('ffmpeg_command.bat', 'w') as bat_file:
-            bat_file.write(command)
-        subprocess.call(['ffmpeg_command.bat'], shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    ##### make a copy of the original movie where all frames become keyframes
+    allkframes = os.path.join(movie_path, 'output_with_all_keyframes.mkv')
+    
+    if not os.path.exists(allkframes):
+        with heavy_stage():
+            encode_all_keyframes(movie_path, movie_file, allkframes, keyframes)
     else:
         print(f"{allkframes} already exists")
         
-    with open("splitmovie.bat", 'w') as output:
-        try:
-            subs = pysrt.open(srt_file)
-            for sub in subs:
-                if flag_only_else:
-                    if sub.text != "voice":
-                        start_point = sub.start.hours * 3600 + sub.start.minutes * 60 + sub.start.seconds + round(sub.start.milliseconds/1000,3)  # in seconds for ffmpeg
-                        end_point = sub.end.hours * 3600 + sub.end.minutes * 60 + sub.end.seconds + round(sub.end.milliseconds/1000,3)
-                        output.write(f'ffmpeg -y -i {allkframes} -ss {start_point} -to {end_point} -c copy {sub.index}{sub.text}.mp4\n')
-                else:
-                    start_point = sub.start.hours * 3600 + sub.start.minutes * 60 + sub.start.seconds + round(sub.start.milliseconds/1000,3)  # in seconds for ffmpeg
-                    end_point = sub.end.hours * 3600 + sub.end.minutes * 60 + sub.end.seconds + round(sub.end.milliseconds/1000,3)
-                    output.write(f'ffmpeg -y -i {allkframes} -ss {start_point} -to {end_point} -c copy {sub.index}{sub.text}.mp4\n')
-
-        except FileNotFoundError:
-            print("File not found")
-
-    batpath = os.path.join(movie_path, "splitmovie.bat")
-    subprocess.call(batpath, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) #need to run it through the Windows command interpreter (cmd.exe) because win32 cannot execute it directly
-    #/c tells the program to open cmd.exe and close it after the command from splitmovie.bat is ran
+    segment_fragmentation(movie_path, allkframes, timeline, selected)
+    check_fragments(movie_path, timeline, selected)
 
     return
 
@@ -66,9 +440,13 @@ def fragmentation(movie_path, movie_name, srt_file, flag_only_else, flag_podcast
 # @brief Main function.
 # @param movie_path   The path where the video is stored.
 # @param movie_name   The name of the video file.
-# @param srt_file   The name of the subtitle file.
+# @param timeline   The voice/else timeline with the times of the fragments.
 # @param flag_only_else   Flag to determine if only the speech fragments are kept.
+# @param keyframes   The keyframe index of the movie (keyframes.py) for the smart cut and the chunks of the copy with all frames as keyframes.
+# @param audio_format   The format of the fragments of a podcast (m4a or opus).
+# @param smart_cut   Flag to cut the fragments with the smart cut, otherwise they are cut from a copy with all frames as keyframes.
+# @param cut_timeline   The timeline of the first cut, whose else fragments are reused, None to cut all the fragments from the movie.
 ##
-def main(movie_path, movie_name, srt_file, flag_only_else, flag_podcast):
-    fragmentation(movie_path, movie_name, srt_file, flag_only_else, flag_podcast)
+def main(movie_path, movie_name, timeline, flag_only_else, flag_podcast, keyframes=None, audio_format=audio.AUDIO_FORMAT, smart_cut=False, cut_timeline=None):
+    fragmentation(movie_path, movie_name, timeline, flag_only_else, flag_podcast, keyframes, audio_format, smart_cut, cut_timeline)
 
@@ -5,21 +5,28 @@ In this file, the first thing that is done is to transform all the fragments to
 used for live content, so a text file is created with all the consecutive fragments in order of the type '.ts' in the file concat.txt. 
 
 With this file the final file is created, concatenating all these files.
+
+The audio fragments of a podcast are joined directly, without MPEG-TS, in merged_audio.{format} (audio.py).
+
+With virtual fragments, the fragments are not cut nor accelerated before (Movie_cutter and Selective_acceleration are not run): each segment of the timeline is only a reference
+to an interval of the original movie, and its MPEG-TS fragment is encoded directly from that interval of the movie, with the acceleration of the segment. The cut fragments,
+the renamed ones and the accelerated .mp4 files are never written, only the .ts fragments and the final file. The fragments are encoded at the same time by several ffmpeg
+processes (each one with a limited number of threads), as the chunks of the copy with all frames as keyframes of Movie_cutter, and they are joined in the order of the timeline.
 """
 
 import os
 import subprocess
-import pysubs2
+from concurrent.futures import ThreadPoolExecutor
 
-##
-# @brief  Determines the total number of fragments to be generated.
-# @param srt_file   The name of the subtitle file.
-# @return  The total number of fragments to be generated.
-##
-def determine_index(srt_file):
-    subs = pysubs2.load(srt_file, encoding = 'UTF-8', format_= 'srt')
-    index = len(subs)
-    return index
+import audio
+from stage_limiter import heavy_stage
+import tracing
+
+## Quality of the encoded fragments with virtual fragments, the same as the copy with all frames as keyframes of Movie_cutter
+CRF = 18
+
+## Threads of libx264 in each fragment encoded at the same time with virtual fragments, the number of fragments encoded at the same time is the number of cores divided by this value
+RENDER_THREADS = 2
 
 ##
 # @brief  Creates the final video file.
@@ -27,7 +34,7 @@ def determine_index(srt_file):
 # @param current_path   The path where the files are stored.
 ##
 def movie_maker(index, current_path):
-    video_list = [f"{i}.mp4" for i in range(1, int(index) + 1)]
+    video_list = [os.path.join(current_path, f"{i}.mp4") for i in range(1, int(index) + 1)]
     temp_file_list = []
     concat_txt = os.path.join(current_path, 'concat.txt')
 
@@ -35,7 +42,7 @@ def movie_maker(index, current_path):
         for video in video_list:
             temp_file = os.path.join(current_path,
                                      f"{video[:-4]}.ts")  # [:-4] - to remove the last four characters from "video"
-            terminalText=subprocess.run(
+            terminalText=tracing.run(
                 ['ffmpeg', '-y', '-i', video, '-c', 'copy', '-bsf:v', 'h264_mp4toannexb', '-f', 'mpegts', temp_file], capture_output=True, text=True)
             # -bsf:v h264_mp4toannexb -> converts the video stream to the Annex B byte stream format required for MPEG-TS containers
             # -f mpegts -> set the output format to MPEG-TS (Transport Stream) = a container format used for streaming media
@@ -46,20 +53,102 @@ def movie_maker(index, current_path):
                 temp_file_list.append(temp_file)
                 output.write(f"file '{temp_file}'\n")
     
+    join_fragments(current_path)
+    return
+
+##
+# @brief  Obtains the frame rate of the video track of the movie, the accelerated fragments keep it.
+# @param movie_file   The path of the movie.
+# @return  The frame rate as given by ffprobe (e.g. 24000/1001).
+##
+def frame_rate(movie_file):
+    result = tracing.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=r_frame_rate', '-of', 'default=noprint_wrappers=1:nokey=1',
+                          movie_file], capture_output=True, text=True)
+    return result.stdout.strip()
+
+##
+# @brief  Encodes the MPEG-TS fragment of a segment directly from its interval of the movie, with the acceleration of the segment (virtual fragment).
+# @param movie_file   The path of the movie.
+# @param start   The start time of the segment in seconds.
+# @param end   The end time of the segment in seconds.
+# @param factor   The factor of the segment, the inverse of the acceleration.
+# @param rate   The frame rate of the movie.
+# @param output_file   The path of the MPEG-TS fragment.
+# @return  The result of ffmpeg.
+##
+def render_fragment(movie_file, start, end, factor, rate, output_file):
+    return tracing.run(['ffmpeg', '-y', '-ss', str(start), '-to', str(end), '-i', movie_file, '-map', '0:v:0', '-map', '0:a:0?', '-sn',
+                        '-filter:v', f'setpts={factor}*(PTS-STARTPTS)', '-filter:a', audio.tempo_filter(factor), '-r', rate,
+                        '-c:v', 'libx264', '-crf', str(CRF), '-threads', str(RENDER_THREADS), '-c:a', 'aac', '-f', 'mpegts', output_file],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+##
+# @brief  Creates the final file from virtual fragments: the fragment of each segment is encoded from the movie (or from the audio file of a podcast) and they are joined.
+# @param current_path   The path where the files are stored.
+# @param movie_name   The name of the movie.
+# @param timeline   The timeline with the voice and else accelerations.
+# @param audio_format   The format of the audio fragments of a podcast (m4a or opus), None for the video fragments.
+# An exception is raised if a fragment cannot be encoded, nothing is joined.
+##
+def virtual_movie_maker(current_path, movie_name, timeline, audio_format=None):
+    movie_file = os.path.join(current_path, movie_name)
+    if audio_format:
+        output_files = [os.path.join(current_path, f"{i + 1}.{audio_format}") for i in range(len(timeline))]
+
+        def render_segment(i):
+            start_point, end_point = timeline.seconds(i)
+            return audio.render(movie_file, start_point, end_point, float(timeline.factor[i]), output_files[i], audio_format)
+    else:
+        rate = frame_rate(movie_file)
+        output_files = [os.path.join(current_path, f"{i + 1}.ts") for i in range(len(timeline))]
+
+        def render_segment(i):
+            start_point, end_point = timeline.seconds(i)
+            return render_fragment(movie_file, start_point, end_point, float(timeline.factor[i]), rate, output_files[i])
+
+    with heavy_stage():
+        with ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // RENDER_THREADS)) as executor:
+            results = list(executor.map(tracing.in_spans(render_segment), range(len(timeline))))
+    # a missing fragment would shift the subtitles of the rest of the movie (accelerate_srt), nothing is joined
+    for i, result in enumerate(results):
+        if result.returncode != 0 or not os.path.isfile(output_files[i]):
+            start_point, end_point = timeline.seconds(i)
+            raise Exception(f"Error encoding the fragment {i + 1} ({start_point}-{end_point} s): {result.stderr}")
+    if audio_format:
+        return
+
+    with open(os.path.join(current_path, 'concat.txt'), 'w') as output:
+        for temp_file in output_files:
+            output.write(f"file '{temp_file}'\n")
+    join_fragments(current_path)
+
+##
+# @brief  Joins the MPEG-TS fragments listed in concat.txt in the final video file.
+# @param current_path   The path where the files are stored.
+##
+def join_fragments(current_path):
+    concat_txt = os.path.join(current_path, 'concat.txt')
     output_file = os.path.join(current_path, 'merged_video.mp4')
-    textTerminal=subprocess.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_txt, '-c:a', 'copy', '-bsf:a', 'aac_adtstoasc', output_file], capture_output=True, text=True)
+    textTerminal=tracing.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_txt, '-c:a', 'copy', '-bsf:a', 'aac_adtstoasc', output_file], capture_output=True, text=True)
     if textTerminal.returncode != 0:     
         print(str(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', concat_txt, '-c:a', 'copy', '-bsf:a','aac_adtstoasc', output_file])+" "+textTerminal.stderr)
     # '-bsf:a', 'aac_adtstoasc' -> bitstream filter, converts the audio stream to the ASC (Audio Specific Configuration) format required for MPEG-TS containers
-    return
 
 ##
 # @brief  Main function.
 # @param input_path   The path where the files are stored.
-# @param srt_file   The name of the subtitle file.
+# @param timeline   The timeline with the voice and else accelerations, one fragment for each segment.
+# @param audio_format   The format of the audio fragments of a podcast (m4a or opus), None for the video fragments.
+# @param movie_name   The name of the movie to encode the fragments directly from it (virtual fragments), None to join the accelerated fragments {index}.mp4.
 ##
-def main(input_path, srt_file):
-    os.chdir(input_path)
-    index = determine_index(srt_file)
-    movie_maker(index, input_path)
+def main(input_path, timeline, audio_format=None, movie_name=None):
+    if movie_name is not None:
+        virtual_movie_maker(input_path, movie_name, timeline, audio_format)
+        if not audio_format:
+            return
+    if audio_format:
+        audio_files = [os.path.join(input_path, f"{i}.{audio_format}") for i in range(1, len(timeline) + 1)]
+        audio.concatenate(audio_files, os.path.join(input_path, f"{audio.MERGED_AUDIO}.{audio_format}"), os.path.join(input_path, 'concat.txt'))
+        return
+    movie_maker(len(timeline), input_path)
     return
\ No newline at end of file
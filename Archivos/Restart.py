@@ -17,7 +17,6 @@ import shutil
 # @param movie_name   The name of the movie.
 ##
 def main(input_path, movie_name):
-    os.chdir(input_path)
     for filename in os.listdir(input_path):
         if filename != movie_name:
             file_path = os.path.join(input_path, filename)
@@ -4,122 +4,92 @@ Selective acceleration of fragments
 In this program, for each file in the split of the complete file, the ''speedup'' program is called for each one, in order to accelerate that video with the acceleration 
 corresponding to that fragment.
 
-The file ''compr_subs.srt'' is used, it is the subtitle file that contains 'else' or 'voice', it does not have consecutive elements of the same type. For each file the 
-speedup program is called for each file with the following arguments: directories, index and acceleration factor corresponding to its type.
+The timeline with the accelerations (timeline.py) is used, each segment is 'else' or 'voice' with its factor. For each file the speedup program is called with the following 
+arguments: directories, index and acceleration factor of its segment.
 
-The acceleration is extracted from the file name, because the names are those mentioned in the previous process ''(\d+)else(\d.\d+)'' or ''(\d+)voice(\d.\d+)''.
+The names of the files are those mentioned in the previous process ''(\d+)else(\d.\d+)'' or ''(\d+)voice(\d.\d+)'', the factor is taken from the timeline instead of the name.
+
+The audio fragments of a podcast are accelerated only with the atempo filter (audio.py).
 """
 
 import os
 import shutil
-import pysubs2
-import re
 
-##
-# @brief  Determines the total number of fragments to be generated.
-# @param voice_else_srt   The name of the subtitle file.
-# @return  The total number of fragments to be generated.
-##
-def determine_index(voice_else_srt):
-    subs = pysubs2.load(voice_else_srt, encoding = 'UTF-8', format_= 'srt')
-    index = len(subs)
-    return index
+import audio
+import speedup
+from stage_limiter import heavy_stage
+from timeline import KINDS
 
 ##
-# @brief  Determines the acceleration of the file in the directory that matches the name and renames the file from ''(\d+)else(\d.\d+)'' or ''(\d+)voice(\d.\d+)''
-# to ''(\d+)elseacc'' or ''(\d+)voiceacc''.
-# @param name   The name of the file to be found.
-# @param lista   The list of files in the directory.
-# @return  The name of the file that matches the name.
+# @brief  Links the fragment ''(\d+)else(\d.\d+)'' or ''(\d+)voice(\d.\d+)'' cut by Movie_cutter with the name ''(\d+)elseacc'' or ''(\d+)voiceacc''.
+# The original name is kept as a hard link (or a copy), so the fragments cut by Movie_cutter are still there if the processing is resumed.
+# @param path   The path where the files are stored.
+# @param file_name   The name of the fragment cut by Movie_cutter.
+# @param new_name   The name of the link.
+# @return  The name of the link, None if the fragment does not exist.
 ##
-def file_in_directory(name, lista):
-    pattern = f"^{name}(\d+(\.\d+)?)\.mp4"
-    for file in lista:
-        match = re.search(pattern, file)
-        if match is not None:
-            new_name = name+"acc.mp4"
-            os.rename(file, new_name)
-            return new_name, float(match.group(1))
-    return
+def link_fragment(path, file_name, new_name):
+    if not os.path.exists(os.path.join(path, file_name)):
+        return
+    if os.path.exists(os.path.join(path, new_name)):
+        os.remove(os.path.join(path, new_name))
+    try:
+        os.link(os.path.join(path, file_name), os.path.join(path, new_name))
+    except OSError:
+        shutil.copyfile(os.path.join(path, file_name), os.path.join(path, new_name))
+    return new_name
 
 ##
-# @brief  Selectively accelerates the fragments with acceleration found in ''(\d+)else(\d.\d+)'' or ''(\d+)voice(\d.\d+)'' where (\d.\d+) is the acceleration.
-# @param speedup_path   The path where the files are stored.
+# @brief  Selectively accelerates the fragments of the timeline with the factor of each segment.
+# @param speedup_path   The path where the temporary files of the acceleration are created.
 # @param input_path   The path where the files are stored.
-# @param index   The total number of fragments to be generated.
+# @param timeline   The timeline with the voice and else accelerations.
+# @param audio_format   The format of the audio fragments of a podcast (m4a or opus), None for the video fragments.
 ##
-def selective_acc(speedup_path, input_path, index):
+def selective_acc(speedup_path, input_path, timeline, audio_format=None):
+    extension = audio_format or 'mp4'
     # after the .mp4 files are created, the ones named {index}voice will have acc_rate = voice_speed and {index}else -> else_speed
-    current_file = ""
-    current_speed = -1
-    os.chdir(input_path)
-    files = os.listdir()
-
-    for i in range(1, int(index) + 1):
-        
-        retVal_else = file_in_directory(f'{i}else', files)
-        retVal_voice = file_in_directory(f'{i}voice', files)
+    for i in range(len(timeline)):
+        current_file = link_fragment(input_path, timeline.fragment_name(i, extension), f'{i+1}{KINDS[timeline.kind[i]]}acc.{extension}')
         
-        if retVal_else:
-            current_file, current_speed = retVal_else
-            
-        elif retVal_voice:
-            current_file, current_speed = retVal_voice
-
-        else:
-            print(i)
+        if current_file is None:
+            print(i+1)
             raise Exception("\n--------Non-existent file--------\n")
 
-        if current_file != "" and current_speed != -1:
-            speedup_file(speedup_path, input_path, current_file, current_speed, f'{i}.mp4')
+        if audio_format:
+            # only the tempo of the audio is changed, there is no video
+            audio.accelerate(os.path.join(input_path, current_file), float(timeline.factor[i]), os.path.join(input_path, f'{i+1}.{extension}'), audio_format)
+        else:
+            speedup_file(speedup_path, input_path, current_file, float(timeline.factor[i]), f'{i+1}.mp4')
             
     return 1
 
 ##
-# @brief  Accelerates the file with the speedup program.
-# @param speedup_path   The path where the files are processed.
+# @brief  Accelerates the file with the speedup program. The temporary files are created in a folder of their own inside speedup_path.
+# @param speedup_path   The path where the temporary files of the acceleration are created.
 # @param current_path   The path where the files are stored.
 # @param file_name   The name of the file to be accelerated.
 # @param speed_rate   The acceleration factor.
 # @param output_name   The name of the output file.
 ##
 def speedup_file(speedup_path, current_path, file_name, speed_rate, output_name):
-    shutil.copyfile(os.path.join(current_path, file_name), os.path.join(speedup_path, file_name))
-    new_content = f"PATH={os.path.join(speedup_path, file_name)}\nOPTION=speed\nSPEED={speed_rate}\nLENGTH=3\n"
-    os.chdir(speedup_path)
-    with open("configurationSpeed.txt", 'w') as file:
-        file.write(new_content)
-    import speedup
-    speedup.main()
+    with heavy_stage():
+        speedup.speed(os.path.join(current_path, file_name), speed_rate, os.path.join(current_path, output_name), speedup_path)
 
-    try:
-        os.rename('finalRESULT.mkv', output_name)
-        shutil.move(os.path.join(speedup_path, output_name), os.path.join(current_path, output_name))
-    except FileNotFoundError:
+    if not os.path.exists(os.path.join(current_path, output_name)):
         print(f"File not found finalRESULT.mkv {output_name}")
-    except Exception as e:
-        print(f"{e}: Error reading file")
-
-    try:
-        if os.path.exists(os.path.join(speedup_path, file_name)):
-            os.remove(file_name)  # from root path
-    except FileNotFoundError:
-        print(f"File not found {file_name}")
-        
-    os.chdir(current_path)
 
     return 1
 
 ##
 # @brief  Main function.
-# @param main_path   The working directory path at the end of the process.
+# @param main_path   The path where the temporary files of the acceleration are created.
 # @param input_path   The path where the files are stored.
-# @param voice_else_srt   The name of the subtitle file.
+# @param timeline   The timeline with the voice and else accelerations.
+# @param audio_format   The format of the audio fragments of a podcast (m4a or opus), None for the video fragments.
 ##
-def main(main_path, input_path, voice_else_srt):
+def main(main_path, input_path, timeline, audio_format=None):
     
-    os.chdir(input_path)
-    index = determine_index(voice_else_srt)
-    selective_acc(main_path, input_path, index)
+    selective_acc(main_path, input_path, timeline, audio_format)
     
     return 1
\ No newline at end of file
@@ -7,10 +7,11 @@ in addition to correcting the parameters received from the configuration file if
 fragment, whether it is speech or non-speech and the acceleration factor.
 """
 
-import pysubs2
+import numpy as np
 
 import motionAccelerations
 import voiceAccelerations
+from timeline import VOICE
 
 ## Language in which the subtitles are in
 LANGUAGE_PREFIX = 'es' 
@@ -51,15 +52,30 @@ MIN_ACC_SCENE_DURATION = 0.5
 ## To reduce processing time, optical flow is calculated every %FRAME_SKIP% frames 
 FRAME_SKIP = 5 
 
+## Width in pixels of the frames analysed by the optical flow, they are downscaled by ffmpeg before the analysis (None to analyse them at the size of the movie)
+ANALYSIS_WIDTH = 320
+
+## Threads of OpenCV in each process of the optical flow, the else fragments are analysed in as many processes as groups of OPENCV_THREADS cores
+OPENCV_THREADS = 1
+
 ## Voice constant acceleration if INA is selected, no subtitle analysis to calculate acceleration
 ACC_VOICE_INA = (ACC_VOICE_MAX + ACC_VOICE_MIN)/2 
 
 ## Motion constant acceleration if there is only voice to process (e.g. a podcast)
 ACC_MOTION_CONSTANT = ACC_MOTION_MAX
 
+## Maximum difference between the desired duration and the duration of the plan (seconds)
+DURATION_TOLERANCE = 1
+
+## Minimum factor (inverse of the acceleration) when the plan is adjusted to a desired duration, the maximum acceleration of any segment is 100
+MIN_FACTOR = 0.01
+
+## Maximum number of iterations of the search of the scale of the factors
+MAX_ITERATIONS = 60
+
 ##
 # @brief Function that gets the list of voice accelerations
-# @param voice_else_srt: The file with the voice and else subtitles
+# @param timeline: The compressed voice/else timeline
 # @param film_srt: The file with the film subtitles
 # @param input_path: The path where the files are stored
 # @param target_min_speed: The minimum target speed
@@ -67,16 +83,19 @@ ACC_MOTION_CONSTANT = ACC_MOTION_MAX
 # @param reference: The reference to calculate the acceleration
 # @param acc_max: The maximum acceleration
 # @param acc_min: The minimum acceleration
+# @param n_segs_threshold: The maximum difference between subtitles without being grouped together in seconds
+# @return target_min_speed: The minimum target speed potentially corrected
+# @return target_max_speed: The maximum target speed potentially corrected
+# @return timeline: A copy of the timeline with the factor of the voice segments
 ##
-def voice_speed_list(voice_else_srt, film_srt, input_path, 
+def voice_speed_list(timeline, film_srt, input_path, 
                      target_min_speed, target_max_speed, reference, acc_max, acc_min, n_segs_threshold):
 
-    subs= pysubs2.load(voice_else_srt, encoding= 'UTF-8', format= 'srt')
+    timeline = timeline.copy()
+    voice = np.flatnonzero(timeline.is_kind(VOICE))
     
     if reference == "ina":
-        for sub in subs:
-            if sub.text == "voice":
-                sub.text += str(round(1/ACC_VOICE_INA, N_DECIMALS_ACC))
+        timeline.factor[voice] = round(1/ACC_VOICE_INA, N_DECIMALS_ACC)
     else:
         srt_name = film_srt[:-4]
         df = voiceAccelerations.main(srt_name, LANGUAGE_PREFIX, N_DECIMALS, 
@@ -89,35 +108,31 @@ def voice_speed_list(voice_else_srt, film_srt, input_path,
         df = voiceAccelerations.acc_calculate_csv_format(film_srt[:-4], df, 
                                                          target_min_speed, target_max_speed, N_DECIMALS, input_path)
 
-        for sub in subs:
-            if sub.text == "voice":
-                start_s   = sub.start/1000
-                end_s   = sub.end/1000
-                
-                current_acc = 0
-                n_voice_subs_1s = 0
-                i = 1  
-                while i <= len(df) and df.loc[i, 'end-time-s']<= end_s:
-                    if df.loc[i, 'start-time-s']>= start_s and df.loc[i, 'end-time-s']<= end_s:
-                        current_acc += df.loc[i, 'acceleration-factor-1s']
-                        n_voice_subs_1s += 1
-                    i += 1
-
-                acc = round(n_voice_subs_1s/current_acc, N_DECIMALS_ACC)
-                # acc < 0.1 (10x)
-                if acc < 1/acc_max:
-                    print("acc: " + str(round(1/acc, N_DECIMALS_ACC)) + ", acc > acc_max, acc_max: " + str(acc_max))
-                    acc = 1/acc_max
-                # acc > 1 (1x)
-                if acc > 1/acc_min:
-                    print("acc: " + str(round(1/acc, N_DECIMALS_ACC)) + ", acc < acc_min, acc_min: " + str(acc_min))
-                    acc = 1/acc_min
-
-                sub.text += str(round(acc, N_DECIMALS_ACC))
+        for j in voice:
+            start_s, end_s = timeline.seconds(j)
+            
+            current_acc = 0
+            n_voice_subs_1s = 0
+            i = 1  
+            while i <= len(df) and df.loc[i, 'end-time-s']<= end_s:
+                if df.loc[i, 'start-time-s']>= start_s and df.loc[i, 'end-time-s']<= end_s:
+                    current_acc += df.loc[i, 'acceleration-factor-1s']
+                    n_voice_subs_1s += 1
+                i += 1
+
+            acc = round(n_voice_subs_1s/current_acc, N_DECIMALS_ACC)
+            # acc < 0.1 (10x)
+            if acc < 1/acc_max:
+                print("acc: " + str(round(1/acc, N_DECIMALS_ACC)) + ", acc > acc_max, acc_max: " + str(acc_max))
+                acc = 1/acc_max
+            # acc > 1 (1x)
+            if acc > 1/acc_min:
+                print("acc: " + str(round(1/acc, N_DECIMALS_ACC)) + ", acc < acc_min, acc_min: " + str(acc_min))
+                acc = 1/acc_min
+
+            timeline.factor[j] = round(acc, N_DECIMALS_ACC)
     
-    subs.save(voice_else_srt[:-4]+"_acc.srt")
-    
-    return target_min_speed, target_max_speed
+    return target_min_speed, target_max_speed, timeline
 
 ##
 # @brief Function that applies correction logic for target_speed of voice
@@ -240,10 +255,126 @@ def correct_duraciones(min_video_duration, min_acc_scene_duration, n_segs_thresh
         
     return min_video_duration, min_acc_scene_duration
 
+##
+# @brief Calculates the acceleration of the voice fragments. It does not depend on the motion analysis, so both can run at the same time.
+# @param input_path: The path where the files are stored
+# @param timeline: The compressed voice/else timeline
+# @param film_srt: The subtitle file with the film subtitles
+# @param target_min_speed: The minimum target speed
+# @param target_max_speed: The maximum target speed
+# @param reference: The reference of processing (ina or srt)
+# @param acc_voice_max: The maximum voice acceleration
+# @param acc_voice_min: The minimum voice acceleration
+# @param n_segs_threshold: The maximum difference between subtitles without being grouped together in seconds
+# @return target_min_speed: The minimum target speed potentially corrected
+# @return target_max_speed: The maximum target speed potentially corrected
+# @return timeline: The timeline with the factor of the voice segments
+##
+def voice_accelerations(input_path, timeline, film_srt, target_min_speed, target_max_speed, reference, acc_voice_max, acc_voice_min,
+                        n_segs_threshold):
+    
+    # If there is no subtitle file, there is no need to calculate the acceleration of the voice, it is calculated with a constant value %ACC_VOICE_INA%
+    if not reference == "ina":
+        acc_voice_max, acc_voice_min = correct_acc_voice(acc_voice_max, acc_voice_min)
+    
+    return voice_speed_list(timeline, film_srt, input_path, target_min_speed, target_max_speed, reference, 
+                            acc_voice_max, acc_voice_min, n_segs_threshold)
+
+##
+# @brief Optical flow analysis of the else fragments, saved in motionAccelerations.MOTION_FILE. It does not depend on the voice accelerations.
+# @param input_path: The path where the files are stored
+# @param acc_motion_max: The maximum motion acceleration
+# @param acc_motion_min: The minimum motion acceleration
+# @param flag_podcast: Flag to indicate if the input is a podcast, there is no video to analyse
+# @param movie_name: The name of the movie, to analyse the else segments of the timeline in the movie instead of the else fragments (dry run)
+# @param timeline: The compressed timeline, only used with the movie
+# @param workers: The number of processes of the optical flow, one per group of %OPENCV_THREADS% cores if it is not given
+##
+def motion_analysis(input_path, acc_motion_max, acc_motion_min, flag_podcast, movie_name=None, timeline=None, workers=None):
+    if flag_podcast:
+        return
+    acc_motion_max, acc_motion_min = correct_acc_motion(acc_motion_max, acc_motion_min)
+    motionAccelerations.analyse(input_path, FRAME_SKIP, acc_motion_max, acc_motion_min, movie_name, timeline, ANALYSIS_WIDTH, workers, OPENCV_THREADS)
+
+##
+# @brief Calculates the acceleration of the else fragments from the optical flow analysis and adds them to the timeline with the voice accelerations.
+# @param input_path: The path where the files are stored
+# @param timeline: The timeline with the voice accelerations
+# @param acc_motion_max: The maximum motion acceleration
+# @param acc_motion_min: The minimum motion acceleration
+# @param min_acc_scene_duration: The minimum accelerated scene duration
+# @param min_video_duration: The minimum video duration
+# @param n_segs_threshold: The maximum difference between subtitles without being grouped together in seconds
+# @param flag_podcast: Flag to indicate if the input is a podcast, the motion acceleration is the constant value %ACC_MOTION_CONSTANT%
+# @param movie_name: The name of the movie, if its else segments were analysed instead of the else fragments (dry run)
+# @return timeline: The timeline with the voice and else accelerations
+##
+def motion_accelerations(input_path, timeline, acc_motion_max, acc_motion_min, min_acc_scene_duration, min_video_duration,
+                         n_segs_threshold, flag_podcast, movie_name=None):
+    if not flag_podcast:
+        acc_motion_max, acc_motion_min = correct_acc_motion(acc_motion_max, acc_motion_min)
+        min_video_duration, min_acc_scene_duration = correct_duraciones(min_video_duration, min_acc_scene_duration, n_segs_threshold)
+    
+    return motionAccelerations.apply(input_path, timeline, FRAME_SKIP, acc_motion_max, acc_motion_min, min_acc_scene_duration, min_video_duration,
+                                     flag_podcast, ACC_MOTION_CONSTANT, movie_name)
+
+##
+# @brief Factors of the timeline multiplied by a scale, limited between %MIN_FACTOR% and 1 (or the original factor if it is greater), so no segment is slowed down.
+# @param factor: The factors of the plan
+# @param scale: The scale
+# @return The scaled factors
+##
+def scaled_factors(factor, scale):
+    return np.clip(factor*scale, MIN_FACTOR, np.maximum(factor, 1))
+
+##
+# @brief Adjusts the plan to a desired duration. All the factors (voice and else) are multiplied by the same scale, so the segments keep their relative acceleration, 
+# and the scale is searched by bisection until the predicted duration is within %DURATION_TOLERANCE% of the desired one. The duration is predicted with the factors rounded
+# to %N_DECIMALS_ACC% decimals, as they are rendered. The movie is then rendered only once with the adjusted factors, instead of accelerating the whole summarized movie again.
+# @param timeline: The timeline with the voice and else accelerations
+# @param new_duration: The desired duration in minutes
+# @param tolerance: The maximum difference between the desired and the predicted duration in seconds
+# @return timeline: A copy of the timeline with the adjusted factors
+##
+def fit_duration(timeline, new_duration, tolerance=DURATION_TOLERANCE):
+    timeline = timeline.copy()
+    timeline.factor[np.isnan(timeline.factor)] = 1
+    durations = timeline.durations()
+    target = new_duration*60*1000
+    
+    def factors(scale):
+        return np.round(scaled_factors(timeline.factor, scale), N_DECIMALS_ACC)
+
+    def predicted(scale):
+        return float((durations*factors(scale)).sum())
+    
+    # the predicted duration grows with the scale, from all the segments at %MIN_FACTOR% to all the segments without acceleration
+    low, high = 0, 1/max(float(timeline.factor.min()), MIN_FACTOR)
+    if target <= predicted(low) or target >= predicted(high):
+        scale = low if target <= predicted(low) else high
+        print(f"The desired duration ({new_duration} min) cannot be reached, the closest duration is {round(predicted(scale)/60000, N_DECIMALS_ACC)} min")
+    else:
+        scale = 1
+        for _ in range(MAX_ITERATIONS):
+            if abs(predicted(scale) - target) <= tolerance*1000:
+                break
+            if predicted(scale) < target:
+                low = scale
+            else:
+                high = scale
+            scale = (low + high)/2
+        else:
+            if abs(predicted(scale) - target) > tolerance*1000:
+                print(f"Warning: the duration did not converge in {MAX_ITERATIONS} iterations, the predicted duration differs {round(abs(predicted(scale) - target)/1000, N_DECIMALS_ACC)} seconds from the desired one")
+    
+    timeline.factor = factors(scale)
+    print(f"Factors scaled by {round(scale, N_DECIMALS)}, predicted duration: {round(timeline.output_durations().sum()/60000, N_DECIMALS_ACC)} min")
+    return timeline
+
 ##  
 # @brief Main function that calculates the acceleration of the voice and the motion
 # @param input_path: The path where the files are stored
-# @param voice_else_srt: The subtitle file with the voice and else subtitles
+# @param timeline: The compressed voice/else timeline
 # @param film_srt: The subtitle file with the film subtitles
 # @param target_min_speed: The minimum target speed
 # @param target_max_speed: The maximum target speed
@@ -258,12 +389,11 @@ def correct_duraciones(min_video_duration, min_acc_scene_duration, n_segs_thresh
 # @param flag_podcast: Flag to indicate if the input is a podcast, if it is, the motion acceleration is calculated with a constant value (%ACC_MOTION_CONSTANT%)
 # @return target_min_speed: The minimum target speed potentially corrected
 # @return target_max_speed: The maximum target speed potentially corrected
+# @return timeline: The timeline with the voice and else accelerations
 ##
-def main(input_path, voice_else_srt, film_srt, target_min_speed, target_max_speed, reference, acc_voice_max, 
+def main(input_path, timeline, film_srt, target_min_speed, target_max_speed, reference, acc_voice_max, 
          acc_voice_min, acc_motion_min, acc_motion_max, min_acc_scene_duration, min_video_duration, n_segs_threshold, flag_podcast):
 
-    new_voice_else_srt = voice_else_srt[:-4]+"_acc.srt"
-    
     # If it is a podcast, the motion acceleration is calculated with a constant value and the duration of the video segments and the accelerated scenes aren´t used, there is no video track.
     if not flag_podcast:
         acc_motion_max, acc_motion_min = correct_acc_motion(acc_motion_max, acc_motion_min)
@@ -273,10 +403,10 @@ def main(input_path, voice_else_srt, film_srt, target_min_speed, target_max_spee
     if not reference == "ina":
         acc_voice_max, acc_voice_min = correct_acc_voice(acc_voice_max, acc_voice_min)
     
-    target_min_speed, target_max_speed = voice_speed_list(voice_else_srt, film_srt, input_path, target_min_speed, 
-                                                          target_max_speed, reference, acc_voice_max, acc_voice_min, n_segs_threshold)
+    target_min_speed, target_max_speed, timeline = voice_speed_list(timeline, film_srt, input_path, target_min_speed, 
+                                                                    target_max_speed, reference, acc_voice_max, acc_voice_min, n_segs_threshold)
     
-    motionAccelerations.main(input_path, new_voice_else_srt, FRAME_SKIP, acc_motion_max, acc_motion_min, 
-                             min_acc_scene_duration, min_video_duration, flag_podcast, ACC_MOTION_CONSTANT)
+    timeline = motionAccelerations.main(input_path, timeline, FRAME_SKIP, acc_motion_max, acc_motion_min, 
+                                        min_acc_scene_duration, min_video_duration, flag_podcast, ACC_MOTION_CONSTANT)
     
-    return target_min_speed, target_max_speed
+    return target_min_speed, target_max_speed, timeline
@@ -0,0 +1,112 @@
+"""
+Processing of podcasts (audio only)
+
+A podcast has no video track, so it is processed directly on the audio: the fragments of the timeline are cut from the audio file, each fragment is accelerated with the
+atempo filter of ffmpeg and the accelerated fragments are joined in one audio file. No video is encoded nor decoded.
+
+The fragments and the result are written in the format chosen for the job: m4a (AAC) or opus. Their names are the same as the names of the video fragments, with the
+extension of the format ({index}else.m4a, {index}voice0.588.m4a, {index}.m4a...), and the result is merged_audio.{format}.
+"""
+
+import os
+import subprocess
+
+import tracing
+
+## Encoder of each audio format
+AUDIO_CODECS = {'m4a': 'aac', 'opus': 'libopus'}
+
+## Format of the podcasts when no other is given
+AUDIO_FORMAT = 'm4a'
+
+## Name of the joined audio file, without extension
+MERGED_AUDIO = 'merged_audio'
+
+## Maximum tempo of one atempo filter, faster tempos are obtained with several filters
+MAX_TEMPO = 2.0
+
+##
+# @brief  Obtains the duration of an audio file with ffprobe.
+# @param audio_file   The path of the audio file.
+# @return  The duration in seconds.
+##
+def duration(audio_file):
+    result = tracing.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
+         audio_file], capture_output=True, text=True)
+    return float(result.stdout.strip())
+
+##
+# @brief  Arguments of ffmpeg to encode the audio in a format.
+# @param audio_format   The format (m4a or opus).
+# @return  The list of arguments.
+##
+def codec_arguments(audio_format):
+    if audio_format not in AUDIO_CODECS:
+        raise Exception(f"Invalid input - audio format {audio_format}, it must be one of {', '.join(AUDIO_CODECS)}")
+    return ['-vn', '-sn', '-c:a', AUDIO_CODECS[audio_format]]
+
+##
+# @brief  Filter that changes the tempo of the audio, chaining atempo filters so none of them is faster than %MAX_TEMPO%.
+# @param factor   The factor of the segment, the inverse of the acceleration.
+# @return  The text of the filter.
+##
+def tempo_filter(factor):
+    tempo = 1/factor
+    filters = []
+    while tempo > MAX_TEMPO:
+        filters.append(f'atempo={MAX_TEMPO}')
+        tempo /= MAX_TEMPO
+    filters.append(f'atempo={tempo}')
+    return ','.join(filters)
+
+##
+# @brief  Cuts a fragment of the audio file.
+# @param audio_file   The path of the audio file.
+# @param start   The start time in seconds.
+# @param end   The end time in seconds.
+# @param output_file   The path of the fragment.
+# @param audio_format   The format of the fragment (m4a or opus).
+##
+def cut(audio_file, start, end, output_file, audio_format=AUDIO_FORMAT):
+    tracing.run(['ffmpeg', '-y', '-ss', str(start), '-to', str(end), '-i', audio_file] + codec_arguments(audio_format) + [output_file],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+##
+# @brief  Accelerates an audio fragment.
+# @param audio_file   The path of the fragment.
+# @param factor   The factor of the segment, the inverse of the acceleration.
+# @param output_file   The path of the accelerated fragment.
+# @param audio_format   The format of the accelerated fragment (m4a or opus).
+##
+def accelerate(audio_file, factor, output_file, audio_format=AUDIO_FORMAT):
+    tracing.run(['ffmpeg', '-y', '-i', audio_file, '-af', tempo_filter(factor)] + codec_arguments(audio_format) + [output_file],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+##
+# @brief  Cuts and accelerates a fragment of the audio file in one step, without writing the cut fragment (virtual fragments).
+# @param audio_file   The path of the audio file.
+# @param start   The start time in seconds.
+# @param end   The end time in seconds.
+# @param factor   The factor of the segment, the inverse of the acceleration.
+# @param output_file   The path of the accelerated fragment.
+# @param audio_format   The format of the accelerated fragment (m4a or opus).
+# @return  The result of ffmpeg.
+##
+def render(audio_file, start, end, factor, output_file, audio_format=AUDIO_FORMAT):
+    return tracing.run(['ffmpeg', '-y', '-ss', str(start), '-to', str(end), '-i', audio_file, '-af', tempo_filter(factor)] + codec_arguments(audio_format)
+                       + [output_file], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+##
+# @brief  Joins the audio fragments without encoding them again.
+# @param audio_files   The paths of the fragments, in order.
+# @param output_file   The path of the joined file.
+# @param list_file   The path of the list of fragments read by ffmpeg.
+##
+def concatenate(audio_files, output_file, list_file):
+    with open(list_file, 'w') as output:
+        for audio_file in audio_files:
+            output.write(f"file '{audio_file}'\n")
+    result = tracing.run(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_file, '-c', 'copy', output_file], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Error joining the audio fragments in {os.path.basename(output_file)}: {result.stderr}")
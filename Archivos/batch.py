@@ -0,0 +1,185 @@
+"""
+Processing of several movies at the same time
+
+A manifest (JSON lines file) lists the movies to be processed, one JSON object per line:
+
+    {"movie": "movies/film1.mp4", "srt_file": "movies/film1.srt", "reference": "srt", "target_duration": "01:10:00.000"}
+
+Only ''movie'' is required, the rest of the keys are values of JobConfig (job.py) that replace the ones of the configuration file, and ''name'' can be used to name the job
+(the movie name without extension by default). Relative paths are relative to the manifest. The name of each job must be unique, as it is the name of its folder.
+
+Each movie has its own folder <root>/<name>, with the ''input'' folder expected by tozip and Restart (the movie and its subtitle file are copied there) and a ''program'' folder
+used as main_path. The jobs are run on a pool of processes and the number of CPU-heavy stages running at the same time is limited (stage_limiter.py).
+The result of every job (success or failure, execution time of each stage and generated files) is written to a JSON report.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from job import CONFIG_FILE, from_configfile
+from stage_limiter import init_limiter
+
+## Number of movies processed at the same time
+N_JOBS = 4
+
+## Number of CPU-heavy stages (all-keyframe encode, optical flow, speedup encodes) running at the same time in the whole batch
+N_HEAVY_STAGES = 8
+
+## Name of the report with the results of all the jobs
+REPORT_FILE = 'batch_report.json'
+
+##
+# @brief  Reads the manifest, skipping empty lines and comments (#).
+# @param manifest   The name of the manifest file.
+# @return  The list of entries of the manifest, with the paths made absolute.
+##
+def read_manifest(manifest):
+    base_path = os.path.dirname(os.path.abspath(manifest))
+    entries = []
+    with open(manifest, 'r', encoding='utf8') as file:
+        for number, line in enumerate(file, start=1):
+            if line.startswith('#') or not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'movie' not in entry:
+                raise Exception(f"Invalid manifest - line {number} has no movie")
+            entry['movie'] = os.path.join(base_path, entry['movie'])
+            if entry.get('srt_file') and entry['srt_file'] != '-':
+                entry['srt_file'] = os.path.join(base_path, entry['srt_file'])
+            entries.append(entry)
+    return entries
+
+##
+# @brief  Name of the job of an entry of the manifest, also the name of its folder.
+# @param entry   The entry of the manifest.
+# @return  The ''name'' of the entry, the movie name without extension by default.
+##
+def job_name(entry):
+    return entry.get('name') or os.path.splitext(os.path.basename(entry['movie']))[0]
+
+##
+# @brief  Creates the folders of a job and copies the movie (and its subtitle file) into its input folder.
+# @param root   The folder where the folders of all the jobs are created.
+# @param entry   The entry of the manifest.
+# @param config_file   The configuration file with the default values of every job.
+# @return  The JobConfig of the job.
+##
+def prepare_job(root, entry, config_file):
+    entry = dict(entry)
+    name = job_name(entry)
+    entry.pop('name', None)
+    movie = entry.pop('movie')
+    movie_name = os.path.basename(movie)
+
+    input_path = os.path.join(root, name, 'input')
+    main_path = os.path.join(root, name, 'program')
+    os.makedirs(input_path, exist_ok=True)
+    os.makedirs(main_path, exist_ok=True)
+
+    if not os.path.exists(os.path.join(input_path, movie_name)):
+        shutil.copyfile(movie, os.path.join(input_path, movie_name))
+    srt_file = entry.pop('srt_file', None)
+    if srt_file and srt_file != '-':
+        shutil.copyfile(srt_file, os.path.join(input_path, os.path.basename(srt_file)))
+        srt_file = os.path.basename(srt_file)
+
+    entry.setdefault('original_title', name)
+    return from_configfile(config_file, input_path=input_path, main_path=main_path, movie_name=movie_name,
+                           srt_file=srt_file, **entry)
+
+##
+# @brief  Processes one job in a process of the pool. The errors are returned in the report instead of raised, so one movie does not stop the batch.
+# @param job   The JobConfig of the movie.
+# @return  Dictionary with the result of the job.
+##
+def run_job(job):
+    import main
+
+    report = {'name': job.original_title, 'movie': os.path.join(job.input_path, job.movie_name)}
+    start_time = time.time()
+    try:
+        result = main.run(job)
+        report['status'] = 'failed' if result.errors else 'ok'
+        report['errors'] = result.errors
+        report['timings'] = result.timings
+        report['outputs'] = result.outputs
+    except Exception as e:
+        report['status'] = 'failed'
+        report['errors'] = {'run': str(e)}
+        report['traceback'] = traceback.format_exc()
+    report['execution_time'] = time.time() - start_time
+    return report
+
+##
+# @brief  Processes all the movies of the manifest on a pool of processes.
+# @param manifest   The name of the manifest file.
+# @param root   The folder where the folders of all the jobs are created.
+# @param config_file   The configuration file with the default values of every job.
+# @param n_jobs   The number of movies processed at the same time.
+# @param n_heavy_stages   The number of CPU-heavy stages running at the same time.
+# @return  The list with the result of each job, at the position of its entry in the manifest. Two entries with the same name would share the folder of the job,
+# so only the first one is processed and the others fail.
+##
+def run_batch(manifest, root, config_file=CONFIG_FILE, n_jobs=N_JOBS, n_heavy_stages=N_HEAVY_STAGES):
+    root = os.path.abspath(root)
+    config_file = os.path.abspath(config_file)
+    entries = read_manifest(manifest)
+    reports = [None] * len(entries)
+    jobs = []
+    positions = []
+    names = {}
+    for position, entry in enumerate(entries):
+        name = job_name(entry)
+        try:
+            if name in names:
+                raise Exception(f"the folder {name} is already used by {entries[names[name]]['movie']}, give the entry a different name")
+            names[name] = position
+            jobs.append(prepare_job(root, entry, config_file))
+            positions.append(position)
+        except Exception as e:
+            print(f"An error occurred preparing {entry['movie']}:", e)
+            reports[position] = {'name': name, 'movie': entry['movie'], 'status': 'failed', 'errors': {'prepare': str(e)}}
+
+    # Every job runs in a new process: the trace of tracing.py and the limiter of stage_limiter.py are globals of their modules (the limiter is set by the initializer),
+    # and spawn does not copy the threads and locks of the stages of another job
+    context = multiprocessing.get_context('spawn')
+    semaphore = context.Semaphore(n_heavy_stages)
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context, initializer=init_limiter, initargs=(semaphore,),
+                             max_tasks_per_child=1) as executor:
+        for position, report in zip(positions, executor.map(run_job, jobs)):
+            print(f"{report['name']}: {report['status']} ({report['execution_time']:.1f} seconds)")
+            reports[position] = report
+
+    return reports
+
+##
+# @brief  Main function, processes the manifest given in the command line and writes the report.
+# @param argv   The list of arguments, sys.argv[1:] by default.
+##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processing of several movies at the same time")
+    parser.add_argument('manifest', help="JSON lines file with the movies to be processed")
+    parser.add_argument('--root', default='batch', help="folder where the folders of the jobs are created (default: batch)")
+    parser.add_argument('--config', default=CONFIG_FILE, help="configuration file with the default values of every job")
+    parser.add_argument('--jobs', type=int, default=N_JOBS, help=f"movies processed at the same time (default: {N_JOBS})")
+    parser.add_argument('--heavy-stages', type=int, default=N_HEAVY_STAGES,
+                        help=f"CPU-heavy stages running at the same time (default: {N_HEAVY_STAGES})")
+    parser.add_argument('--report', default=REPORT_FILE, help=f"JSON report with the results (default: {REPORT_FILE})")
+    args = parser.parse_args(argv)
+
+    reports = run_batch(args.manifest, args.root, args.config, args.jobs, args.heavy_stages)
+    with open(args.report, 'w', encoding='utf8') as file:
+        json.dump(reports, file, indent=2, default=str)
+
+    n_failed = sum(1 for report in reports if report['status'] != 'ok')
+    print(f"{len(reports) - n_failed} jobs completed, {n_failed} failed. Report: {args.report}")
+    return reports
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Benchmark of the stages of the processing on synthetic movies
+
+The test movies are generated locally with the lavfi sources of ffmpeg, so the benchmark can be repeated on any machine without downloading anything: the video is a testsrc2
+pattern (it has moving elements, so the optical flow is not zero) and the audio is a tone mixed with pink noise. A subtitle file in Spanish (LANGUAGE_PREFIX of accelCalculator)
+is generated with the movie, with lines of different duration separated by short and long gaps, so there are voice and else fragments of every kind.
+
+Each case (length x resolution) is processed with main.run, with the checkpoints disabled and one stage at a time, and the execution time of every stage is taken from the trace
+(tracing.py): wall time, CPU time (exact, as the stages run one at a time) and the peak memory of the program at the end of the stage, which is the peak since the
+start of the benchmark and not the memory of the stage alone (tracing.py). The results are written to a JSON report that can be stored as baseline and compared with later executions:
+
+    python benchmark.py --lengths 60 300 --resolutions 640x360 1280x720 --report bench_report.json
+    python benchmark.py --baseline bench_baseline.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import time
+
+import tracing
+from job import JobConfig
+
+## Lengths of the test movies (seconds)
+LENGTHS = (60, 300)
+
+## Resolutions of the test movies
+RESOLUTIONS = ('640x360', '1280x720')
+
+## Frame rate of the test movies
+FPS = 25
+
+## Seed of the generation of the subtitles, the same files are generated in every execution
+SEED = 1
+
+## Relative increase of the time of a stage considered a regression when comparing with the baseline
+TOLERANCE = 0.1
+
+## Stages whose wall time is shorter than this value are not compared (seconds), their variation is mostly noise
+MIN_COMPARED_TIME = 0.5
+
+## Name of the report with the results
+REPORT_FILE = 'bench_report.json'
+
+## Lines of the generated subtitle file
+LINES = ("Hola, ¿cómo estás? Hace mucho tiempo que no nos vemos.", "No sé qué decirte, la verdad es que estoy muy cansado.",
+         "Vamos a la playa mañana por la tarde con los niños.", "¿Has visto la película que pusieron ayer en la televisión?",
+         "Creo que deberíamos volver a casa antes de que llueva.", "Me encanta este lugar, siempre me trae buenos recuerdos.")
+
+##
+# @brief  Converts a time in milliseconds to the srt format.
+# @param ms   The time in milliseconds.
+# @return  The time as hh:mm:ss,mmm.
+##
+def srt_time(ms):
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02},{ms % 1000:03}"
+
+##
+# @brief  Generates the subtitle file of a test movie: lines of 1-4 seconds separated by gaps of 0.2-6 seconds.
+# @param path   The path of the srt file.
+# @param length   The length of the movie in seconds.
+##
+def generate_srt(path, length):
+    rng = random.Random(SEED)
+    start = rng.randint(500, 3000)
+    index = 1
+    with open(path, 'w', encoding='utf8') as file:
+        while True:
+            end = start + rng.randint(1000, 4000)
+            if end >= length * 1000 - 1000:
+                break
+            file.write(f"{index}\n{srt_time(start)} --> {srt_time(end)}\n{rng.choice(LINES)}\n\n")
+            index += 1
+            # short gaps are joined with the previous line by Format_srt, long ones are else fragments
+            start = end + rng.choice((rng.randint(200, 900), rng.randint(1500, 6000)))
+
+##
+# @brief  Generates a test movie with ffmpeg and its subtitle file, they are not generated again if they already exist.
+# @param folder   The folder where the media is stored.
+# @param length   The length of the movie in seconds.
+# @param resolution   The resolution of the movie (WxH).
+# @return  The paths of the movie and the subtitle file.
+##
+def generate_media(folder, length, resolution):
+    os.makedirs(folder, exist_ok=True)
+    movie = os.path.join(folder, f"test_{length}s_{resolution}.mp4")
+    srt = os.path.join(folder, f"test_{length}s.srt")
+    if not os.path.exists(movie):
+        command = ['ffmpeg', '-y', '-loglevel', 'error',
+                   '-f', 'lavfi', '-i', f'testsrc2=size={resolution}:rate={FPS}:duration={length}',
+                   '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={length}',
+                   '-f', 'lavfi', '-i', f'anoisesrc=color=pink:amplitude=0.2:sample_rate=44100:duration={length}',
+                   '-filter_complex', '[1:a][2:a]amix=inputs=2[a]', '-map', '0:v', '-map', '[a]',
+                   '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(2 * FPS), '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-shortest', movie + '.part.mp4']
+        result = tracing.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"The test movie could not be generated: {result.stderr}")
+        os.replace(movie + '.part.mp4', movie)
+    if not os.path.exists(srt):
+        generate_srt(srt, length)
+    return movie, srt
+
+##
+# @brief  Processes a test movie with main.run and takes the execution time of every stage from the trace.
+# @param work_path   The folder of the case, the job folders are created inside it.
+# @param movie   The path of the test movie.
+# @param srt   The path of its subtitle file.
+# @return  Dictionary with the wall time, CPU time and peak memory of the program at the end of every stage, the total time and the errors.
+##
+def run_case(work_path, movie, srt):
+    import main
+
+    if os.path.exists(work_path):
+        shutil.rmtree(work_path)
+    input_path = os.path.join(work_path, 'input')
+    main_path = os.path.join(work_path, 'program')
+    os.makedirs(input_path)
+    os.makedirs(main_path)
+    shutil.copyfile(movie, os.path.join(input_path, os.path.basename(movie)))
+    shutil.copyfile(srt, os.path.join(input_path, 'pelicula.srt'))
+
+    # the values of the configuration are left empty, each module takes its default value
+    job = JobConfig(input_path, main_path, os.path.basename(movie), reference='srt', srt_file='pelicula.srt', checkpoints=False, workers=1)
+    start_time = time.perf_counter()
+    result = main.run(job)
+    total = time.perf_counter() - start_time
+
+    stages = {}
+    for record in tracing.events():
+        if record['cat'] == 'stage':
+            stages[record['name']] = {'wall': record['wall'], 'cpu': record['cpu'], 'process_peak_rss': record['process_peak_rss'],
+                                      'subprocesses': record['subprocesses']}
+    return {'stages': stages, 'total': total, 'errors': result.errors}
+
+##
+# @brief  Keeps the fastest execution of each stage of several repetitions of a case.
+# @param runs   The results of run_case.
+# @return  The result with the minimum of every value.
+##
+def best_of(runs):
+    best = {'stages': {}, 'total': min(run['total'] for run in runs), 'errors': {}}
+    for run in runs:
+        best['errors'].update(run['errors'])
+        for name, values in run['stages'].items():
+            if name not in best['stages'] or values['wall'] < best['stages'][name]['wall']:
+                best['stages'][name] = values
+    return best
+
+##
+# @brief  Version of ffmpeg, written in the report so the results of different machines are not compared by mistake.
+# @return  The first line of ffmpeg -version, None if ffmpeg is not available.
+##
+def ffmpeg_version():
+    try:
+        result = tracing.run(['ffmpeg', '-version'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.splitlines()[0] if result.stdout else None
+
+##
+# @brief  Runs all the cases of the benchmark.
+# @param work_path   The folder where the media and the job folders are created.
+# @param lengths   The lengths of the test movies (seconds).
+# @param resolutions   The resolutions of the test movies.
+# @param repeat   The number of executions of each case, the fastest one is kept.
+# @return  The report with the environment and the results of every case.
+##
+def run_benchmark(work_path, lengths=LENGTHS, resolutions=RESOLUTIONS, repeat=1):
+    work_path = os.path.abspath(work_path)
+    report = {'environment': {'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                              'ffmpeg': ffmpeg_version()},
+              'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'cases': {}}
+    for length in lengths:
+        for resolution in resolutions:
+            name = f"{length}s_{resolution}"
+            print(f"\n------- Benchmark case {name} ------\n")
+            movie, srt = generate_media(os.path.join(work_path, 'media'), length, resolution)
+            runs = [run_case(os.path.join(work_path, name), movie, srt) for _ in range(max(1, repeat))]
+            report['cases'][name] = dict(best_of(runs), length=length, resolution=resolution)
+    return report
+
+##
+# @brief  Compares the report with a baseline, stage by stage.
+# @param report   The report of the current execution.
+# @param baseline   The report used as reference.
+# @param tolerance   The relative increase of the wall time considered a regression.
+# @return  The list of comparisons (case, stage, baseline time, current time, ratio, regression) of the stages present in both reports.
+##
+def compare(report, baseline, tolerance=TOLERANCE):
+    rows = []
+    for case, result in report['cases'].items():
+        reference = baseline['cases'].get(case)
+        if reference is None:
+            continue
+        for stage, values in result['stages'].items():
+            if stage not in reference['stages']:
+                continue
+            old = reference['stages'][stage]['wall']
+            new = values['wall']
+            ratio = new / old if old > 0 else float('inf')
+            regression = max(old, new) >= MIN_COMPARED_TIME and ratio > 1 + tolerance
+            rows.append((case, stage, old, new, ratio, regression))
+        rows.append((case, 'total', reference['total'], result['total'], result['total'] / reference['total'],
+                     result['total'] / reference['total'] > 1 + tolerance))
+    return rows
+
+##
+# @brief  Prints the comparison with the baseline as a table.
+# @param rows   The comparisons returned by compare.
+##
+def print_comparison(rows):
+    print(f"{'case':<18}{'stage':<24}{'baseline (s)':>14}{'current (s)':>14}{'ratio':>9}")
+    for case, stage, old, new, ratio, regression in rows:
+        print(f"{case:<18}{stage:<24}{old:>14.3f}{new:>14.3f}{ratio:>9.2f}{'  REGRESSION' if regression else ''}")
+
+##
+# @brief  Main function, runs the benchmark, writes the report and compares it with the baseline if it is given.
+# @param argv   The list of arguments, sys.argv[1:] by default.
+# @return  0 if there are no regressions, 1 otherwise.
+##
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the stages of the processing on synthetic movies")
+    parser.add_argument('--work', default='benchmark', help="folder where the test movies and the job folders are created (default: benchmark)")
+    parser.add_argument('--lengths', type=int, nargs='+', default=list(LENGTHS), help="lengths of the test movies in seconds")
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), help="resolutions of the test movies (WxH)")
+    parser.add_argument('--repeat', type=int, default=1, help="executions of each case, the fastest one is kept (default: 1)")
+    parser.add_argument('--report', default=REPORT_FILE, help=f"JSON report with the results (default: {REPORT_FILE})")
+    parser.add_argument('--baseline', help="report of a previous execution to compare with")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f"relative increase of time considered a regression (default: {TOLERANCE})")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.work, args.lengths, args.resolutions, args.repeat)
+    with open(args.report, 'w', encoding='utf8') as file:
+        json.dump(report, file, indent=2, default=str)
+    print(f"Report: {args.report}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf8') as file:
+            baseline = json.load(file)
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows)
+        if any(row[5] for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Checkpoints of the stages of the processing
+
+After each stage of main.run, a manifest is written in the folder ''.checkpoints'' of the input folder with the SHA-256 of the input files of the stage, its parameters,
+the SHA-256 of its output files and the value returned by the stage (the timelines of timeline.py and the keyframe indexes of keyframes.py are stored in the manifest, they are not files).
+
+When the processing is run again, a stage is skipped if its manifest has the same input hashes and parameters and all its output files are still there, unchanged. As the inputs
+of a stage are the outputs of the previous ones, changing a parameter only reruns the stage that uses it and the stages whose inputs change because of it, the rest are skipped.
+
+Hashing a whole movie takes a few seconds, so the hashes are also kept in ''.checkpoints/hashes.json'' by size and modification time, and a file is only read again if it changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+from keyframes import KeyframeIndex
+from timeline import Timeline
+
+## Folder inside the input folder where the manifests are stored
+CHECKPOINT_FOLDER = '.checkpoints'
+
+## File with the hashes already calculated, by path, size and modification time
+HASH_CACHE = 'hashes.json'
+
+## Size of the blocks read to calculate the hashes (bytes)
+BLOCK_SIZE = 1 << 20
+
+##
+# @brief  Converts the value returned by a stage to JSON, the timelines (timeline.py) are stored as dictionaries and the keyframe indexes (keyframes.py) as lists.
+# @param value   The value returned by the stage.
+# @return  The value that can be written in the manifest.
+##
+def encode_value(value):
+    if isinstance(value, Timeline):
+        return {'timeline': value.to_dict()}
+    if isinstance(value, KeyframeIndex):
+        return {'keyframes': value.to_list()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+##
+# @brief  Converts a value read from a manifest back to the value returned by the stage.
+# @param value   The value of the manifest.
+# @return  The value returned by the stage.
+##
+def decode_value(value):
+    if isinstance(value, dict) and list(value) == ['timeline']:
+        return Timeline.from_dict(value['timeline'])
+    if isinstance(value, dict) and list(value) == ['keyframes']:
+        return KeyframeIndex(value['keyframes'])
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    return value
+
+##
+# @brief Manifests of the stages of one job, stored in the input folder of the job.
+##
+class Checkpoint:
+
+    ##
+    # @brief  Loads the hashes already calculated for the job.
+    # @param input_path   The path where the files of the job are stored.
+    ##
+    def __init__(self, input_path):
+        self.input_path = input_path
+        self.folder = os.path.join(input_path, CHECKPOINT_FOLDER)
+        os.makedirs(self.folder, exist_ok=True)
+        self.hash_cache_file = os.path.join(self.folder, HASH_CACHE)
+        try:
+            with open(self.hash_cache_file, 'r', encoding='utf8') as file:
+                self.hash_cache = json.load(file)
+        except (FileNotFoundError, ValueError):
+            self.hash_cache = {}
+        self.hash_cache_changed = False
+        # the stages of the job can run at the same time (dag.py)
+        self.lock = threading.Lock()
+
+    ##
+    # @brief  Calculates the SHA-256 of a file, or takes it from the cache if the file has the same size and modification time.
+    # @param path   The path of the file.
+    # @return  The hexadecimal hash, None if the file does not exist.
+    ##
+    def file_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = f"{stat.st_size}:{stat.st_mtime_ns}"
+        cached = self.hash_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        with self.lock:
+            self.hash_cache[path] = [key, digest]
+            self.hash_cache_changed = True
+        return digest
+
+    ##
+    # @brief  Writes the hashes calculated since the last time, so they are not calculated again in the next execution.
+    ##
+    def save_hash_cache(self):
+        with self.lock:
+            if self.hash_cache_changed:
+                with open(self.hash_cache_file, 'w', encoding='utf8') as file:
+                    json.dump(self.hash_cache, file)
+                self.hash_cache_changed = False
+
+    ##
+    # @brief  Obtains the files of the input folder given by name or by a regular expression (compiled with re.compile), e.g. all the fragments of a stage.
+    # @param files   The list of names and patterns.
+    # @return  Sorted list with the names of the files.
+    ##
+    def resolve(self, files):
+        names = []
+        listing = None
+        for item in files:
+            if isinstance(item, re.Pattern):
+                if listing is None:
+                    listing = sorted(os.listdir(self.input_path))
+                names += [name for name in listing if item.fullmatch(name)]
+            else:
+                names.append(item)
+        return sorted(set(names))
+
+    ##
+    # @brief  Calculates the hashes of a list of files of the input folder.
+    # @param files   The list of names and patterns.
+    # @return  Dictionary with the hash of each file (None if it does not exist).
+    ##
+    def hashes(self, files):
+        return {name: self.file_hash(os.path.join(self.input_path, name)) for name in self.resolve(files)}
+
+    ##
+    # @brief  Path of the manifest of a stage.
+    # @param stage   The name of the stage.
+    # @return  The path of the manifest.
+    ##
+    def manifest_path(self, stage):
+        return os.path.join(self.folder, f"{stage}.json")
+
+    ##
+    # @brief  Loads the manifest of a stage.
+    # @param stage   The name of the stage.
+    # @return  The manifest, None if the stage was never completed.
+    ##
+    def load(self, stage):
+        try:
+            with open(self.manifest_path(stage), 'r', encoding='utf8') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    ##
+    # @brief  Checks if a stage can be skipped: same input hashes and parameters as the last time it was completed, and the same output files.
+    # @param stage   The name of the stage.
+    # @param inputs   The list of names and patterns of the input files.
+    # @param params   The parameters of the stage (JSON serializable).
+    # @return  True and the value returned by the stage if it can be skipped, False and None otherwise.
+    ##
+    def lookup(self, stage, inputs, params):
+        manifest = self.load(stage)
+        if manifest is None:
+            return False, None
+        if manifest['params'] != json.loads(json.dumps(params, default=str)):
+            return False, None
+        complete = manifest['inputs'] == self.hashes(inputs)
+        if complete:
+            for name, digest in manifest['outputs'].items():
+                if self.file_hash(os.path.join(self.input_path, name)) != digest:
+                    complete = False
+                    break
+        self.save_hash_cache()
+        if not complete:
+            return False, None
+        return True, decode_value(manifest['value'])
+
+    ##
+    # @brief  Removes the manifest and the output files of the last execution of a stage, before running it again, so no stale fragment is used by the next stages.
+    # @param stage   The name of the stage.
+    ##
+    def clear(self, stage):
+        manifest = self.load(stage)
+        if manifest is None:
+            return
+        for name in manifest['outputs']:
+            try:
+                os.remove(os.path.join(self.input_path, name))
+            except OSError:
+                pass
+        os.remove(self.manifest_path(stage))
+
+    ##
+    # @brief  Checks that a stage created its output files before it is recorded as completed: the patterns match whatever files exist, so a stage that failed halfway
+    # would be recorded with only part of its fragments.
+    # @param stage   The name of the stage.
+    # @param outputs   The list of names and patterns of the output files.
+    # @param expected   The minimum number of files that the patterns must match (e.g. one fragment for each segment cut), None to not count them.
+    ##
+    def check_outputs(self, stage, outputs, expected=None):
+        missing = [item for item in outputs if not isinstance(item, re.Pattern) and not os.path.exists(os.path.join(self.input_path, item))]
+        if missing:
+            raise Exception(f"{stage} did not create {', '.join(missing)}")
+        if expected is not None:
+            found = len(self.resolve([item for item in outputs if isinstance(item, re.Pattern)]))
+            if found < expected:
+                raise Exception(f"{stage} created {found} files of the {expected} expected")
+
+    ##
+    # @brief  Writes the manifest of a completed stage, after checking its output files (check_outputs).
+    # @param stage   The name of the stage.
+    # @param inputs   The list of names and patterns of the input files.
+    # @param params   The parameters of the stage (JSON serializable).
+    # @param outputs   The list of names and patterns of the output files.
+    # @param value   The value returned by the stage (JSON serializable).
+    # @param expected   The minimum number of files that the patterns of the outputs must match, None to not count them.
+    ##
+    def save(self, stage, inputs, params, outputs, value, expected=None):
+        self.check_outputs(stage, outputs, expected)
+        manifest = {
+            'stage': stage,
+            'inputs': self.hashes(inputs),
+            'params': params,
+            'outputs': self.hashes(outputs),
+            'value': encode_value(value),
+        }
+        with open(self.manifest_path(stage), 'w', encoding='utf8') as file:
+            json.dump(manifest, file, indent=1, default=str)
+        self.save_hash_cache()
@@ -0,0 +1,90 @@
+"""
+Execution of the stages of the processing as a dependency graph
+
+Each stage is a Task with the names of the stages it needs. A stage starts as soon as all the stages it depends on are completed, so stages that do not depend on each other
+(e.g. the frame detection and the inaSpeechSegmenter analysis, or the voice accelerations and the optical flow of the else fragments) run at the same time on a pool of threads.
+The stages spend most of their time in ffmpeg, ffprobe and OpenCV, which release the GIL.
+
+An error in a stage is handled by the stage itself (main.run_stage), the stages that depend on it still run, as in the sequential processing. If a stage raises an error,
+no more stages are started and the error is raised once the running stages finish.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+## Number of stages running at the same time when no other value is given
+N_WORKERS = 4
+
+##
+# @brief Stage of the dependency graph.
+##
+@dataclass
+class Task:
+    ## Name of the stage, used by the rest of the stages to depend on it
+    name: str
+    ## Function of the stage, called without arguments
+    function: Callable
+    ## Names of the stages that must be completed before this one starts
+    deps: Tuple[str, ...] = ()
+
+##
+# @brief  Checks that all the dependencies exist and that there are no cycles.
+# @param tasks   The list of tasks.
+##
+def check_graph(tasks):
+    names = {task.name for task in tasks}
+    if len(names) != len(tasks):
+        raise Exception("Invalid graph - repeated stage names")
+    for task in tasks:
+        for dep in task.deps:
+            if dep not in names:
+                raise Exception(f"Invalid graph - {task.name} depends on unknown stage {dep}")
+
+    pending = {task.name: set(task.deps) for task in tasks}
+    while pending:
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            raise Exception(f"Invalid graph - cycle between {', '.join(sorted(pending))}")
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+##
+# @brief  Runs the tasks as soon as their dependencies are completed, with at most max_workers tasks at the same time.
+# @param tasks   The list of tasks, the tasks ready at the same time are started in the order of the list.
+# @param max_workers   The number of tasks running at the same time, 1 runs the tasks one after the other.
+# @return  Dictionary with the value returned by each task.
+##
+def run_dag(tasks, max_workers=N_WORKERS):
+    check_graph(tasks)
+    values = {}
+    pending = list(tasks)
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            if error is None:
+                for task in list(pending):
+                    if len(running) >= max(1, max_workers):
+                        break
+                    if all(dep in values for dep in task.deps):
+                        pending.remove(task)
+                        running[executor.submit(task.function)] = task
+            elif not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    values[task.name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+    if error is not None:
+        raise error
+    return values
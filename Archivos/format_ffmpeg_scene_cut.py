@@ -14,6 +14,8 @@ import re
 import cv2
 import os
 
+import tracing
+
 ##
 # @brief  Extracts the duration of the input video in frames.
 # @param filename   The input filename to determine exact duration from number of frames and fps.
@@ -54,32 +56,39 @@ def format_scenes_output(filename, duration):
 # @param path   The path where the video is stored.
 # @param file   The name of the video file.
 # @param threshold   The threshold value used to determine whether a shot change is significant or not.
-# @return  A list with the times of the scene cuts.
+# @param time_range   The start and end time (seconds) of the interval analysed, the whole video if it is not given. The interval is read from the video and the frames
+# selected are not written (-f null), so nothing is encoded.
+# @return  A list with the times of the scene cuts, relative to the start of the interval.
 ##
-def main(path, file, threshold):
-    current_directory = os.getcwd()
-    if path != os.getcwd():
-        os.chdir(path)
-        
+def main(path, file, threshold, time_range=None):
     name = file[:-4]  
+    if time_range is None:
+        input_args = ["-i", os.path.join(path, file)]
+        output_args = ["-y", os.path.join(path, f"dep{file}")]
+    else:
+        name = f"{name}_{round(time_range[0] * 1000)}"
+        input_args = ["-ss", str(time_range[0]), "-to", str(time_range[1]), "-i", os.path.join(path, file)]
+        output_args = ["-f", "null", "-"]
 
+    # The metadata file is given relative to the folder of the video (cwd of ffmpeg), an absolute path would have to be escaped inside the filter
     ffmpeg_command = [
-        "ffmpeg.exe",
-        "-i", file,
+        "ffmpeg",
+        *input_args,
         "-filter_complex", f"select='gt(scene,{threshold})',metadata=print:file={name}scenesORIG.dep",
         "-vsync", "vfr",
-        "-y", f"dep{file}",
-        "2>", f"{name}shotsORIG.dep"
+        *output_args
     ]
     
     # Execute the command
     try:
-        subprocess.run(ffmpeg_command, check=True, shell=True)
-        times_scene_cuts = format_scenes_output(f"{name}scenesORIG.dep", mp4_duration_frames(file))
+        with open(os.path.join(path, f"{name}shotsORIG.dep"), 'w') as shots_file:
+            tracing.run(ffmpeg_command, check=True, cwd=path, stderr=shots_file)
+        if time_range is None:
+            duration = mp4_duration_frames(os.path.join(path, file))
+        else:
+            duration = time_range[1] - time_range[0]
+        times_scene_cuts = format_scenes_output(os.path.join(path, f"{name}scenesORIG.dep"), duration)
     except subprocess.CalledProcessError as e:
         print("An error occurred while executing the command:", e)
-      
-    if path != current_directory:
-        os.chdir(current_directory)
 
-    return times_scene_cuts
\ No newline at end of file
+    return times_scene_cuts
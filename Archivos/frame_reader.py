@@ -0,0 +1,130 @@
+"""
+Reading of the frames analysed by the optical flow
+
+The optical flow (motionAccelerations) only needs the frames in grayscale and its cost grows with the number of pixels, so the frames are not decoded at full resolution with
+OpenCV: ffmpeg decodes the video, scales it to the width of the analysis (320 pixels by default, the height keeps the aspect ratio) and converts it to gray, and writes the raw
+frames to its output. The frames are read from the pipe directly into NumPy arrays created before the reading (readinto), so no array is created nor copied for each frame.
+
+When only one of every n frames is analysed (accelCalculator.FRAME_SKIP), the other frames are discarded by a select filter of ffmpeg just after the decoder: they are never
+scaled, converted to gray nor written to the pipe, and the frames read are always n frames apart.
+
+The reader does not keep the frames: the function that consumes them gives the array where each frame is read, so it can keep the previous frame in one array while the next one
+is read in another.
+"""
+
+import json
+import subprocess
+
+import numpy as np
+
+import tracing
+
+## Width of the frames analysed, in pixels
+ANALYSIS_WIDTH = 320
+
+##
+# @brief Raw gray frames of a video read from the output of ffmpeg.
+##
+class FrameSource:
+    __slots__ = ('output', 'width', 'height', 'fps')
+
+    ##
+    # @brief  Creates the source from the output of ffmpeg.
+    # @param output   The output of ffmpeg, binary file object.
+    # @param width   The width of the frames in pixels.
+    # @param height   The height of the frames in pixels.
+    # @param fps   The frames per second of the video.
+    ##
+    def __init__(self, output, width, height, fps):
+        self.output = output
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    ##
+    # @brief  Creates an array where the frames can be read.
+    # @return  The array (height x width, uint8).
+    ##
+    def new_frame(self):
+        return np.empty((self.height, self.width), dtype=np.uint8)
+
+    ##
+    # @brief  Reads the next frame in the given array.
+    # @param frame   The array where the frame is read, created with new_frame.
+    # @return  True if a complete frame was read, False at the end of the video.
+    ##
+    def read(self, frame):
+        view = memoryview(frame).cast('B')
+        position = 0
+        while position < len(view):
+            n_bytes = self.output.readinto(view[position:])
+            if not n_bytes:
+                return False
+            position += n_bytes
+        return True
+
+##
+# @brief  Obtains the size and the frame rate of the video track with ffprobe.
+# @param video_name   The path of the video.
+# @return  The width, the height and the frames per second.
+##
+def video_stream(video_name):
+    result = tracing.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height,r_frame_rate', '-of', 'csv=p=0',
+                          video_name], capture_output=True, text=True)
+    width, height, rate = result.stdout.strip().split(',')[:3]
+    numerator, _, denominator = rate.partition('/')
+    return int(width), int(height), float(numerator) / float(denominator or 1)
+
+##
+# @brief  Obtains the timing of the frames of the video track with ffprobe: the frames are taken at a constant frame rate from the time of the first frame.
+# @param video_name   The path of the video.
+# @return  The frames per second, the time of the first frame from the start of the file (seconds) and the duration of the file (seconds).
+##
+def video_timing(video_name):
+    result = tracing.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=r_frame_rate,start_time:format=start_time,duration', '-of', 'json',
+                          video_name], capture_output=True, text=True)
+    info = json.loads(result.stdout)
+    stream = info['streams'][0]
+    numerator, _, denominator = stream['r_frame_rate'].partition('/')
+    offset = float(stream.get('start_time', 0)) - float(info['format'].get('start_time', 0))
+    return float(numerator) / float(denominator or 1), offset, float(info['format'].get('duration', 0))
+
+##
+# @brief  Size of the frames analysed: the width of the analysis (never bigger than the video) and the height that keeps the aspect ratio, both even.
+# @param width   The width of the video.
+# @param height   The height of the video.
+# @param analysis_width   The width of the analysis, None to keep the size of the video.
+# @return  The width and the height of the frames analysed.
+##
+def analysis_size(width, height, analysis_width=ANALYSIS_WIDTH):
+    if analysis_width is None or analysis_width >= width:
+        return width, height
+    new_width = max(2, int(analysis_width) // 2 * 2)
+    new_height = max(2, round(height * new_width / width / 2) * 2)
+    return new_width, new_height
+
+##
+# @brief  Reads the frames of a video in gray and at the size of the analysis while ffmpeg decodes it.
+# @param video_name   The path of the video.
+# @param consume   The function that reads the frames, it receives the FrameSource and its value is returned.
+# @param analysis_width   The width of the analysis, None to keep the size of the video.
+# @param time_range   The start and end time (seconds) of the interval read (end None to read until the end), the whole video if it is not given.
+# @param frame_skip   Only one of every %frame_skip% frames is read (the frames 0, frame_skip, 2*frame_skip...), None or 0 to read all of them.
+# @return  The value returned by consume.
+##
+def read_gray_frames(video_name, consume, analysis_width=ANALYSIS_WIDTH, time_range=None, frame_skip=None):
+    width, height, fps = video_stream(video_name)
+    width, height = analysis_size(width, height, analysis_width)
+    interval = []
+    if time_range is not None:
+        interval = ['-ss', str(time_range[0])]
+        if time_range[1] is not None:
+            interval += ['-t', str(time_range[1] - time_range[0])]
+    filters = f'scale={width}:{height}:flags=area,format=gray'
+    if frame_skip and frame_skip > 1:
+        # the frames discarded are not scaled nor converted, and they are not duplicated again to keep the frame rate
+        filters = f'select=not(mod(n\\,{int(frame_skip)})),' + filters
+    command = (['ffmpeg', '-v', 'error'] + interval + ['-i', video_name, '-map', '0:v:0', '-an', '-sn', '-vf', filters, '-vsync', 'passthrough',
+               '-f', 'rawvideo', '-pix_fmt', 'gray', '-'])
+    returncode, value = tracing.stream(command, lambda output: consume(FrameSource(output, width, height, fps)), stderr=subprocess.DEVNULL, text=False)
+    return value
@@ -12,6 +12,8 @@ An srt file is created with the determined speech/non-speech results and the pro
 import os
 from inaSpeechSegmenter import Segmenter
 
+import subtitles
+
 ##
 # @brief  Extracts the statistics from the input video.
 # @param movie_path   The path where the video is stored.
@@ -51,6 +53,7 @@ def extract_statistics(movie_path, file_name):
                 index += 1
                 line = f"{index}\n{start} --> {end}\n{text}\n"
                 file.write(line + '\n')
+    subtitles.invalidate(os.path.join(movie_path, "inaSpeech_subs.srt"))
     return
 
 ##
@@ -0,0 +1,160 @@
+"""
+Description of a processing job and of its results
+
+All the answers that main.py used to ask by keyboard (reference, target duration, inaSpeechSegmenter re-analysis and restart of the input folder) and all the values of
+configfile.txt are kept in a JobConfig object, so a movie can be processed without anyone at the keyboard. The processing returns a JobResult object with the paths of the
+generated files and the execution time of each stage.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+## Options accepted as reference for splitting the movie
+REFERENCES = ('srt', 'ina')
+
+## Name of the configuration file read when no other is given
+CONFIG_FILE = 'configfile.txt'
+
+## Keys of configfile.txt, in the order they are written in the file
+CONFIG_KEYS = ('input_path', 'main_path', 'movie_name', 'target_min_speed', 'target_max_speed', 'acc_voice_max', 'acc_voice_min',
+               'acc_motion_max', 'acc_motion_min', 'min_video_duration', 'min_acc_scene_duration', 'n_segs_threshold')
+
+##
+# @brief Configuration of one movie to be processed. The numeric values are kept as float when possible, otherwise the raw text is kept so the correction logic of each module
+# (correct_acc_voice, correct_duraciones...) can replace it with its default value, as it happens with configfile.txt.
+##
+@dataclass
+class JobConfig:
+    ## Folder where the movie is stored and where the files are generated
+    input_path: str
+    ## Folder of the program where the temporary files of the accelerations are created
+    main_path: str
+    ## Name of the movie (or podcast) file
+    movie_name: str
+    target_min_speed: Union[float, str] = ''
+    target_max_speed: Union[float, str] = ''
+    acc_voice_max: Union[float, str] = ''
+    acc_voice_min: Union[float, str] = ''
+    acc_motion_max: Union[float, str] = ''
+    acc_motion_min: Union[float, str] = ''
+    min_video_duration: Union[float, str] = ''
+    min_acc_scene_duration: Union[float, str] = ''
+    n_segs_threshold: Union[float, str] = ''
+    ## Reference for splitting the movie: 'srt' (subtitle file) or 'ina' (inaSpeechSegmenter)
+    reference: str = 'srt'
+    ## Subtitle file of the movie, '-' to extract the first subtitle track of the movie
+    srt_file: str = 'pelicula.srt'
+    ## Desired duration of the summarized movie (hh:mm:ss.ms), None to keep the duration obtained
+    target_duration: Optional[str] = None
+    ## Male/female voice/else analysis of the original and summarized movie with inaSpeechSegmenter
+    voice_else_analysis: bool = False
+    ## Empty the input folder (except the movie) once the zip file is created
+    restart: bool = False
+    ## Name of the zip file, the movie name without extension by default
+    original_title: Optional[str] = None
+    ## Skip the stages whose inputs and parameters did not change since the last execution (checkpoint.py)
+    checkpoints: bool = True
+    ## File where the trace of the stages and subprocesses is written (tracing.py), .jsonl for JSON lines, Chrome trace_event otherwise
+    trace_file: Optional[str] = None
+    ## Write the voice/else timelines as srt files (voice-else_subs.srt, compr_subs.srt, compr_subs_acc.srt), they are passed between the stages in memory
+    export_srt: bool = False
+    ## Cut the fragments copying the complete GOPs of the movie and encoding only the frames at the borders, instead of encoding the movie with all frames as keyframes (off until the benchmark shows it is faster)
+    smart_cut: bool = False
+    ## Encode each fragment of the summarized movie directly from its interval of the movie, without cutting nor accelerating the fragments before (Movie_maker)
+    virtual_fragments: bool = False
+    ## Format of the summarized podcast (audio.py): m4a or opus, the podcasts are processed only on the audio
+    audio_format: str = 'm4a'
+    ## Only run the analysis stages and write the acceleration plan with the predicted duration, nothing is cut or encoded
+    dry_run: bool = False
+    ## Number of stages of the processing running at the same time (dag.py)
+    workers: int = 4
+    ## Number of processes of the optical flow analysis of the else fragments, one per core by default (motionAccelerations)
+    motion_workers: Optional[int] = None
+    ## Functions that ask by keyboard during the processing, only used by the interactive command line
+    ask_duration: Optional[Callable] = field(default=None, repr=False, compare=False)
+    ask_voice_else_analysis: Optional[Callable] = field(default=None, repr=False, compare=False)
+    ask_restart: Optional[Callable] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.reference not in REFERENCES:
+            raise Exception("Invalid input - reference choice")
+        if self.original_title is None:
+            self.original_title = self.movie_name[:-4]
+        # The stages only work with absolute paths, the working directory is never changed
+        self.input_path = os.path.abspath(self.input_path)
+        self.main_path = os.path.abspath(self.main_path)
+
+##
+# @brief Results of the processing of one movie.
+##
+@dataclass
+class JobResult:
+    ## Paths of the generated files by role (summarized_video, summarized_audio, summarized_srt, plan, zip)
+    outputs: dict = field(default_factory=dict)
+    ## Execution time of each stage in seconds, in execution order
+    timings: dict = field(default_factory=dict)
+    ## Error message of each stage that failed
+    errors: dict = field(default_factory=dict)
+    ## Stages skipped because their checkpoint was still valid
+    skipped: list = field(default_factory=list)
+    ## Predicted duration of the summarized movie from the acceleration plan (seconds)
+    predicted_duration: Optional[float] = None
+    ## Target speeds potentially corrected by accelCalculator
+    target_min_speed: Union[float, str] = ''
+    target_max_speed: Union[float, str] = ''
+
+##
+# @brief  Converts a value of the configuration file to float, the raw text is kept if it is not a number.
+# @param value   The value read.
+# @return  The value converted.
+##
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+##
+# @brief  Reads the configuration file, skipping comments and empty lines, in the positional order of CONFIG_KEYS.
+# @param config_file   The name of the configuration file.
+# @return  Dictionary with the values of the configuration file.
+##
+def read_configfile(config_file=CONFIG_FILE):
+    with open(config_file, 'r', encoding='utf8', newline='\r\n') as file:
+        data = []
+        lines = file.read().splitlines()
+        for line in lines:
+            if line.startswith('#') or not line.strip():
+                continue
+            data.append(line.split("=")[1])
+
+    return dict(zip(CONFIG_KEYS, data))
+
+##
+# @brief  Creates the job configuration from the configuration file, the keyword arguments replace the values of the file.
+# @param config_file   The name of the configuration file.
+# @param overrides   Values of JobConfig that replace the ones in the file (None values are ignored).
+# @return  The job configuration.
+##
+def from_configfile(config_file=CONFIG_FILE, **overrides):
+    values = read_configfile(config_file)
+    values.update({key: value for key, value in overrides.items() if value is not None})
+    for key in CONFIG_KEYS[3:]:
+        if key in values:
+            values[key] = to_number(values[key])
+    return JobConfig(**values)
+
+##
+# @brief  Converts the desired duration in the format hh:mm:ss.ms (3 decimals for ms) to minutes, as required by accelCalculator.fit_duration.
+# @param duration   The desired duration.
+# @return  The duration in minutes, 0 if the duration is not in the expected format.
+##
+def parse_duration(duration):
+    if not duration or len(duration) <= 11:
+        return 0
+    h = int(re.findall(r'(\d+\d+):', duration)[0])
+    mins = int(re.findall(r':(\d+\d+):', duration)[0])
+    s = float(re.findall(r':(\d+\d+.\d+\d+\d+)', duration)[0])
+    return round(h*60 + mins + s/60, 3)
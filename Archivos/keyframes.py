@@ -0,0 +1,117 @@
+"""
+Keyframe index of the movie
+
+The keyframes of the video track are read with ffprobe, which lists the packets of the track with their flags (K for the keyframes). The output is read while ffprobe is
+running and only the times of the keyframes are kept, in a NumPy array, so the list of packets of the whole movie (millions of lines in a long movie) is never written in a
+file nor kept in memory.
+
+The index answers the questions of the rest of the processing: the first and last keyframe (start and end of the voice/else timeline in Format_srt) and the keyframe nearest,
+before or after a time. For a podcast, the index has only the start and the end of the audio.
+"""
+
+import hashlib
+import subprocess
+
+import numpy as np
+
+import tracing
+
+##
+# @brief Sorted times of the keyframes of a movie, in seconds.
+##
+class KeyframeIndex:
+    __slots__ = ('times',)
+
+    ##
+    # @brief  Creates the index from the times of the keyframes.
+    # @param times   The times of the keyframes in seconds, in any order.
+    ##
+    def __init__(self, times=()):
+        self.times = np.unique(np.asarray(times, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.times)
+
+    def __eq__(self, other):
+        return isinstance(other, KeyframeIndex) and np.array_equal(self.times, other.times)
+
+    def __repr__(self):
+        return f"KeyframeIndex({len(self)} keyframes)"
+
+    ##
+    # @brief  Reads the keyframes of the video track of a movie with ffprobe.
+    # @param movie_file   The path of the movie.
+    # @return  The index.
+    ##
+    @staticmethod
+    def from_movie(movie_file):
+        command = ['ffprobe', '-loglevel', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags', '-of', 'csv=print_section=0', movie_file]
+        returncode, times = tracing.stream(command, parse_packets, stderr=subprocess.DEVNULL)
+        if returncode != 0 or len(times) == 0:
+            raise Exception(f"No keyframes found in {movie_file}")
+        return KeyframeIndex(times)
+
+    ##
+    # @brief  Time of the first keyframe.
+    # @return  The time in seconds.
+    ##
+    def first(self):
+        return float(self.times[0])
+
+    ##
+    # @brief  Time of the last keyframe.
+    # @return  The time in seconds.
+    ##
+    def last(self):
+        return float(self.times[-1])
+
+    ##
+    # @brief  Keyframes at or before the given times (the first keyframe if there is none before).
+    # @param t   The time or array of times in seconds.
+    # @return  The times of the keyframes.
+    ##
+    def before(self, t):
+        position = np.searchsorted(self.times, t, side='right') - 1
+        return self.times[np.clip(position, 0, len(self.times) - 1)]
+
+    ##
+    # @brief  Keyframes at or after the given times (the last keyframe if there is none after).
+    # @param t   The time or array of times in seconds.
+    # @return  The times of the keyframes.
+    ##
+    def after(self, t):
+        position = np.searchsorted(self.times, t, side='left')
+        return self.times[np.clip(position, 0, len(self.times) - 1)]
+
+    ##
+    # @brief  Keyframes nearest to the given times.
+    # @param t   The time or array of times in seconds.
+    # @return  The times of the keyframes.
+    ##
+    def nearest(self, t):
+        before = self.before(t)
+        after = self.after(t)
+        return np.where(np.abs(np.asarray(t) - before) <= np.abs(after - np.asarray(t)), before, after)
+
+    ##
+    # @brief  Hash of the keyframes, used as parameter of the checkpoints of the stages that receive the index.
+    # @return  The hexadecimal hash.
+    ##
+    def digest(self):
+        return hashlib.sha256(np.ascontiguousarray(self.times).tobytes()).hexdigest()
+
+    ##
+    # @brief  Converts the index to a list (JSON serializable).
+    # @return  The list of times in seconds.
+    ##
+    def to_list(self):
+        return self.times.tolist()
+
+##
+# @brief  Reads the output of ffprobe (pts_time,flags of every packet) line by line and keeps the times of the keyframes.
+# @param lines   The output of ffprobe, iterable of lines.
+# @return  Array with the times of the keyframes in seconds.
+##
+def parse_packets(lines):
+    fields = (line.partition(',') for line in lines)
+    return np.fromiter((float(time) for time, _, flags in fields if 'K' in flags and time != 'N/A'), dtype=np.float64)
@@ -2,363 +2,192 @@
 """
 Main script of the processing. It calls all the functions in the correct sequence to generate the movie accelerated.
 It is usually called from a batch file and reads the arguments from configfile.txt and from the command line.
+
+The processing itself is done by run(job), which receives a JobConfig (job.py) with all the answers to the questions of the processing, so it can be run without keyboard input, 
+e.g. python main.py --non-interactive --reference srt --duration 01:30:00.000 --no-restart
+
+With --dry-run only the analysis stages are run (Format_srt, voice and motion accelerations) and the acceleration plan is written with the predicted duration, so the parameters
+can be tuned without cutting or encoding the movie.
+
+With --virtual-fragments the segments of the timeline are only references to intervals of the movie: the motion analysis reads the else segments from the movie and Movie_maker
+encodes each accelerated fragment directly from it, so the cut fragments and the accelerated .mp4 files are never written.
 """
 
+import argparse
+import json
 import os
-import sys
 import re
 import shutil
-import subprocess
 import time
-import pysubs2
+
+import audio
+from checkpoint import Checkpoint
+from dag import Task, run_dag
+from job import CONFIG_FILE, CONFIG_KEYS, REFERENCES, JobResult, from_configfile, parse_duration
+from keyframes import KeyframeIndex
+import subtitles
+from timeline import ELSE
+import tracing
+
+## Else fragments of the first cut ({index}else.mp4)
+ELSE_FRAGMENTS = re.compile(r'\d+else\.mp4')
+
+## Voice/else fragments of the second cut, with their acceleration factor ({index}voice{factor}.mp4, {index}else{factor}.mp4, m4a or opus for a podcast)
+ACC_FRAGMENTS = re.compile(r'\d+(voice|else)\d+(\.\d+)?\.(mp4|m4a|opus)')
+
+## Fragments renamed by Selective_acceleration ({index}voiceacc.mp4, {index}elseacc.mp4, m4a or opus for a podcast)
+RENAMED_FRAGMENTS = re.compile(r'\d+(voice|else)acc\.(mp4|m4a|opus)')
+
+## Accelerated fragments ({index}.mp4, m4a or opus for a podcast)
+SPEDUP_FRAGMENTS = re.compile(r'\d+\.(mp4|m4a|opus)')
+
+## MPEG-TS fragments of Movie_maker ({index}.ts)
+TS_FRAGMENTS = re.compile(r'\d+\.ts')
+
+## Acceleration plan with the predicted duration of the summarized movie
+PLAN_FILE = 'plan.json'
 
 ##
-# @brief  Determines the total number of fragments to be generated.
-# @param srt_file   The name of the subtitle file.
-# @return  The total number of fragments to be generated.
+# @brief  Hash of a timeline or of a keyframe index, used as parameter of the checkpoints of the stages that receive it.
+# @param timeline   The timeline, None if the stage that obtains it failed.
+# @return  The hash of the timeline, None if there is no timeline.
 ##
-def determine_index(srt_file):
-    subs = pysubs2.load(srt_file, encoding = 'UTF-8', format_= 'srt')
-    index = len(subs)
-    return index
+def timeline_digest(timeline):
+    if timeline is None:
+        return None
+    return timeline.digest()
 
 ##
-# @brief  Generates a mp4 file from a mp3 file by creating a black screen with the same duration as the mp3 file.
-# Then, the kframes.txt file is created with the start time and the end time, so it has the same format as if it was the result of the frame detection of a real mp4 file.
-# @param folder_path   The path where the mp3 file is stored.
-# @param movie_name   The name of the mp3 file.
+# @brief  Writes the timelines of the processing as srt files, as they were written by previous versions, so they can be checked and are included in the zip file.
+# @param input_path   The path where the files are stored.
+# @param timelines   Dictionary with the name of the srt file of each timeline, the timelines not obtained (None) are skipped.
 ##
-def generate_mp4_from_mp3(folder_path, movie_name):
-    with open(os.path.join(folder_path, "mp3tomp4.bat"), 'w') as output:
-        new_movie_name = movie_name[:-4] + ".mp4"
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-             movie_name], capture_output=True, text=True)
-        duration = float(result.stdout.strip())
-        mp3tomp4_str = f"ffmpeg -f lavfi -i color=c=black:s=1280x720:r=1 -i {movie_name} -c:v libx264 -crf 0 -c:a copy -t {duration} -shortest {new_movie_name}"
-        output.write(mp3tomp4_str)
-    subprocess.call([os.path.join(folder_path, 'mp3tomp4.bat')], shell=True)
-    with open(os.path.join(folder_path, "kframes.txt"), 'w') as output:
-        output.write("0.000000,K_\n")
-        output.write(f"{duration},K_\n")
-    return
+def export_timelines(input_path, timelines):
+    for srt_name, timeline in timelines.items():
+        if timeline is not None:
+            timeline.to_srt(os.path.join(input_path, srt_name))
+
+##
+# @brief  Keyframe index of a podcast, with the start time and the end time of the audio, as if it was the result of the frame detection of a real mp4 file.
+# No video is generated, the podcast is processed directly on the audio (audio.py).
+# @param folder_path   The path where the audio file is stored.
+# @param movie_name   The name of the audio file.
+# @return  The keyframe index (keyframes.py).
+##
+def audio_keyframes(folder_path, movie_name):
+    return KeyframeIndex([0, audio.duration(os.path.join(folder_path, movie_name))])
 
 ## 
-# @brief  Script to detect all the frames of the movie. The times of the frames are stored in a file called "frames.txt". 
+# @brief  Detects the keyframes of the movie. The output of ffprobe is read while it runs and only the keyframes are kept, nothing is written in files.
 # @param folder_path   The path where the movie is stored.
 # @param movie_name   The name of the movie.
+# @return  The keyframe index (keyframes.py).
 ##
 def frame_detection(folder_path, movie_name):
-    with open(os.path.join(folder_path, "framedetection.bat"), 'w') as output:
-        output.write(
-            f'ffprobe -loglevel error -select_streams v:0 -show_entries packet=pts_time,flags -of csv=print_section=0 {os.path.join(folder_path, movie_name)}\n')
-
-    batpath = os.path.join(folder_path, "framedetection.bat")
-    f = open(os.path.join(folder_path, "frames.txt"), 'w')
-    subprocess.call([f'{batpath}'], stdout=f)
-
-    with open(os.path.join(folder_path, "frames.txt"), 'r') as inputl:
-        with open(os.path.join(folder_path, "kframes.txt"), 'w') as output:
-            for line in inputl:
-                if "K" in line.strip("\n"):
-                    output.write(line)
-                    
-    return 
+    return KeyframeIndex.from_movie(os.path.join(folder_path, movie_name))
 
 ##
-# @brief Main script of the processing. It calls all the functions in the correct sequence to generate the movie accelerated.
-# It is usually called from a batch file and reads the arguments from configfile.txt and from the command line.
+# @brief  Runs one stage of the processing, printing and recording its execution time. As in the rest of the processing, an error in a stage is printed and recorded, 
+# and the processing continues with the next stage, unless the stage is critical.
+# @param result   The JobResult where the execution time and the errors are recorded.
+# @param name   The name of the stage.
+# @param function   The function of the stage.
+# @param args   The arguments of the function.
+# @param critical   If True, the error is raised after being recorded.
+# @param checkpoint   The Checkpoint of the job, None to always run the stage.
+# @param inputs   The names (or compiled patterns) of the input files of the stage, for the checkpoint.
+# @param params   The parameters of the stage, for the checkpoint.
+# @param outputs   The names (or compiled patterns) of the output files of the stage, for the checkpoint.
+# @param expected   The minimum number of files matched by the patterns of the outputs, the stage is not recorded in the checkpoint if it created fewer.
+# @return  The value returned by the function, None if it failed.
 ##
-def main():
-    with open("configfile.txt", 'r', encoding='utf8', newline='\r\n') as file:
-        initial_content = file.read()
-    content_lines = initial_content.splitlines()
-    content_lines = "\n".join(content_lines)
-
-    with open("configfile.txt", 'r', encoding='utf8', newline='\r\n') as file:
-        data = []
-        lines = file.read().splitlines()
-        for line in lines:
-            if line.startswith('#') or not line.strip():
-                continue
-            data.append(line.split("=")[1])
-            
-        input_path = data[0]
-        main_path = data[1]
-        movie_name = data[2]
-        target_min_speed = data[3]
-        target_max_speed = data[4]
-        acc_voice_max=data[5]
-        acc_voice_min=data[6]
-        acc_motion_max=data[7]
-        acc_motion_min=data[8]
-        min_video_duration=data[9]
-        min_acc_scene_duration=data[10]
-        n_segs_threshold=data[11]
-
-    if len(sys.argv) == 2:
-        original_title = str(sys.argv[1]) 
-    else:
-        original_title = movie_name[:-4]
-        
-    reference = input(
-        "Choose the desired reference for splitting the movie:\n inaSpeechSegmenter results (type ina) of subtitle file (type srt): ")
-    if reference != 'srt' and reference != 'ina':
-        raise Exception("Invalid input - reference choice")
-    
-    # Detection of podcast and if it is, change of the podcast flag to True
-    flag_podcast = False
-    
-    if re.search(r'(\w+\.(?:mp3|m4a|wav|flac|aac|ogg|wma|alac|aiff|ape|opus))', movie_name):
-        flag_podcast = not flag_podcast
-        
-    # First step either for mp3 or mp4 files provided
-    if flag_podcast:
-        print("\nBeginning processing of the mp3 file provided.\n")
-        generate_mp4_from_mp3(input_path, os.path.join(input_path, movie_name))
-    else:
-        print("\nBeginning processing of the mp4 file provided.\n")
-        frame_detection(input_path, os.path.join(input_path, movie_name))
-
-    # Variable to count the steps completed
-    n_step = 1    
-
-    if reference == 'srt':
-        srt_file='pelicula.srt'
-#        srt_file = input("Provide the .srt track and enter its name or provide a video with one track - the program will automatically substract it\nEnter the name of the srt file or - : ")
-        if len(re.findall(r'(\w+).srt', os.path.join(input_path, srt_file))) == 0 and srt_file != '-':
-            raise Exception("Invalid input - srt choice")
-        if srt_file == '-':
-            # in this case, we'll find the sub track with ffmpeg
-            subprocess.run(['ffmpeg', '-i', os.path.join(input_path, movie_name), '-map', '0:s:0', os.path.join(input_path, 'subs.srt')])
-            srt_file = os.path.join(input_path, 'subs.srt')
-
-    elif reference == 'ina':
-        import inaAnalysis
-        print('In this case, an analysis based on the inaSpeechSegmenter will be performed to detect the fragments with noise/music/silence and voice content')
-        try:
-            result = inaAnalysis.main(input_path, movie_name)
-            print("Script output:", result)
-        except Exception as e:
-            print("An error occurred:", e)
-
-        # in the srt format, the male/female lines are reduced to voice, and noise/music/silence to else
-        srt_file = 'inaSpeech_subs.srt'
-        print(f"\n------- Step {n_step}: choosing reference and generating srt files --> COMPLETE ------\n")
-        n_step+=1
-    
-    
-    start_time = time.time()
-    import Format_srt
-    #format the srt file (original subs or ina srt output) into a simplified version
-    try:
-        n_segs_threshold = Format_srt.main(input_path, main_path, srt_file, n_segs_threshold)
-    except Exception as e:
-        print("An error occurred:", e)
-    
-    end_time = time.time()
-    execution_time = end_time - start_time
-    print(f"Format_srt execution time: {execution_time} seconds")
-    print(f"\n------- Step {n_step}: formatting the srt file provided/generated into a simplified version --> COMPLETE ------\n")
-    n_step+=1
-    
-    if not flag_podcast:
-        ####### movie fragmentation into else fragments #########
-        start_time = time.time()
-        os.chdir(main_path)
-        # cut the movie into fragments following the timemap provided in the reference srt file "srt_file"
-        import Movie_cutter
-        try:
-            Movie_cutter.main(input_path, movie_name, "compr_subs.srt", True, flag_podcast) #Only else fragments are cut
-        except Exception as e:
-            print("An error occurred:", e)
-            
-        end_time = time.time()
-        execution_time = end_time - start_time
-        print(f"Movie_cutter execution time: {execution_time} seconds")
-        print(f"\n------- Step {n_step}: cutting the movie into else mp4 fragments --> COMPLETE ------\n")
-        n_step+=1
-        
-    os.chdir(main_path)
+def run_stage(result, name, function, *args, critical=False, checkpoint=None, inputs=(), params=None, outputs=(), expected=None):
     start_time = time.time()
-    import accelCalculator
+    value = None
+    if checkpoint is not None:
+        done, value = checkpoint.lookup(name, inputs, params)
+        if done:
+            print(f"{name} skipped, its inputs and parameters did not change")
+            result.skipped.append(name)
+            result.timings[name] = result.timings.get(name, 0) + time.time() - start_time
+            return value
+        checkpoint.clear(name)
     try:
-        os.chdir(input_path)
-        target_min_speed, target_max_speed = accelCalculator.main(input_path, "compr_subs.srt", srt_file, target_min_speed, 
-                                                                  target_max_speed, reference, acc_voice_max, acc_voice_min, 
-                                                                  acc_motion_min, acc_motion_max, min_acc_scene_duration, 
-                                                                  min_video_duration, n_segs_threshold, flag_podcast)
+        with tracing.span(name):
+            value = function(*args)
+        if checkpoint is not None:
+            checkpoint.save(name, inputs, params, outputs, value, expected)
     except Exception as e:
         print("An error occurred:", e)
-    end_time = time.time()
-    execution_time = end_time - start_time
-    print(f"accelCalculator execution time: {execution_time} seconds")
-    print(f"\n------- Step {n_step}: determining accelerations of voice/else fragments --> COMPLETE ------\n")
-    n_step+=1
-    
-    ####### movie fragmentation into voice/else fragments with acceleration #########
-    start_time = time.time()
-    os.chdir(main_path)
-    # cut the movie into fragments following the timemap provided in the srt file "compr_subs.srt"
-    import Movie_cutter
-    try:
-        Movie_cutter.main(input_path, movie_name, "compr_subs_acc.srt", False, flag_podcast)
-    except Exception as e:
-        print("An error occurred:", e)
-    end_time = time.time()
-    execution_time = end_time - start_time
-    print(f"Movie_cutter execution time: {execution_time} seconds")
-    print(f"\n------- Step {n_step}: cutting the movie into voice/else mp4 fragments --> COMPLETE ------\n")
-    n_step+=1
-    
-    ######## selective acceleration of movie fragments #######
-    start_time = time.time()
-    os.chdir(main_path)
-    # accelerate the movie fragments with different speeds (one for voice content, one for gaps between lines)
-    import Selective_acceleration
-    try:
-        Selective_acceleration.main(main_path, input_path, "compr_subs_acc.srt")
-    except Exception as e:
-        print("An error occurred:", e)
-        exit()
-        
-    end_time = time.time()
-    execution_time = end_time - start_time
-    print(f"Selective_acceleration execution time: {execution_time} seconds")
-    print(f"\n------- Step {n_step}: selective acceleration of voice/else mp4 files --> COMPLETE ------\n")
-    n_step+=1
+        result.errors[name] = str(e)
+        if critical:
+            raise
+    finally:
+        execution_time = time.time() - start_time
+        result.timings[name] = result.timings.get(name, 0) + execution_time
+        print(f"{name} execution time: {execution_time} seconds")
+    return value
 
-    ####### movie maker #######
-    start_time = time.time()
-    os.chdir(main_path)
-    # merge the {index}.mp4 fragments into one final movie
-    import Movie_maker
-    try:
-        Movie_maker.main(input_path, "compr_subs_acc.srt")
-    except Exception as e:
-        print("An error occurred:", e)
-    
-    end_time = time.time()
-    execution_time = end_time - start_time
-    print(f"Movie_maker execution time: {execution_time} seconds")
-    print(f"\n------- Step {n_step}: putting together the accelerated mp4 files to create the summarized movie --> COMPLETE ------\n")
-    n_step+=1
-    
-    ########speedup the summarized movie to fit the desired length#######
-    os.chdir(input_path)
-    sp_movie = 'merged_video.mp4'
-    old_duration = subprocess.run(
-       ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-        sp_movie], capture_output=True, text=True)
-    old_duration = float(old_duration.stdout.strip())
-    old_h = int(old_duration / 3600)
-    old_min = int((float(old_duration / 3600) - old_h) * 60)
-    old_s = ((float(old_duration / 3600) - old_h) * 60 - old_min) * 60
-    print(f"Current duration: {old_h} hours, {old_min} minutes and {old_s} seconds")
-    speedup = input("If you are not pleased with the final length of the movie, insert here the desired duration in the following format: hh:mm:ss.ms (3 decimals for ms)\nOtherwise, press any key: ")
-    new_duration =0
-    if len(speedup) > 11:
-        h = int(re.findall(r'(\d+\d+):', speedup)[0])
-        mins = int(re.findall(r':(\d+\d+):', speedup)[0])
-        s = float(re.findall(r':(\d+\d+.\d+\d+\d+)', speedup)[0])
-        new_duration = round(h*60 + mins + s/60, 3)   #in minutes, required by the config file of the speedup.py program
-        print("Desired duration [minutes]: ", new_duration)
-        
-        shutil.copyfile(os.path.join(input_path, sp_movie), os.path.join(main_path, sp_movie))
-        os.chdir(main_path)
-        new_content = f"PATH={os.path.join(main_path, sp_movie)}\nOPTION=length\nSPEED=1\nLENGTH={new_duration}\n"
-        with open("configurationSpeed.txt", 'w') as file:
-            file.write(new_content)
-        
-        import speedup
-        speedup.main()
-
-        try:
-            if os.path.exists(os.path.join(main_path, 'finalRESULT.mkv')):
-                os.rename('finalRESULT.mkv', f'compressedin_{new_duration}min.mp4')
-                shutil.move(os.path.join(main_path, f'compressedin_{new_duration}min.mp4'), os.path.join(input_path, f'compressedin_{new_duration}min.mp4'))
-        except FileNotFoundError as e:
-            print(f"File not found: {e}")
-        except Exception as e:
-            print(f"Error reading file_ {e}")
-            
-        ####### generate new subtitles for the summarized version ######
-        ####### Subtitle generation of adjusted to duration video, not working properly ######
-        try:
-            os.chdir(main_path)
-            import accelerate_srt
-            start_time = time.time()
-            os.chdir(input_path)
-            accelerate_srt.main(input_path, srt_file, "voice-else_subs.srt", "compr_subs_acc.srt", f'compressedin_{new_duration}min.srt', f'compressedin_{new_duration}min.mp4')
-            end_time = time.time()
-            execution_time = end_time - start_time
-            print(f"accelerate_srt execution time: {execution_time} seconds")
-            print(f"\n------- Step {n_step}: compressedin_{new_duration}min.srt acceleration completed --> COMPLETE ------\n")
-            n_step+=0.1
-            os.chdir(main_path)
-        except Exception as e:
-            print("An error occurred:", e)
-
-        print(f"\n------- Step {n_step} - optional\nspeed-up the summarized movie to fit in a certain length --> COMPLETE ------\n")
-        n_step = round(n_step+1)
-
-    ####### generate new subtitles for the summarized version ######
-    ####### Acceleration of srt file of merged_video #######
-    os.chdir(main_path)
-    import accelerate_srt
-    
-    try:
-        start_time = time.time()
-        os.chdir(input_path)
-        accelerate_srt.main(input_path, srt_file, "voice-else_subs.srt", "compr_subs_acc.srt", "merged_video.srt", "merged_video.mp4")
-        end_time = time.time()
-        execution_time = end_time - start_time
-        print(f"\naccelerate_srt execution time: {execution_time} seconds")
-        print(f"\n------- Step {n_step}: merged_video.srt acceleration completed --> COMPLETE ------\n")
-        n_step+=1
-        
-        os.chdir(main_path)
-    except Exception as e:
-        print("An error occurred:", e)
-        
-    voice_else_option = input(
-        "Do you want to do a voice else analysis to obtain male/female voice/else percentages with inaAnalysis? <yes> or any key: ")
-    
-    if voice_else_option == 'yes':
-        ####### female/male screentime duration results########
-        os.chdir(main_path)
-        import VoiceElseDuration
-        try:
-            VoiceElseDuration.main(input_path, movie_name)
-        except Exception as e:
-            print("An error occurred:", e)
-    
-        print(f"\n------- Step {n_step} - female/male/else inaSpeechSegmenter analysis on both the original and summarized movie --> COMPLETE ------\n")
-        n_step+=1
+##
+# @brief  Converts a duration to hours, minutes and seconds.
+# @param duration   The duration in seconds.
+# @return  The text of the duration.
+##
+def duration_text(duration):
+    h = int(duration / 3600)
+    mins = int((duration / 3600 - h) * 60)
+    s = ((duration / 3600 - h) * 60 - mins) * 60
+    return f"{h} hours, {mins} minutes and {round(s, 3)} seconds"
+
+##
+# @brief  Writes the acceleration plan: every segment with its times, factor and duration once accelerated, and the predicted duration of the summarized movie
+# (sum of the durations of the segments multiplied by their factor, the inverse of the acceleration).
+# @param plan_file   The path of the JSON file.
+# @param timeline   The timeline with the voice and else accelerations.
+# @return  The predicted duration in seconds.
+##
+def write_plan(plan_file, timeline):
+    output_durations = timeline.output_durations()
+    segments = []
+    for i in range(len(timeline)):
+        segments.append({'index': i + 1, 'label': timeline.label(i), 'start_ms': int(timeline.start[i]), 'end_ms': int(timeline.end[i]),
+                         'output_ms': round(float(output_durations[i]), 3)})
+    predicted_duration = round(float(output_durations.sum()) / 1000, 3)
+    with open(plan_file, 'w', encoding='utf8') as file:
+        json.dump({'duration': timeline.duration_ms() / 1000, 'predicted_duration': predicted_duration, 'segments': segments}, file, indent=1)
+    return predicted_duration
 
-    ########organize used files in folders############
-    os.chdir(input_path)
+##
+# @brief  Moves the generated files to their corresponding folders inside the input folder.
+# @param input_path   The path where the files are stored.
+# @param movie_name   The name of the movie.
+# @param index   The total number of fragments generated (segments of the timeline with the accelerations).
+# @param audio_format   The format of the audio fragments of a podcast (m4a or opus), None for a movie.
+# @return  Dictionary with the paths of the final results.
+##
+def organize_files(input_path, movie_name, index, audio_format=None):
+    extension = audio_format or 'mp4'
     folder_normal = "fragments_normalcut"
-    if not os.path.exists(folder_normal):
-        os.makedirs(folder_normal)
+    if not os.path.exists(os.path.join(input_path, folder_normal)):
+        os.makedirs(os.path.join(input_path, folder_normal))
     folder_speed = "fragments_spedup"
-    if not os.path.exists(folder_speed):
-        os.makedirs(folder_speed)
+    if not os.path.exists(os.path.join(input_path, folder_speed)):
+        os.makedirs(os.path.join(input_path, folder_speed))
     folder_output = "output_results"
-    if not os.path.exists(folder_output):
-        os.makedirs(folder_output)
+    if not os.path.exists(os.path.join(input_path, folder_output)):
+        os.makedirs(os.path.join(input_path, folder_output))
     folder_bat = "batfiles"
-    if not os.path.exists(folder_bat):
-        os.makedirs(folder_bat)
+    if not os.path.exists(os.path.join(input_path, folder_bat)):
+        os.makedirs(os.path.join(input_path, folder_bat))
     folder_dep = "dep_results"
-    if not os.path.exists(folder_dep):
-        os.makedirs(folder_dep)
+    if not os.path.exists(os.path.join(input_path, folder_dep)):
+        os.makedirs(os.path.join(input_path, folder_dep))
     folder_normal_acc = "fragments_normalcut_acc"
-    if not os.path.exists(folder_normal_acc):
-        os.makedirs(folder_normal_acc)
+    if not os.path.exists(os.path.join(input_path, folder_normal_acc)):
+        os.makedirs(os.path.join(input_path, folder_normal_acc))
     folder_ts = "fragments_ts"
-    if not os.path.exists(folder_ts):
-        os.makedirs(folder_ts)
+    if not os.path.exists(os.path.join(input_path, folder_ts)):
+        os.makedirs(os.path.join(input_path, folder_ts))
 
     normal_path = os.path.join(input_path, folder_normal)
     speed_path = os.path.join(input_path, folder_speed)
@@ -367,32 +196,40 @@ def main():
     normal_acc_path = os.path.join(input_path, folder_normal_acc)
     dep_path = os.path.join(input_path, folder_dep)
     ts_path = os.path.join(input_path, folder_ts)
+    outputs = {}
 
-    index = determine_index("compr_subs_acc.srt")
     print("Number of fragments to be generated: ", index)
 
     try:
         for i in range(1, int(index) + 1):
-            if os.path.exists(os.path.join(input_path, f'{i}else.mp4')):
-                shutil.move(os.path.join(input_path, f'{i}else.mp4'), os.path.join(normal_path, f'{i}else.mp4'))
-            elif os.path.exists(os.path.join(input_path, f'{i}voice.mp4')):
-                shutil.move(os.path.join(input_path, f'{i}voice.mp4'), os.path.join(normal_path, f'{i}voice.mp4'))
+            if os.path.exists(os.path.join(input_path, f'{i}else.{extension}')):
+                shutil.move(os.path.join(input_path, f'{i}else.{extension}'), os.path.join(normal_path, f'{i}else.{extension}'))
+            elif os.path.exists(os.path.join(input_path, f'{i}voice.{extension}')):
+                shutil.move(os.path.join(input_path, f'{i}voice.{extension}'), os.path.join(normal_path, f'{i}voice.{extension}'))
     except FileNotFoundError as e:
         print(f"File not found: {e}")
 
     try:
         for i in range(1, int(index) + 1):
-            if os.path.exists(os.path.join(input_path, f'{i}.mp4')):
-                shutil.move(os.path.join(input_path, f'{i}.mp4'), os.path.join(speed_path, f'{i}.mp4'))
+            if os.path.exists(os.path.join(input_path, f'{i}.{extension}')):
+                shutil.move(os.path.join(input_path, f'{i}.{extension}'), os.path.join(speed_path, f'{i}.{extension}'))
     except FileNotFoundError as e:
         print(f"File not found: {e}")
         
+    try:
+        # the fragments with the acceleration in the name are the same files as the renamed ones (kept for the checkpoint of Movie_cutter)
+        for file in os.listdir(input_path):
+            if ACC_FRAGMENTS.fullmatch(file):
+                os.remove(os.path.join(input_path, file))
+    except FileNotFoundError as e:
+        print(f"File not found: {e}")
+
     try:
         for i in range(1, int(index) + 1):
-            if os.path.exists(os.path.join(input_path, f'{i}elseacc.mp4')):
-                shutil.move(os.path.join(input_path, f'{i}elseacc.mp4'), os.path.join(normal_acc_path, f'{i}elseacc.mp4'))
-            elif os.path.exists(os.path.join(input_path, f'{i}voiceacc.mp4')):
-                shutil.move(os.path.join(input_path, f'{i}voiceacc.mp4'), os.path.join(normal_acc_path, f'{i}voiceacc.mp4'))
+            if os.path.exists(os.path.join(input_path, f'{i}elseacc.{extension}')):
+                shutil.move(os.path.join(input_path, f'{i}elseacc.{extension}'), os.path.join(normal_acc_path, f'{i}elseacc.{extension}'))
+            elif os.path.exists(os.path.join(input_path, f'{i}voiceacc.{extension}')):
+                shutil.move(os.path.join(input_path, f'{i}voiceacc.{extension}'), os.path.join(normal_acc_path, f'{i}voiceacc.{extension}'))
     except FileNotFoundError as e:
         print(f"File not found: {e}")
         
@@ -423,57 +260,384 @@ def main():
     try:
         if os.path.exists(os.path.join(input_path, "merged_video.mp4")):
             shutil.move(os.path.join(input_path, "merged_video.mp4"), os.path.join(output_path, "summarized_video.mp4"))
+            outputs['summarized_video'] = os.path.join(output_path, "summarized_video.mp4")
         if os.path.exists(os.path.join(input_path, movie_name)):
             shutil.move(os.path.join(input_path, movie_name), os.path.join(output_path, movie_name))
         if os.path.exists(os.path.join(input_path, "inaSpeechSegmenter_voice_else_analysis")):
             try:
                 shutil.move(os.path.join(input_path, "inaSpeechSegmenter_voice_else_analysis"), os.path.join(output_path, "inaSpeechSegmenter_voice_else_analysis"))
+                outputs['voice_else_analysis'] = os.path.join(output_path, "inaSpeechSegmenter_voice_else_analysis")
             except:
                 print(f"{os.path.join(output_path, 'inaSpeechSegmenter_voice_else_analysis')} already exists")
         if os.path.exists(os.path.join(input_path, "merged_video.srt")):
             shutil.move(os.path.join(input_path, "merged_video.srt"), os.path.join(output_path, "summarized_video.srt"))
-        if new_duration>0 and os.path.exists(os.path.join(input_path, f'compressedin_{new_duration}min.mp4')):
-            shutil.move(os.path.join(input_path, f'compressedin_{new_duration}min.mp4'), os.path.join(output_path, f'compressedin_{new_duration}min.mp4'))
-        if os.path.exists(os.path.join(input_path, f'compressedin_{new_duration}min.srt')):
-            shutil.move(os.path.join(input_path, f'compressedin_{new_duration}min.srt'), os.path.join(output_path, f'compressedin_{new_duration}min.srt'))
+            outputs['summarized_srt'] = os.path.join(output_path, "summarized_video.srt")
+        if audio_format and os.path.exists(os.path.join(input_path, f"{audio.MERGED_AUDIO}.{audio_format}")):
+            shutil.move(os.path.join(input_path, f"{audio.MERGED_AUDIO}.{audio_format}"), os.path.join(output_path, f"summarized_audio.{audio_format}"))
+            outputs['summarized_audio'] = os.path.join(output_path, f"summarized_audio.{audio_format}")
+        if os.path.exists(os.path.join(input_path, f"{audio.MERGED_AUDIO}.srt")):
+            shutil.move(os.path.join(input_path, f"{audio.MERGED_AUDIO}.srt"), os.path.join(output_path, "summarized_audio.srt"))
+            outputs['summarized_srt'] = os.path.join(output_path, "summarized_audio.srt")
             
             
-        os.chdir(input_path)
-        for filename in os.listdir():
+        for filename in os.listdir(input_path):
             if filename.endswith(".bat"):
                 shutil.move(os.path.join(input_path, filename), os.path.join(bat_path, filename))
 
-        os.chdir(main_path)
     except FileNotFoundError as e:
         print(f"File not found: {e}")
-    print(f"\n------- Step {n_step} - the generated files were organized in their corresponding folders --> COMPLETE ------\n")
-    n_step+=1
 
-    ###### create zip with all generated files #########
-    os.chdir(main_path)
-    import tozip
+    return outputs
+
+##
+# @brief Processing of one movie without any keyboard input. The trace of the stages is written even if the processing fails.
+# @param job   The JobConfig with the configuration of the movie and the answers to all the questions of the processing.
+# @return  The JobResult with the paths of the generated files and the execution time of each stage.
+##
+def run(job):
+    result = JobResult()
+    tracing.reset()
+    subtitles.clear()
     try:
-        tozip.main(input_path, original_title, reference, target_min_speed, target_max_speed)
-    except Exception as e:
-        print("An error occurred:", e)
+        run_stages(job, result)
+    finally:
+        if job.trace_file:
+            tracing.write(job.trace_file, job.original_title)
+            result.outputs['trace'] = job.trace_file
+    return result
+
+##
+# @brief It calls all the functions of the processing to generate the movie accelerated. The stages are run as a dependency graph (dag.py), each stage starts when the stages
+# whose files it needs are completed, so the independent stages run at the same time (up to job.workers stages).
+# @param job   The JobConfig of the movie.
+# @param result   The JobResult where the paths of the generated files and the execution time of each stage are recorded.
+##
+def run_stages(job, result):
+    checkpoint = Checkpoint(job.input_path) if job.checkpoints else None
+    input_path = job.input_path
+    main_path = job.main_path
+    movie_name = job.movie_name
+    reference = job.reference
+    
+    # Values obtained by a stage and used by the following ones, the timelines of the voice/else segments (timeline.py) are passed in memory
+    state = {'srt_file': job.srt_file, 'n_segs_threshold': job.n_segs_threshold, 'target_min_speed': job.target_min_speed, 
+             'target_max_speed': job.target_max_speed, 'keyframes': None, 'voice_else': None, 'compressed': None, 'voice_acc': None, 'acc': None}
+    
+    # Detection of podcast and if it is, change of the podcast flag to True
+    flag_podcast = False
+    
+    if re.search(r'(\w+\.(?:mp3|m4a|wav|flac|aac|ogg|wma|alac|aiff|ape|opus))', movie_name):
+        flag_podcast = not flag_podcast
+    
+    # A podcast is processed only on the audio (audio.py), the fragments and the summarized podcast are audio files
+    audio_format = job.audio_format if flag_podcast else None
+    merged_name = f"{audio.MERGED_AUDIO}.{audio_format}" if flag_podcast else "merged_video.mp4"
+    merged_srt = os.path.splitext(merged_name)[0] + ".srt"
+    
+    if reference == 'srt':
+        if len(re.findall(r'(\w+).srt', os.path.join(input_path, job.srt_file))) == 0 and job.srt_file != '-':
+            raise Exception("Invalid input - srt choice")
+    
+    # First step either for mp3 or mp4 files provided
+    def frames():
+        if flag_podcast:
+            print("\nBeginning processing of the audio file provided.\n")
+            state['keyframes'] = run_stage(result, "audio_keyframes", audio_keyframes, input_path, movie_name,
+                                           checkpoint=checkpoint, inputs=[movie_name])
+        else:
+            print("\nBeginning processing of the mp4 file provided.\n")
+            state['keyframes'] = run_stage(result, "frame_detection", frame_detection, input_path, os.path.join(input_path, movie_name),
+                                           checkpoint=checkpoint, inputs=[movie_name])
+
+    def choose_reference():
+        if reference == 'srt':
+            if job.srt_file == '-':
+                # in this case, we'll find the sub track with ffmpeg
+                tracing.run(['ffmpeg', '-i', os.path.join(input_path, movie_name), '-map', '0:s:0', os.path.join(input_path, 'subs.srt')])
+                subtitles.invalidate(os.path.join(input_path, 'subs.srt'))
+                state['srt_file'] = 'subs.srt'
+
+        elif reference == 'ina':
+            import inaAnalysis
+            print('In this case, an analysis based on the inaSpeechSegmenter will be performed to detect the fragments with noise/music/silence and voice content')
+            run_stage(result, "inaAnalysis", inaAnalysis.main, input_path, movie_name,
+                      checkpoint=checkpoint, inputs=[movie_name], outputs=["inaSpeech_results.txt", "inaSpeech_subs.srt"])
+
+            # in the srt format, the male/female lines are reduced to voice, and noise/music/silence to else
+            state['srt_file'] = 'inaSpeech_subs.srt'
+            print("\n------- choosing reference and generating srt files --> COMPLETE ------\n")
+    
+    def format_srt():
+        import Format_srt
+        #format the srt file (original subs or ina srt output) into a simplified version
+        value = run_stage(result, "Format_srt", Format_srt.main, input_path, main_path, state['srt_file'], state['n_segs_threshold'], state['keyframes'],
+                          checkpoint=checkpoint, inputs=[state['srt_file']],
+                          params={'n_segs_threshold': state['n_segs_threshold'], 'keyframes': timeline_digest(state['keyframes'])})
+        if value is not None:
+            state['n_segs_threshold'], state['voice_else'], state['compressed'] = value
+        print("\n------- formatting the srt file provided/generated into a simplified version --> COMPLETE ------\n")
+    
+    def cut_else():
+        ####### movie fragmentation into else fragments #########
+        # cut the movie into fragments following the timemap provided in the reference srt file "srt_file"
+        import Movie_cutter
+        run_stage(result, "Movie_cutter_else", Movie_cutter.main, input_path, movie_name, state['compressed'], True, flag_podcast, #Only else fragments are cut
+                  state['keyframes'], audio_format, job.smart_cut,
+                  checkpoint=checkpoint, inputs=[movie_name], params={'timeline': timeline_digest(state['compressed']), 'smart_cut': job.smart_cut},
+                  outputs=[ELSE_FRAGMENTS], expected=int(state['compressed'].is_kind(ELSE).sum()))
+        print("\n------- cutting the movie into else mp4 fragments --> COMPLETE ------\n")
+    
+    import accelCalculator
+    import motionAccelerations
+
+    def voice_accelerations():
+        value = run_stage(result, "voice_accelerations", accelCalculator.voice_accelerations, input_path, state['compressed'], state['srt_file'], 
+                          job.target_min_speed, job.target_max_speed, reference, job.acc_voice_max, job.acc_voice_min, state['n_segs_threshold'], 
+                          checkpoint=checkpoint, inputs=[state['srt_file']],
+                          params={'timeline': timeline_digest(state['compressed']), 'target_min_speed': job.target_min_speed, 'target_max_speed': job.target_max_speed, 'reference': reference,
+                                  'acc_voice_max': job.acc_voice_max, 'acc_voice_min': job.acc_voice_min,
+                                  'n_segs_threshold': state['n_segs_threshold'], 'language_prefix': accelCalculator.LANGUAGE_PREFIX})
+        if value is not None:
+            state['target_min_speed'], state['target_max_speed'], state['voice_acc'] = value
+        result.target_min_speed, result.target_max_speed = state['target_min_speed'], state['target_max_speed']
+        print("\n------- determining accelerations of voice fragments --> COMPLETE ------\n")
+
+    # In the dry run and with virtual fragments, the else segments are analysed in the original movie, nothing is cut
+    read_movie = job.dry_run or job.virtual_fragments
+    analysed_movie = movie_name if read_movie else None
+    motion_inputs = [movie_name] if read_movie else [ELSE_FRAGMENTS]
+
+    def motion_analysis():
+        run_stage(result, "motion_analysis", accelCalculator.motion_analysis, input_path, job.acc_motion_max, job.acc_motion_min, flag_podcast,
+                  analysed_movie, state['compressed'] if read_movie else None, job.motion_workers,
+                  checkpoint=checkpoint, inputs=motion_inputs,
+                  params={'timeline': timeline_digest(state['compressed']) if read_movie else None, 'acc_motion_max': job.acc_motion_max,
+                          'acc_motion_min': job.acc_motion_min, 'frame_skip': accelCalculator.FRAME_SKIP, 'analysis_width': accelCalculator.ANALYSIS_WIDTH},
+                  outputs=[motionAccelerations.MOTION_FILE])
+        print("\n------- optical flow analysis of else fragments --> COMPLETE ------\n")
+
+    def motion_accelerations():
+        state['acc'] = run_stage(result, "motion_accelerations", accelCalculator.motion_accelerations, input_path, state['voice_acc'],
+                                 job.acc_motion_max, job.acc_motion_min, job.min_acc_scene_duration, job.min_video_duration, state['n_segs_threshold'], flag_podcast,
+                                 analysed_movie,
+                                 checkpoint=checkpoint, inputs=[motionAccelerations.MOTION_FILE] + motion_inputs,
+                                 params={'timeline': timeline_digest(state['voice_acc']), 'acc_motion_max': job.acc_motion_max, 'acc_motion_min': job.acc_motion_min,
+                                         'min_acc_scene_duration': job.min_acc_scene_duration, 'min_video_duration': job.min_video_duration,
+                                         'n_segs_threshold': state['n_segs_threshold'], 'frame_skip': accelCalculator.FRAME_SKIP})
+        print("\n------- determining accelerations of voice/else fragments --> COMPLETE ------\n")
+
+    def fit_duration():
+        ######## adjust the accelerations of the plan to the desired duration #######
+        # the factors are scaled before cutting the movie, so the movie is rendered only once
+        if state['acc'] is None:
+            return
+        print(f"Predicted duration: {duration_text(state['acc'].output_durations().sum()/1000)}")
+        if job.target_duration is None and job.ask_duration is not None:
+            job.target_duration = job.ask_duration()
+        new_duration = parse_duration(job.target_duration)
+        if new_duration > 0:
+            print("Desired duration [minutes]: ", new_duration)
+            state['acc'] = run_stage(result, "fit_duration", accelCalculator.fit_duration, state['acc'], new_duration)
+            print("\n------- optional\nadjusting the accelerations to fit in a certain length --> COMPLETE ------\n")
+
+    def plan():
+        if state['acc'] is None:
+            return
+        plan_file = os.path.join(input_path, PLAN_FILE)
+        result.predicted_duration = write_plan(plan_file, state['acc'])
+        result.outputs['plan'] = plan_file
+        print(f"Predicted duration of the summarized movie: {result.predicted_duration:.3f} seconds (original: {state['acc'].duration_ms()/1000:.3f} seconds)")
+    
+    def cut():
+        ####### movie fragmentation into voice/else fragments with acceleration #########
+        # cut the movie into fragments following the timemap provided in the timeline with the accelerations
+        import Movie_cutter
+        # the else fragments of the first cut are reused for the else segments inside them
+        cut_timeline = None if flag_podcast else state['compressed']
+        run_stage(result, "Movie_cutter", Movie_cutter.main, input_path, movie_name, state['acc'], False, flag_podcast, state['keyframes'], audio_format, job.smart_cut,
+                  cut_timeline,
+                  checkpoint=checkpoint, inputs=[movie_name] if flag_podcast else [movie_name, ELSE_FRAGMENTS],
+                  params={'timeline': timeline_digest(state['acc']), 'smart_cut': job.smart_cut, 'audio_format': audio_format,
+                          'cut_timeline': timeline_digest(cut_timeline)},
+                  outputs=[ACC_FRAGMENTS], expected=len(state['acc']))
+        print("\n------- cutting the movie into voice/else mp4 fragments --> COMPLETE ------\n")
+    
+    def accelerate():
+        ######## selective acceleration of movie fragments #######
+        # accelerate the movie fragments with different speeds (one for voice content, one for gaps between lines)
+        import Selective_acceleration
+        run_stage(result, "Selective_acceleration", Selective_acceleration.main, main_path, input_path, state['acc'], audio_format, critical=True,
+                  checkpoint=checkpoint, inputs=[ACC_FRAGMENTS], params={'timeline': timeline_digest(state['acc']), 'audio_format': audio_format},
+                  outputs=[SPEDUP_FRAGMENTS, RENAMED_FRAGMENTS], expected=2 * len(state['acc']))  # one renamed and one accelerated fragment per segment
+        print("\n------- selective acceleration of voice/else mp4 files --> COMPLETE ------\n")
+
+    def make_movie():
+        ####### movie maker #######
+        # merge the {index}.mp4 fragments into one final movie
+        import Movie_maker
+        run_stage(result, "Movie_maker", Movie_maker.main, input_path, state['acc'], audio_format, movie_name if job.virtual_fragments else None,
+                  checkpoint=checkpoint, inputs=[movie_name] if job.virtual_fragments else [SPEDUP_FRAGMENTS],
+                  params={'timeline': timeline_digest(state['acc']), 'audio_format': audio_format, 'virtual_fragments': job.virtual_fragments},
+                  outputs=[merged_name, "concat.txt", TS_FRAGMENTS])
+        print("\n------- putting together the accelerated mp4 files to create the summarized movie --> COMPLETE ------\n")
+    
+    def accelerate_srt():
+        ####### generate new subtitles for the summarized version ######
+        ####### Acceleration of srt file of merged_video #######
+        import accelerate_srt
+        run_stage(result, "accelerate_srt", accelerate_srt.main, input_path, state['srt_file'], state['voice_else'], state['acc'], merged_srt, audio_format or 'ts')
+        print(f"\n------- {merged_srt} acceleration completed --> COMPLETE ------\n")
+
+    def voice_else_duration():
+        voice_else_option = job.voice_else_analysis
+        if job.ask_voice_else_analysis is not None:
+            voice_else_option = job.ask_voice_else_analysis()
         
-    print(f"\n------- Step {n_step} - the input file was compressed in a zip file located in the root directory (containing both <input> and <program> --> COMPLETE ------\n")
-    n_step+=1
+        if voice_else_option:
+            ####### female/male screentime duration results########
+            import VoiceElseDuration
+            run_stage(result, "VoiceElseDuration", VoiceElseDuration.main, input_path, movie_name, merged_name)
+            print("\n------- female/male/else inaSpeechSegmenter analysis on both the original and summarized movie --> COMPLETE ------\n")
+
+    def export_srt():
+        if job.export_srt:
+            run_stage(result, "export_srt", export_timelines, input_path, {"voice-else_subs.srt": state['voice_else'], "compr_subs.srt": state['compressed'],
+                                                                           "compr_subs_acc.srt": state['acc']})
+
+    def organize():
+        ########organize used files in folders############
+        outputs = run_stage(result, "organize_files", organize_files, input_path, movie_name, len(state['acc'] or ()), audio_format)
+        if outputs:
+            result.outputs.update(outputs)
+        print("\n------- the generated files were organized in their corresponding folders --> COMPLETE ------\n")
+
+    def zip_files():
+        ###### create zip with all generated files #########
+        import tozip
+        zip_file = run_stage(result, "tozip", tozip.main, input_path, job.original_title, reference, state['target_min_speed'], state['target_max_speed'])
+        if zip_file:
+            result.outputs['zip'] = zip_file
+        print("\n------- the input file was compressed in a zip file located in the root directory (containing both <input> and <program> --> COMPLETE ------\n")
+
+    def restart():
+        ######## delete all files included in the zip, but the original movie file ########
+        restart_option = job.restart
+        if job.ask_restart is not None:
+            restart_option = job.ask_restart()
+        if restart_option:
+            import Restart
+            run_stage(result, "Restart", Restart.main, input_path, movie_name)
+            print("\n------- optional - the <input> folder is empty and ready for a new movie\nall the files generated and used for the previous movies can be found in their corresponding zip files\n--> COMPLETE ------")
+    
+    # The podcasts have no else fragments to analyse, the motion accelerations are constant
+    motion_deps = ('motion_analysis',) if not flag_podcast else ()
+    tasks = [
+        Task('frames', frames),
+        Task('reference', choose_reference),
+        Task('Format_srt', format_srt, ('frames', 'reference')),
+        Task('voice_accelerations', voice_accelerations, ('Format_srt',)),
+        Task('motion_accelerations', motion_accelerations, ('voice_accelerations',) + motion_deps),
+        Task('fit_duration', fit_duration, ('motion_accelerations',)),
+        Task('export_srt', export_srt, ('fit_duration',)),
+        Task('plan', plan, ('fit_duration',)),
+    ]
+    if not flag_podcast:
+        # the else fragments are only cut to be analysed if the movie is going to be rendered
+        tasks.append(Task('motion_analysis', motion_analysis, ('Format_srt',) if read_movie else ('Movie_cutter_else',)))
+    if job.dry_run:
+        run_dag(tasks, job.workers)
+        return
+
+    if job.virtual_fragments:
+        # the fragments are encoded from the movie by Movie_maker, nothing is cut nor accelerated before
+        tasks.append(Task('Movie_maker', make_movie, ('fit_duration',)))
+    else:
+        if not flag_podcast:
+            tasks.append(Task('Movie_cutter_else', cut_else, ('Format_srt',)))
+        tasks += [
+            Task('Movie_cutter', cut, ('fit_duration',)),
+            Task('Selective_acceleration', accelerate, ('Movie_cutter',)),
+            Task('Movie_maker', make_movie, ('Selective_acceleration',)),
+        ]
+    tasks += [
+        Task('accelerate_srt', accelerate_srt, ('Movie_maker',)),
+        # VoiceElseDuration removes inaSpeech_subs.srt, which can be the subtitle file used by accelerate_srt
+        Task('VoiceElseDuration', voice_else_duration, ('accelerate_srt',)),
+        Task('organize_files', organize, ('VoiceElseDuration',)),
+        Task('tozip', zip_files, ('organize_files', 'export_srt')),
+        Task('Restart', restart, ('tozip',)),
+    ]
+    
+    run_dag(tasks, job.workers)
+    return
+
+##
+# @brief  Parses the command line. Every question of the processing can be answered with an argument, and every value of configfile.txt can be replaced.
+# @param argv   The list of arguments, sys.argv[1:] by default.
+# @return  The parsed arguments.
+##
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Segmental acceleration of audiovisual contents (Speedwatching)")
+    parser.add_argument('original_title', nargs='?', default=None, help="name of the zip file, the movie name by default")
+    parser.add_argument('--config', default=CONFIG_FILE, help="configuration file (default: configfile.txt)")
+    parser.add_argument('--reference', choices=REFERENCES, help="reference for splitting the movie: subtitle file (srt) or inaSpeechSegmenter (ina)")
+    parser.add_argument('--srt-file', help="subtitle file of the movie, - to extract it from the movie (default: pelicula.srt)")
+    parser.add_argument('--duration', help="desired duration of the summarized movie, hh:mm:ss.ms (3 decimals for ms)")
+    parser.add_argument('--voice-else-analysis', action=argparse.BooleanOptionalAction, default=None,
+                        help="male/female voice/else analysis with inaSpeechSegmenter")
+    parser.add_argument('--restart', action=argparse.BooleanOptionalAction, default=None,
+                        help="empty the input folder, except for the movie, once the zip file is created")
+    parser.add_argument('--checkpoints', action=argparse.BooleanOptionalAction, default=None,
+                        help="skip the stages whose inputs and parameters did not change since the last execution (default: yes)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only analyse the movie and write the acceleration plan (plan.json) with the predicted duration, nothing is cut or encoded")
+    parser.add_argument('--export-srt', action=argparse.BooleanOptionalAction, default=None,
+                        help="write the voice/else timelines as srt files (voice-else_subs.srt, compr_subs.srt, compr_subs_acc.srt)")
+    parser.add_argument('--smart-cut', action=argparse.BooleanOptionalAction, default=None,
+                        help="cut the fragments copying the complete GOPs of the movie instead of encoding it with all frames as keyframes (default: no)")
+    parser.add_argument('--virtual-fragments', action=argparse.BooleanOptionalAction, default=None,
+                        help="encode each fragment of the summarized movie directly from the movie, without writing the cut and accelerated fragments (default: no)")
+    parser.add_argument('--audio-format', choices=tuple(audio.AUDIO_CODECS), help="format of the summarized podcast (default: m4a)")
+    parser.add_argument('--workers', type=int, help="number of stages running at the same time, 1 to run them one after the other (default: 4)")
+    parser.add_argument('--motion-workers', type=int, help="number of processes of the optical flow analysis (default: one per core)")
+    parser.add_argument('--trace', help="file where the trace of the stages is written: JSON lines (.jsonl) or Chrome trace_event (.json)")
+    parser.add_argument('--non-interactive', action='store_true', help="never ask by keyboard, unanswered questions take their default value")
+    for key in CONFIG_KEYS:
+        parser.add_argument('--' + key.replace('_', '-'), dest=key, help=f"replaces {key} of the configuration file")
+    return parser.parse_args(argv)
+
+##
+# @brief Main script of the processing. It reads the arguments from configfile.txt and from the command line and asks by keyboard the questions not answered in the command line 
+# (unless --non-interactive is given). Then, it runs the processing.
+# @param argv   The list of arguments, sys.argv[1:] by default.
+# @return  The JobResult of the processing.
+##
+def main(argv=None):
+    args = parse_arguments(argv)
+    interactive = not args.non_interactive
+
+    reference = args.reference
+    if reference is None and interactive:
+        reference = input(
+            "Choose the desired reference for splitting the movie:\n inaSpeechSegmenter results (type ina) of subtitle file (type srt): ")
 
-    ######## delete all files included in the zip, but the original movie file ########
-    os.chdir(main_path)
-    restart_option = input(
-        "Do you want to empty the input folder, except for the movie you provided as input? <yes> or any key: ")
-    if restart_option == 'yes':
-        import Restart
-        try:
-            Restart.main(input_path, movie_name)
-        except Exception as e:
-            print("An error occurred:", e)
+    overrides = {key: getattr(args, key) for key in CONFIG_KEYS}
+    job = from_configfile(args.config, reference=reference, srt_file=args.srt_file, target_duration=args.duration,
+                          voice_else_analysis=args.voice_else_analysis, restart=args.restart, checkpoints=args.checkpoints, trace_file=args.trace,
+                          workers=args.workers, motion_workers=args.motion_workers, export_srt=args.export_srt, dry_run=args.dry_run, smart_cut=args.smart_cut,
+                          virtual_fragments=args.virtual_fragments, audio_format=args.audio_format,
+                          original_title=args.original_title, **overrides)
 
-        print(f"\n------- Step {n_step}* optional - the <input> folder is empty and ready for a new movie\nall the files generated and used for the previous movies can be found in their corresponding zip files\n--> COMPLETE ------")
+    if job.target_duration is None and interactive:
+        job.ask_duration = lambda: input("If you are not pleased with the predicted length of the movie, insert here the desired duration in the following format: hh:mm:ss.ms (3 decimals for ms)\nOtherwise, press any key: ")
+    if args.voice_else_analysis is None and interactive:
+        job.ask_voice_else_analysis = lambda: input(
+            "Do you want to do a voice else analysis to obtain male/female voice/else percentages with inaAnalysis? <yes> or any key: ") == 'yes'
+    if args.restart is None and interactive:
+        job.ask_restart = lambda: input(
+            "Do you want to empty the input folder, except for the movie you provided as input? <yes> or any key: ") == 'yes'
 
-    return 
+    return run(job)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,18 +6,28 @@ maximum flow of all non-speech fragments has been considered to correspond to th
 (acc_motion_max). A large number of films from different genres, directors and years of release could have been analysed, but this option has been chosen as it is simpler and 
 there are motion acceleration setting parameters.
 
+The optical flow of each else fragment does not depend on the others until the percentiles of all of them are calculated, so the fragments are analysed at the same time in a
+pool of processes (with a limited number of OpenCV threads each) and their magnitudes are gathered in order. The long fragments (e.g. the end credits) are split into chunks
+that overlap by one analysed frame, so their chunks are analysed at the same time too and joined as if the fragment was analysed at once.
+
 Unlike voice acceleration, motion acceleration cannot be calculated with velocities because it is not a concrete magnitude, they are unitless values whose value is relative, a unit 
-could be defined obtaining a maximum, although it is not considered appropriate. In this process all the non-speech fragments that appear in ''compr_subs.srt'' will be analysed.
+could be defined obtaining a maximum, although it is not considered appropriate. In this process all the non-speech fragments of the compressed timeline will be analysed.
 
 """
 
 import cv2
+import multiprocessing
 import numpy as np
 import os
 import pandas as pd
-import pysubs2
+import re
+from concurrent.futures import ProcessPoolExecutor
 
 import format_ffmpeg_scene_cut
+import frame_reader
+from stage_limiter import heavy_stage
+from timeline import ELSE, Timeline, to_ms
+import tracing
 
 ## Parameter as threshold to detect scene cuts, range {0 1}, the lower it is, the lower the threshold
 SCENE_CUT_THRESHOLD = 0.2
@@ -31,6 +41,27 @@ PERCENTAGE_LOW = 20
 ## Decimals to be rounded off in srt for acceleration factor in motion
 N_DECIMALS_ACC = 3
 
+## Rows of the moving average of the magnitude of the optical flow in each frame
+WINDOW_SIZE = 15
+
+## Rows between the starts of two windows of the moving average
+WINDOW_STEP = 5
+
+## Percentile of the windows of a frame above which the windows are considered high-motion regions
+HIGH_MOTION_PERCENTILE = 90
+
+## Minimum number of frames analysed in each chunk of a fragment, the long fragments are split into chunks analysed at the same time
+MIN_CHUNK_FRAMES = 200
+
+## Threads of OpenCV in each process of the optical flow analysis
+OPENCV_THREADS = 1
+
+## File where the optical flow values of all the else fragments are saved between the analysis and the calculation of the accelerations (MotionTable)
+MOTION_FILE = 'motion_flow.npz'
+
+## Columns of the optical flow samples: video, frame, time from the start of the video, magnitude and time until the end of the video
+MOTION_DTYPE = np.dtype([('n-video', np.int32), ('n-frame', np.int64), ('time-s', np.float64), ('magnitude', np.float64), ('rem-time-s', np.float64)])
+
 ##
 # @brief  Extracts the duration of the input video in frames.
 # @param filename   The input filename to determine exact duration from number of frames and fps.
@@ -48,101 +79,279 @@ def mp4_duration_frames(filename):
     return duration, frame_count, fps
 
 ##
-# @brief  Function that creates a dense optical flow field to calculate magnitudes from the video.
+# @brief  Summary of the motion of a frame: mean of the row windows (moving average of %WINDOW_SIZE% rows every %WINDOW_STEP% rows) above their %HIGH_MOTION_PERCENTILE%
+# percentile. The means of all the windows are obtained at once from the cumulative sum of the means of the rows.
+# @param magnitude   The magnitude of the optical flow of the frame.
+# @return  The mean of the high-motion windows, None if the frame has fewer rows than a window.
+##
+def motion_summary(magnitude):
+    n_windows = len(range(0, magnitude.shape[0] - WINDOW_SIZE, WINDOW_STEP))
+    if n_windows <= 0:
+        return None
+    cumulative = np.r_[0, np.cumsum(magnitude.mean(axis=1, dtype=np.float64))]
+    starts = np.arange(n_windows) * WINDOW_STEP
+    mean_mags = (cumulative[starts + WINDOW_SIZE] - cumulative[starts]) / WINDOW_SIZE
+    high_motion_threshold = np.percentile(mean_mags, HIGH_MOTION_PERCENTILE) # Threshold for high motion
+    return np.mean(mean_mags[mean_mags > high_motion_threshold])
+
+##
+# @brief  Function that creates a dense optical flow field to calculate magnitudes from the video. The frames are read in gray and downscaled by ffmpeg (frame_reader.py),
+# only one of every %frame_skip% frames is read, so each frame is compared with the frame %frame_skip% frames before.
 # @param video_name   The name of the video file.
 # @param frame_skip   The number of frames to skip.
+# @param time_range   The start and end time (seconds) of the interval analysed (end None to analyse until the end), the whole video if it is not given.
+# @param analysis_width   The width of the frames analysed, None to analyse them at the size of the video.
+# @param n_frames   The number of frames of the interval, calculated from the interval and the frame rate if it is not given.
 # @return  The list of the magnitudes of the optical flow.
 ##
-def optical_flow_dense_from_video(video_name, frame_skip):
-    cap = cv2.VideoCapture(video_name)
-    # Get the first frame and convert it to grayscale
-    ret, frame1 = cap.read()
-    prvs = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
-    
-    mag_list = []
-    frame_count = 0
-    while True:
-        ret, frame2 = cap.read()
-        if not ret:
-            break
-
-        frame_count += 1 
-        if frame_skip:
-            if frame_count % frame_skip != 0:
-                continue
-            
-        next_frame = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
-        # Calculates dense optical flow by Farneback method
-        flow = cv2.calcOpticalFlowFarneback(prvs, next_frame, None, 0.5, 3, 15, 3, 5, 1.2, 0)
-        magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-        # Define the window size for the moving average
-        window_size = 15
-        step_size = 5
-        mean_mags = [] 
-        # Apply the moving average
-        for i in range(0, magnitude.shape[0] - window_size, step_size):
-            window = magnitude[i : i + window_size]
-            mean_mag = np.mean(window)
-            mean_mags.append(mean_mag)
-        # Analyze the mean magnitudes to identify high-motion regions
-        if len(mean_mags)>0:
-            high_motion_threshold = np.percentile(mean_mags, 90) # Threshold for high motion
-            high_motion_windows = [mag for mag in mean_mags if mag > high_motion_threshold]
-            mean95 = np.mean(high_motion_windows)
-            mag_list.append(mean95)
-
-        prvs = next_frame
-    cap.release()
-    cv2.destroyAllWindows()
-
-    return mag_list
+def optical_flow_dense_from_video(video_name, frame_skip, time_range=None, analysis_width=frame_reader.ANALYSIS_WIDTH, n_frames=None):
+
+    def flow_magnitudes(source):
+        limit = n_frames
+        if limit is None and time_range is not None and time_range[1] is not None:
+            # the interval is read from the original movie, as if it was the fragment cut by Movie_cutter
+            limit = round((time_range[1] - time_range[0]) * source.fps)
+        # Get the first frame, the next frames are read in the other array
+        prvs = source.new_frame()
+        next_frame = source.new_frame()
+        if not source.read(prvs):
+            return []
+
+        mag_list = []
+        # ffmpeg only gives one of every %frame_skip% frames, the number of the frame in the video advances by step
+        step = frame_skip or 1
+        frame_count = 0
+        while True:
+            if limit is not None and frame_count + step >= limit:
+                break
+            if not source.read(next_frame):
+                break
+            frame_count += step
+
+            # Calculates dense optical flow by Farneback method
+            flow = cv2.calcOpticalFlowFarneback(prvs, next_frame, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+            magnitude = cv2.magnitude(flow[..., 0], flow[..., 1])
+            # Analyze the mean magnitudes of the row windows to identify high-motion regions
+            mean95 = motion_summary(magnitude)
+            if mean95 is not None:
+                mag_list.append(mean95)
+
+            prvs, next_frame = next_frame, prvs
+        return mag_list
+
+    return frame_reader.read_gray_frames(video_name, flow_magnitudes, analysis_width, time_range, frame_skip)
+
+##
+# @brief  Sets the number of threads of OpenCV, it is called by the initializer of each process of the pool of the optical flow analysis.
+# @param opencv_threads   The number of threads.
+##
+def init_opencv(opencv_threads):
+    cv2.setNumThreads(opencv_threads)
+
+##
+# @brief  Splits the interval of a video into chunks that can be analysed at the same time. The frames analysed are 0, frame_skip, 2*frame_skip..., each chunk starts at the
+# last frame analysed by the previous one (they overlap by one analysed frame), so the magnitudes of the chunks joined in order are the same as the magnitudes of the whole interval.
+# The frames are taken at a constant frame rate (frame_reader.video_timing), each chunk starts half a frame before its first frame.
+# @param video_name   The name of the video file.
+# @param frame_skip   The number of frames to skip.
+# @param time_range   The start and end time (seconds) of the interval analysed, the whole video if it is not given.
+# @param chunk_frames   The number of frames analysed in each chunk.
+# @return  The list of chunks: interval (start and end time in seconds, end None until the end) and number of frames, None if the interval is not split.
+##
+def flow_chunks(video_name, frame_skip, time_range, chunk_frames):
+    fps, offset, duration = frame_reader.video_timing(video_name)
+    start, end = time_range if time_range is not None else (0, duration)
+    n_frames = round((end - start) * fps)
+    step = frame_skip or 1
+    n_analysed = (n_frames - 1) // step
+    n_chunks = n_analysed // chunk_frames
+    if n_chunks <= 1:
+        return [(time_range, None)]
+
+    # first frame of the interval, the frames of the video are at offset + k/fps
+    first_time = offset + np.ceil((start - offset) * fps - 1e-6) / fps
+    bounds = np.linspace(0, n_analysed, n_chunks + 1).round().astype(int) * step
+    chunks = []
+    for count in range(n_chunks):
+        chunk_start = first_time + (bounds[count] - 0.5) / fps
+        if count < n_chunks - 1:
+            chunk_frames_count = bounds[count + 1] - bounds[count] + 1
+            chunks.append(((max(0.0, chunk_start), chunk_start + (chunk_frames_count + 1) / fps), chunk_frames_count))
+        elif time_range is not None:
+            chunks.append(((max(0.0, chunk_start), end), n_frames - bounds[count]))
+        else:
+            # the last chunk of a whole video is read until the end, as the whole video
+            chunks.append(((max(0.0, chunk_start), None), None))
+    return chunks
+
+##
+# @brief  Calculates the magnitudes of the optical flow of several videos at the same time in a pool of processes. The videos are independent until the percentiles are
+# calculated, and the long videos are split into chunks that overlap by one analysed frame (flow_chunks), so the magnitudes of the chunks are only joined in order at the end.
+# @param path   The path where the video files are stored.
+# @param videos_order   The list of the video files in order by number.
+# @param frame_skip   The number of frames to skip.
+# @param ranges   The interval (start and end time in seconds) of each video analysed, None to analyse the whole videos.
+# @param analysis_width   The width of the frames analysed, None to analyse them at the size of the video.
+# @param workers   The number of processes, the number of cores divided by %opencv_threads% if it is not given.
+# @param opencv_threads   The number of threads of OpenCV in each process.
+# @return  The list of the magnitudes of each video, in the order of the videos.
+##
+def optical_flow_of_videos(path, videos_order, frame_skip, ranges=None, analysis_width=frame_reader.ANALYSIS_WIDTH, workers=None, opencv_threads=OPENCV_THREADS):
+    files = [os.path.join(path, vid) for vid in videos_order]
+    time_ranges = ranges if ranges else [None] * len(files)
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // max(1, opencv_threads))
+    workers = max(1, int(workers))
+    if workers == 1:
+        return [optical_flow_dense_from_video(filer, frame_skip, time_range, analysis_width) for filer, time_range in zip(files, time_ranges)]
+
+    # the frames of all the videos are shared out between the processes, no chunk is shorter than MIN_CHUNK_FRAMES analysed frames
+    durations = [(time_range[1] - time_range[0]) if time_range is not None else frame_reader.video_timing(filer)[2]
+                 for filer, time_range in zip(files, time_ranges)]
+    fps = max(frame_reader.video_timing(files[0])[0], 1) if files else 1
+    chunk_frames = max(MIN_CHUNK_FRAMES, int(sum(durations) * fps / (frame_skip or 1) / workers))
+    tasks = []
+    for count, (filer, time_range) in enumerate(zip(files, time_ranges)):
+        for chunk_range, n_frames in flow_chunks(filer, frame_skip, time_range, chunk_frames):
+            tasks.append((count, filer, chunk_range, n_frames))
+
+    # the processes are started as in batch.py, each one with its own OpenCV threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context, initializer=init_opencv, initargs=(opencv_threads,)) as executor:
+        # the ffmpeg processes of the workers are added to the trace of the stage (tracing.collect)
+        results = executor.map(tracing.collect, [optical_flow_dense_from_video] * len(tasks), [task[1] for task in tasks], [frame_skip] * len(tasks),
+                               [task[2] for task in tasks], [analysis_width] * len(tasks), [task[3] for task in tasks])
+        magnitudes = [[] for _ in files]
+        for task, (values, records, origin) in zip(tasks, results):
+            tracing.adopt(records, origin)
+            magnitudes[task[0]].extend(values)
+    return magnitudes
+
+##
+# @brief Optical flow samples of all the else fragments in columnar form: one record per analysed frame (%MOTION_DTYPE%), in order of video and frame, and the statistics
+# of all of them (high and low percentiles of the magnitude) with the acceleration limits used.
+##
+class MotionTable:
+    __slots__ = ('samples', 'percentile_high', 'percentile_low', 'acc_max', 'acc_min')
+
+    ##
+    # @brief  Creates the table from its samples, the percentiles are calculated from the magnitudes.
+    # @param samples   The structured array of the samples (%MOTION_DTYPE%).
+    # @param acc_max   The maximum acceleration.
+    # @param acc_min   The minimum acceleration.
+    ##
+    def __init__(self, samples, acc_max, acc_min):
+        self.samples = samples
+        self.acc_max = acc_max
+        self.acc_min = acc_min
+        magnitude = samples['magnitude']
+        # the frames without magnitude are skipped, as pandas does
+        if np.isnan(magnitude).all():
+            self.percentile_high = self.percentile_low = np.nan
+        else:
+            self.percentile_high = np.nanpercentile(magnitude, PERCENTAGE_HIGH)
+            self.percentile_low = np.nanpercentile(magnitude, PERCENTAGE_LOW)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __repr__(self):
+        return f"MotionTable({len(self)} samples)"
+
+    ##
+    # @brief  Samples of one video, a view of the table (nothing is copied).
+    # @param count   The position of the video in the list of videos analysed.
+    # @return  The structured array of the samples of the video.
+    ##
+    def video(self, count):
+        n_video = self.samples['n-video']
+        return self.samples[np.searchsorted(n_video, count, side='left'):np.searchsorted(n_video, count, side='right')]
+
+    ##
+    # @brief  Maximum and minimum magnitude of all the samples.
+    # @return  The maximum and the minimum.
+    ##
+    def limits(self):
+        magnitude = self.samples['magnitude']
+        if len(magnitude) == 0 or np.isnan(magnitude).all():
+            return np.nan, np.nan
+        return np.nanmax(magnitude), np.nanmin(magnitude)
+
+    ##
+    # @brief  Saves the table in a NumPy file (.npz).
+    # @param path   The path of the file.
+    ##
+    def save(self, path):
+        with open(path, 'wb') as file:
+            np.savez(file, samples=self.samples, acc_limits=np.array([self.acc_max, self.acc_min], dtype=np.float64))
+
+    ##
+    # @brief  Reads a table saved with save.
+    # @param path   The path of the file.
+    # @return  The table.
+    ##
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            acc_max, acc_min = data['acc_limits']
+            return MotionTable(data['samples'], float(acc_max), float(acc_min))
+
+##
+# @brief  Converts the samples of one video to the dataframe used by the calculation of its accelerations (time_series_subsegments and the next steps).
+# @param samples   The structured array of the samples of the video (MotionTable.video).
+# @return  The dataframe, with the columns of the samples and an empty acceleration column.
+##
+def video_dataframe(samples):
+    df = pd.DataFrame({name: samples[name] for name in ('magnitude', 'n-frame', 'time-s', 'rem-time-s', 'n-video')})
+    df["acc"] = np.nan
+    return df
 
 ##
 # @brief Calculate the optical flow parameters from all the else fragments:
-# Every %frame_skip% frames, the optical flow is calculated, parameters are appended to a dataframe for statistics.
-# After processing each fragment, percentile high and low values are calculated and the maximum and minimum acceleration values are assigned to the dataframe.
+# Every %frame_skip% frames, the optical flow is calculated, the samples of all the fragments are stored in the columns of a MotionTable for statistics.
+# Once all the fragments are processed, percentile high and low values are calculated from all the magnitudes.
 # @param path   The path where the video files are stored.
 # @param videos_order   The list of the video files in order by number.
 # @param frame_skip   The number of frames to skip.
 # @param acc_max   The maximum acceleration.
 # @param acc_min   The minimum acceleration.
-# @return  The dataframe with the optical flow values.
+# @param ranges   The interval (start and end time in seconds) of each video analysed, None to analyse the whole videos.
+# @param analysis_width   The width of the frames analysed, None to analyse them at the size of the video.
+# @param workers   The number of processes of the optical flow analysis, the number of cores divided by %opencv_threads% if it is not given.
+# @param opencv_threads   The number of threads of OpenCV in each process.
+# @return  The MotionTable with the optical flow values.
 # 
-def calculate_opticalflow_parameters_df(path, videos_order, frame_skip, acc_max, acc_min):
-    
-    columns= pd.Series(["magnitude","n-frame", "time-s", "percentile-high", "percentile-low", "acc", "acc-max", "acc-min", "rem-time-s"])
-    df = pd.DataFrame(columns= columns)
-    
+def calculate_opticalflow_parameters(path, videos_order, frame_skip, acc_max, acc_min, ranges=None, analysis_width=frame_reader.ANALYSIS_WIDTH,
+                                     workers=None, opencv_threads=OPENCV_THREADS):
+
+    with heavy_stage():
+        magnitudes = optical_flow_of_videos(path, videos_order, frame_skip, ranges, analysis_width, workers, opencv_threads)
+
+    samples = np.empty(sum(len(lista) for lista in magnitudes), dtype=MOTION_DTYPE)
     count_df = 0
+    # the times of the frames are taken from the timing used to read them (frame_reader), once for each file: with ranges all of them are in the same movie
+    timings = {vid: frame_reader.video_timing(os.path.join(path, vid)) for vid in dict.fromkeys(videos_order)}
     
     for count_vid, vid in enumerate(videos_order):
-        filer = os.path.join(path, vid)
-        lista = optical_flow_dense_from_video(filer, frame_skip)
+        time_range = ranges[count_vid] if ranges else None
+        lista = magnitudes[count_vid]
         
-        duration, frame_count, fps = mp4_duration_frames(filer)
-        
-        for count, value in enumerate(lista):
-            if frame_skip:
-                n_frame = frame_skip + count * (frame_skip)
-            else:
-                n_frame = count
-                
-            df.loc[count_df, "n-frame"] = n_frame
-            df.loc[count_df, "time-s"] = df.loc[count_df, "n-frame"]/fps
-            df.loc[count_df, "magnitude"] = value
-            df.loc[count_df, "rem-time-s"] = duration - df.loc[count_df, "time-s"]
-            df.loc[count_df, "n-video"] = count_vid
-            count_df += 1
-
-    percentile_high = df["magnitude"].quantile(PERCENTAGE_HIGH/100)
-    percentile_low = df["magnitude"].quantile(PERCENTAGE_LOW/100)
-    
-    df.loc[0, "percentile-high"] = percentile_high
-    df.loc[0, "percentile-low"] = percentile_low
-    df.loc[0, "acc-min"] = acc_min
-    df.loc[0, "acc-max"] = acc_max
+        fps, _, duration = timings[vid]
+        if time_range is not None:
+            duration = time_range[1] - time_range[0]
+
+        video = samples[count_df:count_df + len(lista)]
+        n_frame = np.arange(len(lista))
+        if frame_skip:
+            n_frame = frame_skip + n_frame * frame_skip
+        video['n-video'] = count_vid
+        video['n-frame'] = n_frame
+        video['time-s'] = n_frame / fps
+        video['magnitude'] = lista
+        video['rem-time-s'] = duration - video['time-s']
+        count_df += len(lista)
     
-    return df
+    return MotionTable(samples, acc_max, acc_min)
 
 ##
 # @brief  Get the acceleration from the limits
@@ -254,11 +463,12 @@ def correct_acc_min_video_duration(df):
 # @param scene_cut_threshold   The threshold to detect scene cuts
 # @param df   The dataframe with the optical flow values
 # @param min_acc_scene_duration   The minimum accelerated scene duration
+# @param time_range   The start and end time (seconds) of the interval of the video analysed, the whole video if it is not given
 # @return  The dataframe with the corrected accelerations
 ##
-def correct_acc_from_scene_cuts(path, filename, scene_cut_threshold, df, min_acc_scene_duration):
+def correct_acc_from_scene_cuts(path, filename, scene_cut_threshold, df, min_acc_scene_duration, time_range=None):
     
-    scene_cut_times = format_ffmpeg_scene_cut.main(path, filename, scene_cut_threshold)
+    scene_cut_times = format_ffmpeg_scene_cut.main(path, filename, scene_cut_threshold, time_range)
     
     #Time case is 0.101 and skipping 5 frames, first time is 0.2
     if df.loc[0, "time-s"]>scene_cut_times[0]:
@@ -315,120 +525,186 @@ def correct_groups_acc_interval(df):
     return df
     
 ##
-# @brief  This function creates a new srt file with the acceleration values of the non-speech fragments.
-# Once all the processing is done for each fragment, the acceleratetion of the new fragment is added at the end of the file with the format ''else(\d.\d\d)''.
+# @brief  This function adds the acceleration values of the non-speech fragments to the timeline.
+# Once all the processing is done for each fragment, its else segment is replaced by the new segments found, with the factor of their acceleration (''else(\d.\d\d)'' in the srt files).
 # @param path   The path where the video files are stored
-# @param srt_file   The original subtitle file
+# @param timeline   The timeline with the voice accelerations
 # @param frame_skip   The number of frames to skip
 # @param min_acc_scene_duration   The minimum accelerated scene duration
 # @param min_video_duration   The minimum video duration
 # @param acc_max   The maximum acceleration
 # @param acc_min   The minimum acceleration
 # @param videos_order   The list of the video files in order by number
+# @param flag_podcast   Flag to indicate if the input is a podcast, the constant acceleration is used
+# @param acc_constant   The constant acceleration of the podcasts
+# @param motion   The MotionTable with the optical flow values, calculated if it is not given
+# @param ranges   The interval of each video analysed, None if the videos are the else fragments
+# @return  The timeline with the voice and else accelerations
 ##
-def srt_generator(path, srt_file, frame_skip, min_acc_scene_duration, min_video_duration, acc_max, acc_min, 
-                  videos_order, flag_podcast, acc_constant):
+def srt_generator(path, timeline, frame_skip, min_acc_scene_duration, min_video_duration, acc_max, acc_min, 
+                  videos_order, flag_podcast, acc_constant, motion=None, ranges=None):
 
-     subs = pysubs2.load(srt_file, encoding= 'UTF-8', format_= 'srt')
+     is_else = timeline.is_kind(ELSE)
      
      if flag_podcast:
-        for sub in subs:
-            if sub.text == "else":
-                sub.text+=str(round(1/acc_constant, N_DECIMALS_ACC))
-     else:
-         list_sub_times=[]
+        timeline = timeline.copy()
+        timeline.factor[is_else] = round(1/acc_constant, N_DECIMALS_ACC)
+        return timeline
+     
+     list_sub_times = [timeline.seconds(i) for i in np.flatnonzero(is_else)]
+     new_start, new_end, new_factor = [], [], []
+     
+     if motion is None:
+         motion = calculate_opticalflow_parameters(path, videos_order, frame_skip, acc_max, acc_min, ranges)
+     percentile_high = motion.percentile_high
+     percentile_low = motion.percentile_low
+     value_max, value_min = motion.limits()
+     
+     for count, vid in enumerate(videos_order):
+
+         df = video_dataframe(motion.video(count))
          
-         for sub in subs:
-             if sub.text == "else":
-                 list_sub_times.append([sub.start/1000, sub.end/1000])
-                 subs.remove(sub)
+         df, error = time_series_subsegments(df, min_video_duration, percentile_high, percentile_low, acc_max, acc_min, 
+                                             value_max, value_min)
          
-         df_total = calculate_opticalflow_parameters_df(path, videos_order, frame_skip, acc_max, acc_min)
-         percentile_high = df_total.loc[0, "percentile-high"]
-         percentile_low = df_total.loc[0, "percentile-low"]
-         value_max = max(df_total["magnitude"])
-         value_min = min(df_total["magnitude"])
+         start_time = list_sub_times[count][0]
+         end_time = list_sub_times[count][1]
          
-         for count, vid in enumerate(videos_order):
-    
-             df = df_total[df_total["n-video"]==count].copy().reset_index(drop=True)
-             
-             df, error = time_series_subsegments(df, min_video_duration, percentile_high, percentile_low, acc_max, acc_min, 
-                                                 value_max, value_min)
-             
-             start_time = list_sub_times[count][0]
-             end_time = list_sub_times[count][1]
-             
-             if not error:
-                 df = correct_acc_from_scene_cuts(path, vid, SCENE_CUT_THRESHOLD, df, min_acc_scene_duration)
-                 df = correct_groups_acc_interval(df)
+         if not error:
+             df = correct_acc_from_scene_cuts(path, vid, SCENE_CUT_THRESHOLD, df, min_acc_scene_duration, ranges[count] if ranges else None)
+             df = correct_groups_acc_interval(df)
 
-                 groups = df['acc-interval'].unique()
-                 df["time-s"]+=start_time
-                 
-                 for i, group in enumerate(groups):
-                     
-                     group_max = df[df['acc-interval'] == group]['time-s'].max()
-                     
-                     acc = max(df[df['acc-interval'] == group]['acc'].unique())
+             groups = df['acc-interval'].unique()
+             df["time-s"]+=start_time
              
-                     if i == 0:
-                         min_time = start_time
-                     else:
-                         min_time = df[df['acc-interval'] == groups[i - 1]]['time-s'].max()
-                     if i == len(groups) - 1:
-                         max_time = end_time 
-                     else:
-                         max_time = group_max
-                     
-                     acc_div = round(1/acc, N_DECIMALS_ACC)
-                     if acc_div > (1/acc_min):
-                         acc_div = 1/acc_min
-                     subs.append(pysubs2.SSAEvent(start = pysubs2.make_time(s=min_time), end=pysubs2.make_time(s=max_time), text=f"else{acc_div}"))
+             for i, group in enumerate(groups):
+                 
+                 group_max = df[df['acc-interval'] == group]['time-s'].max()
+                 
+                 acc = max(df[df['acc-interval'] == group]['acc'].unique())
          
-             else:
-                 acc = df.loc[0, "acc"]
+                 if i == 0:
+                     min_time = start_time
+                 else:
+                     min_time = df[df['acc-interval'] == groups[i - 1]]['time-s'].max()
+                 if i == len(groups) - 1:
+                     max_time = end_time 
+                 else:
+                     max_time = group_max
+                 
                  acc_div = round(1/acc, N_DECIMALS_ACC)
                  if acc_div > (1/acc_min):
                      acc_div = 1/acc_min
-                 subs.append(pysubs2.SSAEvent(start = pysubs2.make_time(s=start_time), end=pysubs2.make_time(s=end_time), text=f"else{acc_div}"))
-        
-     subs.sort()
-     subs.save(srt_file)
-     return 1
+                 new_start.append(min_time)
+                 new_end.append(max_time)
+                 new_factor.append(acc_div)
+     
+         else:
+             acc = df.loc[0, "acc"]
+             acc_div = round(1/acc, N_DECIMALS_ACC)
+             if acc_div > (1/acc_min):
+                 acc_div = 1/acc_min
+             new_start.append(start_time)
+             new_end.append(end_time)
+             new_factor.append(acc_div)
+    
+     else_segments = Timeline(to_ms(new_start), to_ms(new_end), np.full(len(new_start), ELSE), new_factor)
+     return Timeline.merge(timeline.select(~is_else), else_segments)
 
 ##
-# @brief  Main function of the script.
+# @brief  Lists the else fragments of the first cut in order by number (\d+else.mp4).
+# @param path   The path where the video files are stored.
+# @return  The list of the video files in order by number.
+##
+def else_videos(path):
+    videos = [n_file for n_file in os.listdir(path) if re.fullmatch(r'\d+else\.mp4', n_file)]
+    return sorted(videos, key=lambda x: int(x.split("else")[0]))
+
+##
+# @brief  Removes the files generated by the scene cut detection (dep files).
+# @param path   The path where the video files are stored.
+##
+def remove_dep_files(path):
+    files = os.listdir(path)
+            
+    for n_file in files:
+        if n_file[-4:]==".mp4":
+            if n_file[-4:]==".dep" or n_file[0:3]=="dep":
+                os.remove(path + '/' + n_file)
+
+##
+# @brief  Videos analysed by the motion analysis: the else fragments cut by Movie_cutter or, if the movie is given, the intervals of the else segments of the timeline in the
+# original movie (nothing is cut or encoded).
+# @param path   The path where the video files are stored.
+# @param movie_name   The name of the original movie, None to analyse the else fragments.
+# @param timeline   The timeline with the else segments, only used with the movie.
+# @return  The list of videos and the list of intervals (None for the fragments).
+##
+def motion_sources(path, movie_name=None, timeline=None):
+    if movie_name is None:
+        return else_videos(path), None
+    ranges = [timeline.seconds(i) for i in np.flatnonzero(timeline.is_kind(ELSE))]
+    return [movie_name] * len(ranges), ranges
+
+##
+# @brief  Optical flow analysis of all the else fragments, the values are saved in MOTION_FILE to calculate the accelerations later (apply).
+# @param path   The path where the video files are stored.
+# @param frame_skip   The number of frames to skip.
+# @param acc_max   The maximum acceleration.
+# @param acc_min   The minimum acceleration.
+# @param movie_name   The name of the original movie, to analyse the else segments of the timeline in the movie instead of the fragments.
+# @param timeline   The timeline with the else segments, only used with the movie.
+# @param analysis_width   The width of the frames analysed, None to analyse them at the size of the video.
+# @param workers   The number of processes of the optical flow analysis, the number of cores divided by %opencv_threads% if it is not given.
+# @param opencv_threads   The number of threads of OpenCV in each process.
+##
+def analyse(path, frame_skip, acc_max, acc_min, movie_name=None, timeline=None, analysis_width=frame_reader.ANALYSIS_WIDTH, workers=None, opencv_threads=OPENCV_THREADS):
+    videos, ranges = motion_sources(path, movie_name, timeline)
+    motion = calculate_opticalflow_parameters(path, videos, frame_skip, acc_max, acc_min, ranges, analysis_width, workers, opencv_threads)
+    motion.save(os.path.join(path, MOTION_FILE))
+    return 1
+
+##
+# @brief  Calculates the accelerations of the else fragments from the values saved by analyse and adds them to the timeline.
 # @param path   The path where the video files are stored.
-# @param srt_file   The original subtitle file.
+# @param timeline   The timeline with the voice accelerations.
 # @param frame_skip   The number of frames to skip.
 # @param acc_max   The maximum acceleration.
 # @param acc_min   The minimum acceleration.
 # @param min_acc_scene_duration   The minimum accelerated scene duration.
 # @param min_video_duration   The minimum video duration.
+# @param flag_podcast   Flag to indicate if the input is a podcast, the constant acceleration is used.
+# @param acc_constant   The constant acceleration of the podcasts.
+# @param movie_name   The name of the original movie, if it was analysed instead of the fragments (analyse).
+# @return  The timeline with the voice and else accelerations.
 ##
-def main(path, srt_file, frame_skip, acc_max, acc_min, min_acc_scene_duration, min_video_duration, flag_podcast, acc_constant):
+def apply(path, timeline, frame_skip, acc_max, acc_min, min_acc_scene_duration, min_video_duration, flag_podcast, acc_constant, movie_name=None):
+    motion = None
+    if not flag_podcast:
+        motion = MotionTable.load(os.path.join(path, MOTION_FILE))
     
-    files = os.listdir(path)
-    videos = []
+    videos, ranges = motion_sources(path, movie_name, timeline)
+    timeline = srt_generator(path, timeline, frame_skip, min_acc_scene_duration, min_video_duration, acc_max, acc_min, videos, 
+                             flag_podcast, acc_constant, motion, ranges)
     
-    for n_file in files:
-        if n_file[-4:]==".mp4":
-            if n_file[-8:-4]=="else": # To select only else fragments
-                videos.append(n_file)
-                
-    # Video order by number (\d+else.mp4)
-    videos_order = sorted(videos, key=lambda x: int(x.split("else")[0]))
+    remove_dep_files(path)
+    return timeline
+##
+# @brief  Main function of the script.
+# @param path   The path where the video files are stored.
+# @param timeline   The timeline with the voice accelerations.
+# @param frame_skip   The number of frames to skip.
+# @param acc_max   The maximum acceleration.
+# @param acc_min   The minimum acceleration.
+# @param min_acc_scene_duration   The minimum accelerated scene duration.
+# @param min_video_duration   The minimum video duration.
+# @return  The timeline with the voice and else accelerations.
+##
+def main(path, timeline, frame_skip, acc_max, acc_min, min_acc_scene_duration, min_video_duration, flag_podcast, acc_constant):
     
-    srt_generator(path, srt_file, frame_skip, min_acc_scene_duration, min_video_duration, acc_max, acc_min, videos_order, 
-                  flag_podcast, acc_constant)
+    timeline = srt_generator(path, timeline, frame_skip, min_acc_scene_duration, min_video_duration, acc_max, acc_min, else_videos(path), 
+                             flag_podcast, acc_constant)
     
-    files = os.listdir(path)
-            
-    for n_file in files:
-        if n_file[-4:]==".mp4":
-            if n_file[-4:]==".dep" or n_file[0:3]=="dep":
-                os.remove(path + '/' + n_file)
+    remove_dep_files(path)
                 
-    return 1
-    
\ No newline at end of file
+    return timeline
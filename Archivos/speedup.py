@@ -19,6 +19,13 @@ import re
 import subprocess
 import os
 import shutil
+import tempfile
+
+from stage_limiter import heavy_stage
+import tracing
+
+## Name of the accelerated file when speedup is run with the configuration speed file
+RESULT_NAME = 'finalRESULT.mkv'
 
 ## 
 # @brief Function to remove a file
@@ -33,16 +40,16 @@ def REMOVEFILE(filename):
     
 ##
 # @brief Function to delete temporary files
-#
-# .
+# @param work_dir The folder of the temporary files of the acceleration, it is removed too
 ##
-def deleteTempFiles():
-    REMOVEFILE('copy.mp4')
-    REMOVEFILE('audio.mp3')
-    REMOVEFILE('video.mp4')
-    REMOVEFILE('temp.mp4')
-    REMOVEFILE('final.mp4')
-    REMOVEFILE('final.mp3')
+def deleteTempFiles(work_dir):
+    REMOVEFILE(os.path.join(work_dir, 'copy.mp4'))
+    REMOVEFILE(os.path.join(work_dir, 'audio.mp3'))
+    REMOVEFILE(os.path.join(work_dir, 'video.mp4'))
+    REMOVEFILE(os.path.join(work_dir, 'temp.mp4'))
+    REMOVEFILE(os.path.join(work_dir, 'final.mp4'))
+    REMOVEFILE(os.path.join(work_dir, 'final.mp3'))
+    shutil.rmtree(work_dir, ignore_errors=True)
     return
 
 ##
@@ -56,80 +63,96 @@ def name(file_path):
     return file_name
 
 ##
-# @brief Function to accelerate the video
+# @brief Function to obtain the duration of a file with ffprobe
 # @param file_path The path of the file
-# @param speed_factor The acceleration factor
+# @return The duration in seconds
 ##
-def speed(file_path, speed_factor):
-
-    file_name = name(file_path)
+def duration(file_path):
+    result = tracing.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
+         file_path], capture_output=True, text=True)
+    return float(result.stdout.strip())
 
-    subprocess.run(['ffmpeg', '-y', '-i', file_name, '-codec', 'copy', 'copy.mp4'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+##
+# @brief Function to accelerate the video. The temporary files are created in a folder of their own, so several accelerations can run at the same time.
+# @param file_path The path of the file
+# @param speed_factor The acceleration factor
+# @param output_file The path of the accelerated file, finalRESULT.mkv next to the input file by default
+# @param work_path The folder where the folder of temporary files is created, the folder of the input file by default
+##
+def speed(file_path, speed_factor, output_file=None, work_path=None):
+
+    file_name = os.path.basename(file_path)
+    if output_file is None:
+        output_file = os.path.join(os.path.dirname(file_path), RESULT_NAME)
+    work_dir = tempfile.mkdtemp(prefix='speedup_', dir=work_path or os.path.dirname(output_file))
+    copy_file = os.path.join(work_dir, 'copy.mp4')
+    audio_file = os.path.join(work_dir, 'audio.mp3')
+    video_file = os.path.join(work_dir, 'video.mp4')
+    temp_file = os.path.join(work_dir, 'temp.mp4')
+    final_video = os.path.join(work_dir, 'final.mp4')
+    final_audio = os.path.join(work_dir, 'final.mp3')
+
+    tracing.run(['ffmpeg', '-y', '-i', file_path, '-codec', 'copy', copy_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     # creating a .mp4 copy of the file
 
     # separate mp3 and mp4 - both must be accelerated
-    subprocess.run(['ffmpeg', '-y', '-i', 'copy.mp4', 'audio.mp3'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    result = subprocess.run(['ffmpeg', '-y', '-i', 'copy.mp4', '-c:v', 'copy', '-an', 'video.mp4'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    tracing.run(['ffmpeg', '-y', '-i', copy_file, audio_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = tracing.run(['ffmpeg', '-y', '-i', copy_file, '-c:v', 'copy', '-an', video_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     
     # If copy of video without sound cannot be made, it may be because video track is empty, it is highly likely a podcast
     flag_podcast = False
     if result.returncode == 1:
         flag_podcast = True
-        shutil.copyfile("copy.mp4", "video.mp4")
+        shutil.copyfile(copy_file, video_file)
         
 ##### 1. Video part -> apply video filter -> speed set according to the speed_factor #####
-    result = subprocess.run(['ffmpeg', '-y', '-i', 'video.mp4', '-filter:v', f'setpts={speed_factor}*PTS', 'temp.mp4'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = tracing.run(['ffmpeg', '-y', '-i', video_file, '-filter:v', f'setpts={speed_factor}*PTS', temp_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     # Usually associated with flag_podcast, this usually does not the acceleration but neither generates errors
     if result.returncode == 1:
-        shutil.copyfile("video.mp4", "temp.mp4")
+        shutil.copyfile(video_file, temp_file)
         
     # trim the obtained video -> its duration = old_duration * speed_factor
-    old_duration = subprocess.run(
-        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-         'copy.mp4'], capture_output=True, text=True)
-    old_duration = float(old_duration.stdout.strip())
+    old_duration = duration(copy_file)
     speed_f = float(speed_factor)
     new_duration = old_duration * speed_f
-    subprocess.run(['ffmpeg', '-y', '-i', 'temp.mp4', '-to', str(new_duration), '-c', 'copy', 'final.mp4'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    tracing.run(['ffmpeg', '-y', '-i', temp_file, '-to', str(new_duration), '-c', 'copy', final_video], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     
 ##### 2. Audio part #####
-    subprocess.run(['ffmpeg', '-y', '-i', 'audio.mp3', '-af', f'atempo={1/speed_f}', 'final.mp3'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    tracing.run(['ffmpeg', '-y', '-i', audio_file, '-af', f'atempo={1/speed_f}', final_audio], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     # Check possible errors if it is a podcast
-    actual_duration_check_result = subprocess.run(
-        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-         'final.mp4'], capture_output=True, text=True)
-    actual_duration_check = float(actual_duration_check_result.stdout.strip())
+    actual_duration_check = duration(final_video)
     
     # It is wrong when distance from old duration to actual is lower than difference between new duration and actual, and flag was up.
     if (abs(actual_duration_check - old_duration) < abs(actual_duration_check - new_duration)) and flag_podcast:
-        os.unlink("final.mp4")
-        subprocess.run(f"ffmpeg -f lavfi -i color=c=black:s=1280x720:r=1 -c:v libx264 -crf 0 -t {new_duration} final.mp4")
+        os.unlink(final_video)
+        tracing.run(['ffmpeg', '-f', 'lavfi', '-i', 'color=c=black:s=1280x720:r=1', '-c:v', 'libx264', '-crf', '0', '-t', str(new_duration), final_video])
         
 ##### 3. Combine audio & video #####
     # When audio is really small (13 ms, else=1.3s acc=0.1) mp3 is corrupted, solution is to just create the silent video
-    result = subprocess.run(['ffmpeg', '-y', '-i', 'final.mp4', '-i', 'final.mp3', '-c:v', 'copy', '-c:a', 'aac', '-async', '1', 'finalRESULT.mkv'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = tracing.run(['ffmpeg', '-y', '-i', final_video, '-i', final_audio, '-c:v', 'copy', '-c:a', 'aac', '-async', '1', '-f', 'matroska', output_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     if result.returncode == 1:
-        result2 = subprocess.run(['ffmpeg', '-y', '-i', 'final.mp4', '-c:v', 'copy', 'finalRESULT.mkv'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        result2 = tracing.run(['ffmpeg', '-y', '-i', final_video, '-c:v', 'copy', '-f', 'matroska', output_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         if result2.returncode == 0:
             print(f"Error: ffmpeg returned non-zero exit status {result.returncode}. \n ({file_name[:-4]}.mp3 probably corrupted, too small with acc {speed_factor})")
         else:
-            os.rename('final.mp4', 'finalRESULT.mkv')
+            shutil.move(final_video, output_file)
             print(f"Error: ffmpeg returned non-zero exit status {result.returncode} again. \n ({file_name[:-4]}.mp4 probably corrupted, too small with acc {speed_factor})")
         
-    deleteTempFiles()
+    deleteTempFiles(work_dir)
     return
 
 ##
-# @brief Main function with no arguments, because they are in the configuration speed file (configurationSpeed.txt)
-#
-# .
+# @brief Main function, the arguments are in the configuration speed file (configurationSpeed.txt). The accelerated file (finalRESULT.mkv) is created in the folder of the
+# configuration file.
+# @param config_file The configuration speed file
 ##
-def main():
+def main(config_file="configurationSpeed.txt"):
     #configuration file usage
-    with open("configurationSpeed.txt", 'r', encoding='utf8', newline='\r\n') as input:
+    with open(config_file, 'r', encoding='utf8', newline='\r\n') as input:
         data = []
         lines = input.read().splitlines()
         for line in lines:
@@ -138,25 +161,36 @@ def main():
         choice = data[1]
         speed_factor = float(data[2])
         length = float(data[3])
+    output_file = os.path.join(os.path.dirname(os.path.abspath(config_file)), RESULT_NAME)
     
     if choice == "speed":
         if float(speed_factor) == 0.0:
             print("Invalid speed factor!")
-        speed(file_path, speed_factor)
+        with heavy_stage():
+            speed(file_path, speed_factor, output_file)
     
     elif choice == "length":
         if float(length) == 0.0:    #input expressed in minutes
             print("Invalid length!")
-        length = float(length)
-        length = length*60 + 1  #convert to seconds + 1s
-        old_duration = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-             name(file_path)], capture_output=True, text=True)
-        old_duration = float(old_duration.stdout.strip())
-        speed_factor = length/old_duration
-        speed(file_path, speed_factor)
+        speed_to_length(file_path, length, output_file)
     
     else:
         print("Error when selecting input option")
         
-    return
\ No newline at end of file
+    return
+
+##
+# @brief Function to accelerate the video so it lasts the given length
+# @param file_path The path of the file
+# @param length The desired length in minutes
+# @param output_file The path of the accelerated file
+# @param work_path The folder where the folder of temporary files is created
+##
+def speed_to_length(file_path, length, output_file=None, work_path=None):
+    length = float(length)
+    length = length*60 + 1  #convert to seconds + 1s
+    old_duration = duration(file_path)
+    speed_factor = length/old_duration
+    with heavy_stage():
+        speed(file_path, speed_factor, output_file, work_path)
+    return
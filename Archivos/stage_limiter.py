@@ -0,0 +1,35 @@
+"""
+Limit of the CPU-heavy stages running at the same time
+
+When several movies are processed at the same time (batch.py), the all-keyframe re-encode of Movie_cutter, the optical flow of motionAccelerations and the encodes of speedup
+would compete for the same cores. Those stages are run inside heavy_stage(), which waits for a free slot of a semaphore shared by all the processes of the batch.
+
+If no semaphore has been set (a single movie processed with main.py), heavy_stage() does not wait.
+"""
+
+from contextlib import contextmanager
+
+## Semaphore shared by the processes of the batch, None when there is no limit
+_semaphore = None
+
+##
+# @brief  Sets the semaphore that limits the heavy stages, it is called by the initializer of each process of the pool.
+# @param semaphore   The semaphore shared by all the processes, None to remove the limit.
+##
+def init_limiter(semaphore):
+    global _semaphore
+    _semaphore = semaphore
+
+##
+# @brief  Context manager that runs a CPU-heavy stage, waiting for a free slot if there is a limit.
+##
+@contextmanager
+def heavy_stage():
+    if _semaphore is None:
+        yield
+        return
+    _semaphore.acquire()
+    try:
+        yield
+    finally:
+        _semaphore.release()
@@ -0,0 +1,126 @@
+"""
+Registry of the subtitle files of a job
+
+The subtitle file of the movie is used by several stages (Format_srt, voiceAccelerations, accelerate_srt), so it is read only once: the first stage that needs it parses the
+file and keeps it in memory in columnar form (arrays of start and end times in milliseconds and the list of texts), and the next stages take it from the registry. The
+registry is keyed by the path of the file and checks its modification time and size, so a file changed on disk is parsed again. The files written with save() and the files
+changed by other programs (invalidate()) are removed from the registry.
+
+The subtitles are parsed with a regular expression on the timing lines (hh:mm:ss,mmm --> hh:mm:ss,mmm), the text of each subtitle is kept as it is in the file (with its line
+breaks and html tags).
+"""
+
+import os
+import re
+import threading
+
+import numpy as np
+
+## Timing line of a subtitle: start --> end, as hh:mm:ss,mmm
+TIMING_PATTERN = re.compile(r'(\d+):(\d+):(\d+)[,.](\d+)[ \t]*-->[ \t]*(\d+):(\d+):(\d+)[,.](\d+)[^\n]*\n?')
+
+## Number of the next subtitle at the end of the text of a subtitle
+INDEX_PATTERN = re.compile(r'\n\s*\d+\s*$')
+
+## Milliseconds of each field of the timing line (hours, minutes, seconds, milliseconds)
+FIELD_MS = np.array([3600000, 60000, 1000, 1], dtype=np.int64)
+
+## Parsed files, by absolute path: (modification time, size, subtitles)
+_registry = {}
+_lock = threading.Lock()
+
+##
+# @brief Subtitles of a file in columnar form: start and end times in milliseconds and texts.
+##
+class SubtitleTrack:
+    __slots__ = ('start', 'end', 'text')
+
+    ##
+    # @brief  Creates the subtitles from their values.
+    # @param start   The start times in milliseconds.
+    # @param end   The end times in milliseconds.
+    # @param text   The texts.
+    ##
+    def __init__(self, start=(), end=(), text=()):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.text = list(text)
+
+    def __len__(self):
+        return len(self.start)
+
+    def __repr__(self):
+        return f"SubtitleTrack({len(self)} subtitles)"
+
+##
+# @brief  Parses the content of a srt file.
+# @param content   The text of the file.
+# @return  The subtitles.
+##
+def parse(content):
+    content = content.replace('\r\n', '\n')
+    matches = list(TIMING_PATTERN.finditer(content))
+    fields = np.array([match.groups() for match in matches], dtype=np.int64).reshape(-1, 8)
+    texts = []
+    for i, match in enumerate(matches):
+        text = content[match.end():matches[i + 1].start() if i + 1 < len(matches) else len(content)]
+        # the number of the next subtitle is just before its timing line
+        if i + 1 < len(matches):
+            text = INDEX_PATTERN.sub('', '\n' + text)[1:]
+        texts.append(text.strip())
+    return SubtitleTrack(fields[:, :4] @ FIELD_MS, fields[:, 4:] @ FIELD_MS, texts)
+
+##
+# @brief  Returns the subtitles of a file, parsing it only if it is not in the registry or if it changed since it was parsed.
+# @param path   The path of the srt file.
+# @return  The subtitles.
+##
+def load(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _lock:
+        entry = _registry.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        subtitles = parse(file.read())
+    with _lock:
+        _registry[path] = (stat.st_mtime_ns, stat.st_size, subtitles)
+    return subtitles
+
+##
+# @brief  Removes a file from the registry, it is called when the file is written or removed.
+# @param path   The path of the srt file.
+##
+def invalidate(path):
+    with _lock:
+        _registry.pop(os.path.abspath(path), None)
+
+##
+# @brief  Removes all the files from the registry, it is called at the beginning of each job.
+##
+def clear():
+    with _lock:
+        _registry.clear()
+
+##
+# @brief  Converts times in milliseconds to the srt format.
+# @param ms   The time in milliseconds.
+# @return  The time as hh:mm:ss,mmm.
+##
+def srt_time(ms):
+    ms = int(ms)
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02},{ms % 1000:03}"
+
+##
+# @brief  Writes subtitles as a srt file and removes the file from the registry.
+# @param path   The path of the srt file.
+# @param start   The start times in milliseconds.
+# @param end   The end times in milliseconds.
+# @param texts   The texts.
+##
+def save(path, start, end, texts):
+    with open(path, 'w', encoding='utf8') as file:
+        for i, (sub_start, sub_end, text) in enumerate(zip(start, end, texts)):
+            file.write(f"{i + 1}\n{srt_time(sub_start)} --> {srt_time(sub_end)}\n{text}\n\n")
+    invalidate(path)
@@ -0,0 +1,223 @@
+"""
+Timeline of voice/else segments
+
+The plan of the processing (which intervals of the movie are voice or else, and the acceleration factor of each one) is kept in memory in a Timeline and passed from one stage to
+the next one (Format_srt -> accelCalculator -> motionAccelerations -> Movie_cutter -> Selective_acceleration -> Movie_maker -> accelerate_srt), instead of writing it in srt files
+and reading it again in each stage.
+
+Each segment has a start and end time in milliseconds (integers, as in the srt files), a kind (voice or else) and a factor, the inverse of its acceleration (NaN until it is
+calculated). The label of a segment is the text the srt files used to have (''voice'', ''else'', ''voice0.588'', ''else0.125''...), which is also the name of its fragment.
+
+The timelines can be exported to srt (to_srt) to be checked or included in the zip file, and from_srt reads the srt files written by previous versions.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+import subtitles
+
+## Kind of the voice segments
+VOICE = 0
+
+## Kind of the else segments
+ELSE = 1
+
+## Text of each kind
+KINDS = ('voice', 'else')
+
+## Label of a segment: its kind and, optionally, its factor
+LABEL_PATTERN = re.compile(r'(voice|else)(\d+(\.\d+)?)?')
+
+##
+# @brief Voice/else segments of a movie, stored in NumPy arrays: start and end (ms), kind (VOICE or ELSE) and factor (NaN if it is not calculated).
+##
+class Timeline:
+    __slots__ = ('start', 'end', 'kind', 'factor')
+
+    ##
+    # @brief  Creates a timeline from the values of its segments.
+    # @param start   The start times in milliseconds.
+    # @param end   The end times in milliseconds.
+    # @param kind   The kinds (VOICE or ELSE).
+    # @param factor   The factors, NaN for all the segments if it is not given.
+    ##
+    def __init__(self, start=(), end=(), kind=(), factor=None):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.kind = np.asarray(kind, dtype=np.int8)
+        if factor is None:
+            factor = np.full(len(self.start), np.nan)
+        self.factor = np.asarray(factor, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.start)
+
+    def __eq__(self, other):
+        return (isinstance(other, Timeline) and np.array_equal(self.start, other.start) and np.array_equal(self.end, other.end)
+                and np.array_equal(self.kind, other.kind) and np.array_equal(self.factor, other.factor, equal_nan=True))
+
+    def __repr__(self):
+        return f"Timeline({len(self)} segments, {self.duration_ms()} ms)"
+
+    ##
+    # @brief  Duration of the segments.
+    # @return  Array with the duration of each segment in milliseconds.
+    ##
+    def durations(self):
+        return self.end - self.start
+
+    ##
+    # @brief  Total duration of the segments.
+    # @return  The sum of the durations in milliseconds.
+    ##
+    def duration_ms(self):
+        return int(self.durations().sum())
+
+    ##
+    # @brief  Duration of the segments once accelerated (duration multiplied by the factor), the segments without factor keep their duration.
+    # @return  Array with the duration of each segment in milliseconds.
+    ##
+    def output_durations(self):
+        return self.durations() * np.where(np.isnan(self.factor), 1, self.factor)
+
+    ##
+    # @brief  Label of a segment, the text of the segment in the srt files (e.g. ''voice'', ''else0.125'').
+    # @param i   The position of the segment (0-based).
+    # @return  The label.
+    ##
+    def label(self, i):
+        text = KINDS[self.kind[i]]
+        if not np.isnan(self.factor[i]):
+            text += str(float(self.factor[i]))
+        return text
+
+    ##
+    # @brief  Labels of all the segments.
+    # @return  The list of labels.
+    ##
+    def labels(self):
+        return [self.label(i) for i in range(len(self))]
+
+    ##
+    # @brief  Name of the fragment of a segment, numbered from 1 as the srt indexes: {index}{kind}{factor}.mp4.
+    # @param i   The position of the segment (0-based).
+    # @param extension   The extension of the fragment, m4a or opus for the podcasts (audio.py).
+    # @return  The name of the fragment.
+    ##
+    def fragment_name(self, i, extension='mp4'):
+        return f"{i + 1}{self.label(i)}.{extension}"
+
+    ##
+    # @brief  Times of a segment in seconds, as required by ffmpeg.
+    # @param i   The position of the segment (0-based).
+    # @return  The start and end time in seconds.
+    ##
+    def seconds(self, i):
+        return float(self.start[i]) / 1000, float(self.end[i]) / 1000
+
+    ##
+    # @brief  Copy of the timeline.
+    # @return  The new timeline.
+    ##
+    def copy(self):
+        return Timeline(self.start.copy(), self.end.copy(), self.kind.copy(), self.factor.copy())
+
+    ##
+    # @brief  Segments selected by a mask or a list of positions.
+    # @param selection   Boolean mask or array of positions.
+    # @return  The new timeline.
+    ##
+    def select(self, selection):
+        return Timeline(self.start[selection], self.end[selection], self.kind[selection], self.factor[selection])
+
+    ##
+    # @brief  Mask of the segments of a kind.
+    # @param kind   VOICE or ELSE.
+    # @return  Boolean array.
+    ##
+    def is_kind(self, kind):
+        return self.kind == kind
+
+    ##
+    # @brief  Joins several timelines and sorts the segments by start and end time (the order of the srt files).
+    # @param timelines   The timelines.
+    # @return  The new timeline.
+    ##
+    @staticmethod
+    def merge(*timelines):
+        timeline = Timeline(np.concatenate([t.start for t in timelines]), np.concatenate([t.end for t in timelines]),
+                            np.concatenate([t.kind for t in timelines]), np.concatenate([t.factor for t in timelines]))
+        return timeline.select(np.lexsort((timeline.end, timeline.start)))
+
+    ##
+    # @brief  Joins the consecutive segments of the same kind, from the start of the first one to the end of the last one.
+    # @return  The new timeline, without factors.
+    ##
+    def compress(self):
+        if len(self) == 0:
+            return Timeline()
+        first = np.flatnonzero(np.r_[True, self.kind[1:] != self.kind[:-1]])
+        last = np.r_[first[1:] - 1, len(self) - 1]
+        return Timeline(self.start[first], self.end[last], self.kind[first])
+
+    ##
+    # @brief  Hash of the segments, used as parameter of the checkpoints of the stages that receive the timeline.
+    # @return  The hexadecimal hash.
+    ##
+    def digest(self):
+        sha = hashlib.sha256()
+        for array in (self.start, self.end, self.kind, self.factor):
+            sha.update(np.ascontiguousarray(array).tobytes())
+        return sha.hexdigest()
+
+    ##
+    # @brief  Converts the timeline to a dictionary of lists (JSON serializable), the missing factors are None.
+    # @return  The dictionary.
+    ##
+    def to_dict(self):
+        return {'start': self.start.tolist(), 'end': self.end.tolist(), 'kind': self.kind.tolist(),
+                'factor': [None if np.isnan(f) else f for f in self.factor.tolist()]}
+
+    ##
+    # @brief  Creates a timeline from a dictionary written by to_dict.
+    # @param data   The dictionary.
+    # @return  The timeline.
+    ##
+    @staticmethod
+    def from_dict(data):
+        factor = [np.nan if f is None else f for f in data['factor']]
+        return Timeline(data['start'], data['end'], data['kind'], factor)
+
+    ##
+    # @brief  Reads a voice/else srt file (e.g. compr_subs_acc.srt of previous versions).
+    # @param path   The path of the srt file.
+    # @return  The timeline.
+    ##
+    @staticmethod
+    def from_srt(path):
+        subs = subtitles.load(path)
+        kind, factor = [], []
+        for text in subs.text:
+            match = LABEL_PATTERN.fullmatch(text.strip())
+            if match is None:
+                raise Exception(f"Invalid input - {text} is not a voice/else label")
+            kind.append(KINDS.index(match.group(1)))
+            factor.append(float(match.group(2)) if match.group(2) else np.nan)
+        return Timeline(subs.start, subs.end, kind, factor)
+
+    ##
+    # @brief  Writes the timeline as a srt file, with the label of each segment as text.
+    # @param path   The path of the srt file.
+    ##
+    def to_srt(self, path):
+        subtitles.save(path, self.start, self.end, self.labels())
+
+##
+# @brief  Converts times in seconds to integer milliseconds.
+# @param seconds   The time or array of times in seconds.
+# @return  The times in milliseconds.
+##
+def to_ms(seconds):
+    return np.rint(np.asarray(seconds, dtype=np.float64) * 1000).astype(np.int64)
@@ -1,9 +1,13 @@
 """
 Zip creation of the files of the folder where the output is generated.
+
+The manifests of the checkpoints (checkpoint.py, folder ''.checkpoints'') are internal state of the processing, with absolute paths of the machine, so they are not archived.
 """
 
 import os
-import shutil
+import zipfile
+
+from checkpoint import CHECKPOINT_FOLDER
 
 ##
 # @brief  Main function.
@@ -12,16 +16,24 @@ import shutil
 # @param method   The method used to accelerate the video {ina, srt}, to add to the name of the zip file.
 # @param target_min_speed   The minimum target voice speed of the video to add to the name of the zip file.
 # @param target_max_speed   The maximum target voice speed of the video to add to the name of the zip file..
+# @return  The path of the zip file, None if it was not created.
 ##
 def main(movie_path, original_title, method, target_min_speed, target_max_speed):
 
-    os.chdir(movie_path)
     name = original_title
-    root_dir = f'{movie_path}'[:-6] #length("input") == 6
-    os.chdir(root_dir)
-    shutil.make_archive(f'{name}_{method}_{target_min_speed}_{target_max_speed}', 'zip', 'input')
+    movie_path = os.path.normpath(movie_path)
+    root_dir = os.path.dirname(movie_path)
+    zip_file = os.path.join(root_dir, f'{name}_{method}_{target_min_speed}_{target_max_speed}.zip')
+    with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for folder, subfolders, files in os.walk(movie_path):
+            subfolders[:] = sorted(subfolder for subfolder in subfolders if subfolder != CHECKPOINT_FOLDER)
+            archive.write(folder, os.path.relpath(folder, root_dir))
+            for file in sorted(files):
+                archive.write(os.path.join(folder, file), os.path.relpath(os.path.join(folder, file), root_dir))
 
-    if os.path.exists(os.path.join(root_dir, f'{name}_{method}_{target_min_speed}_{target_max_speed}.zip')):
+    if os.path.exists(zip_file):
         print("ZIP file successfully created")
+        return zip_file
     else:
         print("The ZIP file was not created")
+    return None
@@ -0,0 +1,300 @@
+"""
+Trace of the stages and of the external programs of the processing
+
+Every stage of main.run and every ffmpeg/ffprobe/espeak call is run inside span(), which records its wall time, the CPU time and bytes read and written by the program during
+the span, the peak resident memory of the program and the number of subprocesses started inside it. The external programs are called with run(), call() and stream() of this module instead of subprocess.run and subprocess.call.
+
+The subprocesses are counted in the spans open in the thread that starts them, so the functions run by the pools of threads of a stage are wrapped with in_spans(), which
+gives the thread the open spans of the stage. The functions run by a pool of processes are run with collect(), which returns the spans recorded in the process with the value,
+and the stage adds them to the trace with adopt().
+
+The trace can be exported as JSON lines (one span per line, to aggregate several executions) or as a Chrome trace_event file that can be opened in chrome://tracing or Perfetto.
+
+Notes about the values:
+    - CPU time includes the subprocesses that finished inside the span (user + system time).
+    - The bytes read and written are the storage bytes of the program (/proc/self/io) plus the blocks read and written by the finished subprocesses, 0 where they are not
+      available (e.g. Windows).
+    - The CPU time and the bytes are differences of counters of the whole program, not of the stage alone: if several stages run at the same time (dag.py) each one
+      includes the work of the others. Those spans are marked as ''overlapped'', their values are only exact when the stages run one at a time (workers=1).
+    - The memory (process_peak_rss) is the highest resident memory of the program or of one of its finished subprocesses since the program started (ru_maxrss), not the
+      peak of the span: it only shows that the peak was reached before the end of the span.
+"""
+
+import functools
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:   # not available on Windows
+    resource = None
+
+## Size of the blocks of ru_inblock and ru_oublock (bytes)
+BLOCK_SIZE = 512
+
+## Spans recorded since the last reset
+_events = []
+_lock = threading.Lock()
+## Open spans of each thread
+_local = threading.local()
+## Open spans of all the threads by category, to mark the spans that overlap
+_open = {}
+## Reference time of the trace
+_origin = time.perf_counter()
+
+##
+# @brief  Clears the recorded spans and starts the time of the trace again, it is called at the beginning of each job.
+##
+def reset():
+    global _origin
+    with _lock:
+        _events.clear()
+        _origin = time.perf_counter()
+
+##
+# @brief  Returns the spans recorded since the last reset.
+# @return  The list of spans (dictionaries), in the order they finished.
+##
+def events():
+    with _lock:
+        return list(_events)
+
+##
+# @brief  Reads the storage bytes read and written by the program.
+# @return  Bytes read and bytes written, 0 if /proc/self/io is not available.
+##
+def _proc_io():
+    read_bytes = write_bytes = 0
+    try:
+        with open('/proc/self/io', 'r') as file:
+            for line in file:
+                key, value = line.split(':')
+                if key == 'read_bytes':
+                    read_bytes = int(value)
+                elif key == 'write_bytes':
+                    write_bytes = int(value)
+    except (OSError, ValueError):
+        pass
+    return read_bytes, write_bytes
+
+##
+# @brief  Reads the counters of the program and its finished subprocesses.
+# @return  Dictionary with cpu (seconds), process_peak_rss, read_bytes and write_bytes (bytes), all of them of the whole program.
+##
+def _usage():
+    times = os.times()
+    read_bytes, write_bytes = _proc_io()
+    usage = {'cpu': times.user + times.system + times.children_user + times.children_system,
+             'process_peak_rss': 0, 'read_bytes': read_bytes, 'write_bytes': write_bytes}
+    if resource is not None:
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        usage['process_peak_rss'] = max(own.ru_maxrss, children.ru_maxrss) * 1024   # kilobytes in Linux
+        usage['read_bytes'] += children.ru_inblock * BLOCK_SIZE
+        usage['write_bytes'] += children.ru_oublock * BLOCK_SIZE
+    return usage
+
+##
+# @brief  Context manager that records a span of the trace.
+# @param name   The name of the span (stage or program).
+# @param category   The category of the span: 'stage' or 'subprocess'.
+# @param args   Additional values stored with the span (e.g. the command line).
+##
+@contextmanager
+def span(name, category='stage', **args):
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {'name': name, 'cat': category, 'parent': stack[-1]['name'] if stack else None, 'subprocesses': 0, 'overlapped': False, 'args': args}
+    stack.append(record)
+    with _lock:
+        running = _open.setdefault(category, [])
+        if running:
+            # the counters of the program are shared with the spans of the other threads
+            record['overlapped'] = True
+            for other in running:
+                other['overlapped'] = True
+        running.append(record)
+    start_usage = _usage()
+    start_time = time.perf_counter()
+    try:
+        yield record
+    finally:
+        end_time = time.perf_counter()
+        end_usage = _usage()
+        stack.pop()
+        with _lock:
+            _open[category].remove(record)
+        record.update({
+            'ts': start_time - _origin,
+            'wall': end_time - start_time,
+            'cpu': end_usage['cpu'] - start_usage['cpu'],
+            'process_peak_rss': end_usage['process_peak_rss'],
+            'read_bytes': end_usage['read_bytes'] - start_usage['read_bytes'],
+            'write_bytes': end_usage['write_bytes'] - start_usage['write_bytes'],
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        })
+        with _lock:
+            _events.append(record)
+
+##
+# @brief  Runs an external program inside a span, counting it in all the open spans of the thread.
+# @param function   subprocess.run or subprocess.call.
+# @param command   The command, list of arguments or string.
+# @param kwargs   The arguments of the subprocess function.
+# @return  The value returned by the subprocess function.
+##
+def _traced(function, command, **kwargs):
+    if isinstance(command, (list, tuple)):
+        program = os.path.basename(str(command[0]))
+        text = ' '.join(str(arg) for arg in command)
+    else:
+        program = os.path.basename(str(command).split()[0])
+        text = str(command)
+    # the spans of the stack can be shared with other threads (in_spans)
+    with _lock:
+        for record in getattr(_local, 'stack', []):
+            record['subprocesses'] += 1
+    with span(program, 'subprocess', command=text) as record:
+        record['subprocesses'] = 1
+        return function(command, **kwargs)
+
+##
+# @brief  Wraps a function that is run by a pool of threads, so the subprocesses started by the function are counted in the spans open in the thread that calls in_spans
+# (the stage) and their spans have the stage as parent.
+# @param function   The function run by the pool.
+# @return  The wrapped function.
+##
+def in_spans(function):
+    parents = list(getattr(_local, 'stack', []))
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, 'stack', None)
+        _local.stack = list(parents)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.stack = previous
+    return wrapper
+
+##
+# @brief  Runs a function in a process of a pool and returns the spans recorded in the process with its value, so they can be added to the trace of the stage (adopt).
+# @param function   The function, it must be defined at the top level of a module so it can be sent to the process.
+# @param args   The arguments of the function.
+# @return  The value returned by the function, the spans recorded while it ran and the reference time of the trace of the process.
+##
+def collect(function, *args):
+    reset()
+    value = function(*args)
+    return value, events(), _origin
+
+##
+# @brief  Adds to the trace the spans recorded by collect() in another process: the spans without parent become children of the innermost span open in the thread, and the
+# subprocesses are counted in all the open spans.
+# @param records   The spans returned by collect.
+# @param origin   The reference time of the trace of the other process (the clock of perf_counter is shared by the processes of the machine).
+##
+def adopt(records, origin):
+    stack = getattr(_local, 'stack', [])
+    with _lock:
+        for record in records:
+            record = dict(record, ts=record['ts'] + origin - _origin)
+            if record['parent'] is None and stack:
+                record['parent'] = stack[-1]['name']
+            if record['cat'] == 'subprocess':
+                for open_record in stack:
+                    open_record['subprocesses'] += 1
+            _events.append(record)
+
+##
+# @brief  subprocess.run inside a span.
+# @param command   The command, list of arguments or string.
+# @param kwargs   The arguments of subprocess.run.
+# @return  The CompletedProcess.
+##
+def run(command, **kwargs):
+    return _traced(subprocess.run, command, **kwargs)
+
+##
+# @brief  subprocess.call inside a span.
+# @param command   The command, list of arguments or string.
+# @param kwargs   The arguments of subprocess.call.
+# @return  The return code.
+##
+def call(command, **kwargs):
+    return _traced(subprocess.call, command, **kwargs)
+
+##
+# @brief  Starts a program and passes its standard output to a function while the program is running.
+# @param command   The command, list of arguments.
+# @param consume   The function that reads the output, it receives the output as an iterable of lines (a binary file object with text=False).
+# @param kwargs   The arguments of subprocess.Popen.
+# @return  The return code of the program and the value returned by consume.
+##
+def _popen(command, consume=None, **kwargs):
+    kwargs.setdefault('text', True)
+    with subprocess.Popen(command, stdout=subprocess.PIPE, **kwargs) as process:
+        value = consume(process.stdout)
+        # the rest of the output is read so the program is not blocked if consume stops before the end
+        while process.stdout.read(1 << 16):
+            pass
+    return process.returncode, value
+
+##
+# @brief  Runs a program inside a span, reading its output line by line while it runs instead of keeping it in memory or in a file.
+# @param command   The command, list of arguments.
+# @param consume   The function that reads the output, it receives the output as an iterable of lines (a binary file object with text=False).
+# @param kwargs   The arguments of subprocess.Popen.
+# @return  The return code of the program and the value returned by consume.
+##
+def stream(command, consume, **kwargs):
+    return _traced(_popen, command, consume=consume, **kwargs)
+
+##
+# @brief  Writes the spans as JSON lines, one span per line, appending to the file so several executions can be aggregated.
+# @param path   The path of the file.
+# @param job   Name of the job added to every line.
+##
+def write_jsonl(path, job=None):
+    with open(path, 'a', encoding='utf8') as file:
+        for record in events():
+            file.write(json.dumps(dict(record, job=job), default=str) + '\n')
+
+##
+# @brief  Writes the spans in the Chrome trace_event format (complete events, times in microseconds).
+# @param path   The path of the file.
+##
+def write_chrome_trace(path):
+    trace_events = []
+    for record in events():
+        trace_events.append({
+            'name': record['name'],
+            'cat': record['cat'],
+            'ph': 'X',
+            'ts': round(record['ts'] * 1e6),
+            'dur': round(record['wall'] * 1e6),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': dict(record['args'], cpu_s=record['cpu'], process_peak_rss=record['process_peak_rss'], read_bytes=record['read_bytes'],
+                         write_bytes=record['write_bytes'], subprocesses=record['subprocesses'], overlapped=record['overlapped'],
+                         parent=record['parent']),
+        })
+    with open(path, 'w', encoding='utf8') as file:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file, default=str)
+
+##
+# @brief  Writes the trace in the format given by the extension of the file: JSON lines (.jsonl) or Chrome trace_event (any other).
+# @param path   The path of the file.
+# @param job   Name of the job, added to the JSON lines.
+##
+def write(path, job=None):
+    if path.endswith('.jsonl'):
+        write_jsonl(path, job)
+    else:
+        write_chrome_trace(path)
@@ -5,13 +5,16 @@ Speech acceleration
 In this file, the subtitle file is converted into a dataframe with multiple columns to get statistics and search values.
 """
 
+import os
 import pandas as pd
-import subprocess
 import re
 import string
 import pysubs2
 import langdetect
 
+import subtitles
+import tracing
+
 ##
 # @brief This function first creates a table with columns for each subtitle such as start and end times, graphemes and phonemes, speed and speed-1s.
 # There are also cells with the mean, maximum and minimum of the speed-1s column.
@@ -35,24 +38,25 @@ def process_srt_graphemes_df(srt_name, n_decimals, output_path):
     
     index = 0
     
-    subs = pysubs2.load(path = srt_name + '.srt', encoding = 'UTF-8', format = 'srt')
+    # the subtitle file is parsed only once per job (subtitles.py)
+    subs = subtitles.load(os.path.join(output_path, srt_name + '.srt'))
     
     translator = str.maketrans("", "", string.punctuation+"!\"#$%&'()*+,-./:;<=>?@[\]^__`{|}~¿¡♪[\n][\t]}")
     
-    for sub in subs:
+    for sub_start, sub_end, sub_text in zip(subs.start.tolist(), subs.end.tolist(), subs.text):
         
         index = index + 1
 
-        df.loc[index, 'start-time'] = pysubs2.time.ms_to_str(sub.start, fractions = True)
-        df.loc[index, 'start-time-s'] = round(sub.start/1000, n_decimals)
+        df.loc[index, 'start-time'] = pysubs2.time.ms_to_str(sub_start, fractions = True)
+        df.loc[index, 'start-time-s'] = round(sub_start/1000, n_decimals)
                                             
-        df.loc[index, 'end-time'] = pysubs2.time.ms_to_str(sub.end, fractions = True)
-        df.loc[index, 'end-time-s'] = round(sub.end/1000, n_decimals)
+        df.loc[index, 'end-time'] = pysubs2.time.ms_to_str(sub_end, fractions = True)
+        df.loc[index, 'end-time-s'] = round(sub_end/1000, n_decimals)
         
         df.loc[index, 'time-diff'] = round(df.loc[index, 'end-time-s'] - df.loc[index, 'start-time-s'], n_decimals)
                     
         # Elimination of html tags ({} and <>)
-        line_html1 = re.sub(pattern_html1, ' ', sub.text)
+        line_html1 = re.sub(pattern_html1, ' ', sub_text)
         line_html2 = re.sub(pattern_html2, ' ', line_html1)
         
         # Lines were joined by \n
@@ -103,7 +107,7 @@ def espeak_phonemes_df(file_name, df, language_prefix, output_path):
     
     command = ['espeak','-q','-v', language_prefix,'--ipa=3', "-f", input_file_path , '--phonout=' + output_file_path]
     
-    result=subprocess.run(command, capture_output=True, text=True)
+    result=tracing.run(command, capture_output=True, text=True)
     
     if result.stdout.strip():
         with open(result_file_path, 'w', encoding = 'UTF-8') as file: